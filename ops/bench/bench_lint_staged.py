@@ -0,0 +1,90 @@
+"""Time ``kb lint --staged`` against a full ``kb lint`` on a synthetic repository.
+
+    uv run --project ops python ops/bench/bench_lint_staged.py --notes 50000
+
+Commits the corpus, stages a few edited notes, then runs each lint twice:
+the first --staged run builds the committed id set, the second uses it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import dump_frontmatter
+from kb_repo_tools.ulidutil import new_ulids
+
+RULES_SRC = Path(__file__).resolve().parents[1] / "rules" / "kb.rules.yml"
+DOMAINS = ["dev", "infra", "ai", "security", "tools"]
+
+
+def _git(root: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=root, check=True, stdout=subprocess.DEVNULL)
+
+
+def build_repo(root: Path, notes: int) -> list[Path]:
+    (root / "ops" / "rules").mkdir(parents=True)
+    shutil.copy(RULES_SRC, root / "ops" / "rules" / "kb.rules.yml")
+    paths: list[Path] = []
+    for i, note_id in enumerate(new_ulids(notes)):
+        domain = DOMAINS[i % len(DOMAINS)]
+        meta = {
+            "id": note_id,
+            "kind": "note",
+            "domain": domain,
+            "summary": f"note {i}",
+            "created": "2026-02-10T23:15+09:00",
+            "updated": "2026-02-10T23:15+09:00",
+        }
+        path = root / "notes" / domain / f"note--{note_id}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(dump_frontmatter(meta, "本文\n" * 30), encoding="utf-8")
+        paths.append(path)
+    _git(root, "init", "-q", "-b", "main")
+    _git(root, "add", "-A")
+    identity = ["-c", "user.name=bench", "-c", "user.email=bench@example.invalid"]
+    _git(root, *identity, "commit", "-q", "-m", "corpus")
+    return paths
+
+
+def _time(args: list[str]) -> float:
+    start = time.perf_counter()
+    result = CliRunner().invoke(cli.main, args)
+    elapsed = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise SystemExit(result.output)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--staged", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kb-bench-") as tmp:
+        root = Path(tmp)
+        paths = build_repo(root, args.notes)
+        for path in paths[: args.staged]:
+            path.write_text(path.read_text(encoding="utf-8") + "追記\n", encoding="utf-8")
+            _git(root, "add", os.fspath(path))
+        os.chdir(root)
+        cold = _time(["lint", "--staged"])
+        warm = _time(["lint", "--staged"])
+        full = _time(["lint"])
+        print(f"{args.notes} notes, {args.staged} staged")
+        print(f"lint --staged (cold id set) {cold:8.3f} s")
+        print(f"lint --staged (warm)        {warm:8.3f} s")
+        print(f"lint (full)                 {full:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark the built-in search fallback against ripgrep on a synthetic corpus.
+
+    uv run --project ops python ops/bench/bench_search.py --notes 20000
+
+Writes the corpus to a temporary directory (or --dir), then times each query
+with rg (when installed) and with kb_repo_tools.textsearch, and checks that
+both report the same set of ``path:line`` hits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from kb_repo_tools.textsearch import search
+
+DOMAINS = ["dev", "infra", "ai", "security", "tools"]
+WORDS_JA = [
+    "再起動", "設定", "証明書", "タイムアウト", "権限", "キャッシュ", "ログ", "手順", "原因", "対処"
+]
+WORDS_EN = ["okta", "docker", "nginx", "terraform", "kubectl", "ssh", "vpn", "postgres", "redis"]
+QUERIES = ["証明書", "terraform", "タイムアウト|timeout", r"[ァ-ヶー]+する", r"^## 対処"]
+
+
+def _note(rng: random.Random, i: int) -> str:
+    lines = [
+        "---",
+        f"id: NOTE{i:06d}",
+        "kind: troubleshoot",
+        f"summary: {rng.choice(WORDS_JA)}の{rng.choice(WORDS_EN)}メモ",
+        "---",
+        "",
+    ]
+    for heading in ("症状", "原因", "対処"):
+        lines.append(f"## {heading}")
+        lines.append("")
+        for _ in range(rng.randint(3, 12)):
+            words = rng.choices(WORDS_JA + WORDS_EN, k=rng.randint(4, 14))
+            lines.append(" ".join(words) + rng.choice(["。", "する。", "", " timeout"]))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_corpus(root: Path, notes: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(notes):
+        domain = DOMAINS[i % len(DOMAINS)]
+        path = root / "notes" / domain / f"troubleshoot--NOTE{i:06d}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(_note(rng, i), encoding="utf-8")
+
+
+def _keys(lines: list[str]) -> set[str]:
+    return {":".join(line.split(":", 2)[:2]) for line in lines if line}
+
+
+def _time(fn) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dir", type=Path, default=None, help="Reuse/keep the corpus here.")
+    args = parser.parse_args()
+
+    tmp = None
+    root = args.dir
+    if root is None:
+        tmp = tempfile.TemporaryDirectory(prefix="kb-bench-")
+        root = Path(tmp.name)
+    if not (root / "notes").exists():
+        build_corpus(root, args.notes, args.seed)
+    dirs = [f"notes/{d}" for d in DOMAINS]
+    rg = shutil.which("rg")
+
+    print(f"corpus: {root} ({args.notes} notes)")
+    print(f"{'query':<24} {'hits':>8} {'builtin s':>10} {'rg s':>8}")
+    for query in QUERIES:
+        builtin_s, hits = _time(
+            lambda: [str(h) for h in search(root, dirs, query, workers=args.workers)]
+        )
+        rg_col = "-"
+        if rg is not None:
+            cmd = [rg, "-n", "--no-heading", "--with-filename", "--hidden", query, *dirs]
+            rg_s, rg_out = _time(
+                lambda: subprocess.run(
+                    cmd, cwd=root, stdout=subprocess.PIPE, text=True, check=False
+                ).stdout.splitlines()
+            )
+            rg_col = f"{rg_s:.3f}"
+            if _keys(rg_out) != _keys(hits):
+                rg_col += " (hits differ)"
+        print(f"{query:<24} {len(hits):>8} {builtin_s:>10.3f} {rg_col:>8}")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,11 @@ set -euo pipefail
 REPO_ROOT="${KB_REPO_ROOT:-$HOME/kb}"
 LOG_FILE="${REPO_ROOT}/ops/automation/organize-schedule.log"
 WATCH_PATHS=("notes" "ops/rules/kb.rules.yml")
+# 実行ごとのメトリクス（JSONL）。kb organize も同じファイルに1行ずつ追記する
+# KB_METRICS_PROM を設定すると kb organize が Prometheus textfile も書き出す
+METRICS_LOG="${KB_METRICS_LOG:-${REPO_ROOT}/ops/automation/organize-metrics.jsonl}"
+export KB_METRICS_LOG="$METRICS_LOG"
+STARTED_AT="$(date +%s)"
 
 cd "$REPO_ROOT"
 
@@ -34,6 +39,28 @@ append_log() {
     "$base_sha" >> "$LOG_FILE"
 }
 
+append_metrics() {
+  local status="$1"
+  local reason="$2"
+  local base_sha="$3"
+  mkdir -p "$(dirname "$METRICS_LOG")"
+  printf '{"ts":"%s","command":"scheduled-organize","status":"%s","reason":"%s","head":"%s","base":"%s","wall_seconds":%d}\n' \
+    "$(timestamp_jst)" \
+    "$status" \
+    "$reason" \
+    "$(head_sha)" \
+    "$base_sha" \
+    "$(( $(date +%s) - STARTED_AT ))" >> "$METRICS_LOG"
+}
+
+stage_logs() {
+  git add "$LOG_FILE"
+  # KB_METRICS_LOG がリポジトリ外を指す場合はコミットしない
+  if [[ "$METRICS_LOG" == "$REPO_ROOT"/* ]]; then
+    git add "$METRICS_LOG"
+  fi
+}
+
 ensure_main_branch() {
   local branch
   branch="$(git rev-parse --abbrev-ref HEAD)"
@@ -53,7 +80,8 @@ main() {
   if [[ -n "$base_sha" ]]; then
     if git diff --quiet "$base_sha"..HEAD -- "${WATCH_PATHS[@]}"; then
       append_log "skipped" "no-updates-since-last-organize" "$base_sha"
-      git add "$LOG_FILE"
+      append_metrics "skipped" "no-updates-since-last-organize" "$base_sha"
+      stage_logs
       if ! git diff --cached --quiet; then
         git commit -m "organizeをスキップ: 変更なし [organize-auto]"
         git push origin HEAD:main
@@ -66,7 +94,8 @@ main() {
     --allowedTools "Bash(git:*),Bash(uv:*),Read,Write,Edit,Glob,Grep"
 
   append_log "executed" "organize-ran" "${base_sha:-none}"
-  git add "$LOG_FILE"
+  append_metrics "executed" "organize-ran" "${base_sha:-none}"
+  stage_logs
   if ! git diff --cached --quiet; then
     git commit -m "organize実行ログを記録 [organize-auto]"
     git push origin HEAD:main
@@ -1,4 +1,6 @@
-__all__ = ["__version__"]
+from .api import KnowledgeBase
+from .notes import Note
 
-__version__ = "0.1.0"
+__all__ = ["KnowledgeBase", "Note", "__version__"]
 
+__version__ = "0.1.0"
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from .index import IdIndex
+from .notes import Note, iter_note_paths
+from .parsecache import load_note_records
+from .repo import Repo, open_repo
+from .rules import compile_rules
+from .textsearch import Hit, search
+from .timeutil import now_jst
+
+
+class KnowledgeBase:
+    """In-process access to a kb repository, without spawning ``kb``.
+
+    Notes are yielded as lazy :class:`Note` objects: iterating reads nothing
+    but directory entries, and ``note.meta`` / ``note.body`` are loaded on
+    first access.
+
+        kb = KnowledgeBase.open("~/kb")
+        note = kb.get("01KH5AP6B38MDFJESSS7EW3WHA")
+        for note in kb.query(kind="troubleshoot", tag="vpn"):
+            print(note.path, note.meta["summary"])
+    """
+
+    def __init__(self, repo: Repo) -> None:
+        self.repo = repo
+        self._compiled = compile_rules(repo.rules)
+        self._index: IdIndex | None = None
+
+    @classmethod
+    def open(cls, start: Path | str | None = None) -> KnowledgeBase:
+        """Open the repo containing ``start`` (default: the current directory)."""
+        return cls(open_repo(Path(start).expanduser() if start is not None else None))
+
+    @property
+    def root(self) -> Path:
+        return self.repo.root
+
+    def _paths(self) -> Iterator[Path]:
+        return iter_note_paths(self.root, self._compiled.note_dirs)
+
+    def __iter__(self) -> Iterator[Note]:
+        for path in self._paths():
+            yield Note(path)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._paths())
+
+    @property
+    def index(self) -> IdIndex:
+        """Id index built from filenames on first use; see :meth:`refresh`."""
+        if self._index is None:
+            self._index = IdIndex.from_paths(self._paths(), self._compiled.file_template)
+        return self._index
+
+    def refresh(self) -> None:
+        self._index = None
+
+    def get(self, note_id: str) -> Note | None:
+        """Note by full id or unique prefix; ambiguous prefixes raise AmbiguousIdError."""
+        found = self.index.resolve(note_id.strip())
+        return Note(found[1]) if found is not None else None
+
+    def created_between(
+        self, after: datetime | None = None, before: datetime | None = None
+    ) -> list[Note]:
+        """Notes created in ``[after, before)``, oldest first (filenames only)."""
+        return [Note(path) for _id, path in self.index.created_between(after, before)]
+
+    def recent(self, days: int = 7) -> list[Note]:
+        return self.created_between(now_jst() - timedelta(days=days))
+
+    def query(
+        self,
+        *,
+        kind: str | None = None,
+        domain: str | None = None,
+        tag: str | None = None,
+    ) -> list[Note]:
+        """Notes whose frontmatter matches every given field.
+
+        Metadata comes from the parse cache, so unchanged notes are not read.
+        """
+        out: list[Note] = []
+        for rec in load_note_records(self.root, self._compiled.note_dirs):
+            meta = rec.meta
+            if meta is None:
+                continue
+            if kind is not None and meta.get("kind") != kind:
+                continue
+            if domain is not None and meta.get("domain") != domain:
+                continue
+            if tag is not None and tag not in (meta.get("tags") or []):
+                continue
+            out.append(Note(rec.path, meta=meta))
+        return out
+
+    def search(self, query: str) -> list[Hit]:
+        """Lines matching ``query`` (literal or regex), as ``path:line:text`` hits."""
+        return search(self.root, self._compiled.note_dirs, query)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterable, Iterator
+
+from .frontmatter import atomic_write_text
+from .textsearch import Hit, compile_query, search_data
+
+ARCHIVE_INDEX_FORMAT = "kb-archive-index"
+ARCHIVE_INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.jsonl"
+
+# Frontmatter kept in the index: enough to render links, filter and lint
+# without opening the pack.
+INDEX_FIELDS = ("kind", "domain", "title", "summary", "updated", "related")
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ArchivedNote:
+    note_id: str
+    pack: str  # repo-relative path of the zip
+    member: str  # the note's path before it was archived; also its name in the pack
+    meta: dict[str, Any]
+
+    @property
+    def label(self) -> str:
+        """How search and resolve print the note: the member inside its pack."""
+        return f"{self.pack}/{self.member}"
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.member).stem
+
+    def to_record(self) -> dict[str, Any]:
+        return {"id": self.note_id, "member": self.member, "meta": self.meta}
+
+
+class Archive:
+    """Archived notes: ``pack-<ULID>.zip`` files under one directory.
+
+    A pack holds notes byte for byte under their original paths, deflated,
+    and is never rewritten; its ``.idx.jsonl`` sidecar lists the ids and
+    the frontmatter needed for links. Reading one note seeks through the
+    zip's central directory, so the rest of the pack stays compressed.
+    """
+
+    def __init__(self, repo_root: Path, directory: str) -> None:
+        self.repo_root = repo_root
+        self.directory = directory
+        self._entries: dict[str, ArchivedNote] | None = None
+
+    def index_paths(self) -> list[Path]:
+        base = self.repo_root / self.directory
+        return sorted(base.glob(f"pack-*{INDEX_SUFFIX}")) if base.is_dir() else []
+
+    def entries(self) -> dict[str, ArchivedNote]:
+        """Archived notes by id; a later pack wins if an id was archived twice."""
+        if self._entries is None:
+            entries: dict[str, ArchivedNote] = {}
+            for path in self.index_paths():
+                for entry in _read_index(self.repo_root, path):
+                    entries[entry.note_id] = entry
+            self._entries = entries
+        return self._entries
+
+    def get(self, note_id: str) -> ArchivedNote | None:
+        return self.entries().get(note_id.upper())
+
+    def read(self, entry: ArchivedNote) -> bytes:
+        try:
+            with zipfile.ZipFile(self.repo_root / entry.pack) as zf:
+                return zf.read(entry.member)
+        except (OSError, KeyError, zipfile.BadZipFile) as e:
+            raise ArchiveError(f"cannot read {entry.label}: {e}") from e
+
+    def members(self) -> Iterator[tuple[ArchivedNote, bytes]]:
+        """Every archived note with its bytes, read in place pack by pack."""
+        for pack, entries in self._by_pack().items():
+            try:
+                with zipfile.ZipFile(self.repo_root / pack) as zf:
+                    for entry in entries:
+                        yield entry, zf.read(entry.member)
+            except (OSError, KeyError, zipfile.BadZipFile) as e:
+                raise ArchiveError(f"cannot read {pack}: {e}") from e
+
+    def search(self, query: str) -> list[Hit]:
+        """Hits in archived notes, labelled ``pack/member``; raises re.error.
+
+        ``query`` is a Python regex here: this is the fallback for hosts
+        without rg, like ``textsearch.search``.
+        """
+        regex = compile_query(query)
+        return [
+            hit
+            for entry, data in self.members()
+            for hit in search_data(entry.label, data, query, regex)
+        ]
+
+    def _by_pack(self) -> dict[str, list[ArchivedNote]]:
+        """Entries grouped by pack, packs and members in path order."""
+        by_pack: dict[str, list[ArchivedNote]] = {}
+        for entry in self.entries().values():
+            by_pack.setdefault(entry.pack, []).append(entry)
+        return {pack: sorted(by_pack[pack], key=lambda e: e.member) for pack in sorted(by_pack)}
+
+    def write_pack(
+        self, pack_id: str, notes: Iterable[tuple[str, bytes, dict[str, Any]]]
+    ) -> list[ArchivedNote]:
+        """Write ``pack-<pack_id>.zip`` and its index from (path, bytes, meta)."""
+        base = self.repo_root / self.directory
+        base.mkdir(parents=True, exist_ok=True)
+        pack_path = base / f"pack-{pack_id}.zip"
+        pack_rel = pack_path.relative_to(self.repo_root).as_posix()
+        if pack_path.exists():
+            raise ArchiveError(f"pack already exists: {pack_rel}")
+        stamp = datetime.now().timetuple()[:6]
+        written: list[ArchivedNote] = []
+        tmp = pack_path.with_name(pack_path.name + ".tmp")
+        try:
+            with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for rel, data, meta in notes:
+                    info = zipfile.ZipInfo(rel, date_time=stamp)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    zf.writestr(info, data, compresslevel=9)
+                    kept = {k: meta[k] for k in INDEX_FIELDS if k in meta}
+                    note_id = str(meta.get("id", "")).upper()
+                    written.append(ArchivedNote(note_id, pack_rel, rel, _jsonable(kept)))
+            os.replace(tmp, pack_path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        header = {
+            "format": ARCHIVE_INDEX_FORMAT,
+            "version": ARCHIVE_INDEX_VERSION,
+            "pack": pack_path.name,
+        }
+        lines = [json.dumps(header)]
+        lines.extend(json.dumps(e.to_record(), ensure_ascii=False) for e in written)
+        atomic_write_text(base / f"pack-{pack_id}{INDEX_SUFFIX}", "\n".join(lines) + "\n")
+        self._entries = None
+        return written
+
+
+def _jsonable(meta: dict[str, Any]) -> dict[str, Any]:
+    # YAML may hand back datetimes for unquoted timestamps.
+    return json.loads(json.dumps(meta, ensure_ascii=False, default=str))
+
+
+_PACK_NAME_RE = re.compile(r"pack-[0-9A-Za-z]+\.zip")
+
+
+def _read_index(repo_root: Path, path: Path) -> list[ArchivedNote]:
+    rel = path.relative_to(repo_root).as_posix()
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+        header = json.loads(lines[0]) if lines else {}
+        if (
+            header.get("format") != ARCHIVE_INDEX_FORMAT
+            or header.get("version") != ARCHIVE_INDEX_VERSION
+            or not _PACK_NAME_RE.fullmatch(str(header.get("pack", "")))
+        ):
+            raise ArchiveError(f"not a kb archive index: {rel}")
+        pack = (path.parent / header["pack"]).relative_to(repo_root).as_posix()
+        return [
+            ArchivedNote(str(r["id"]).upper(), pack, str(r["member"]), dict(r.get("meta") or {}))
+            for r in map(json.loads, filter(None, lines[1:]))
+        ]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ArchiveError(f"broken archive index {rel}: {e}") from e
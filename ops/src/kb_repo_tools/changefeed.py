@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from .gitutil import (
+    CatFileBatch,
+    GitError,
+    blob_oid,
+    git_process_started,
+    run_git,
+    state_dir,
+)
+from .parsecache import ParseCache, parse_note_bytes
+
+FEED_FORMAT = "kb-change-feed"
+FEED_VERSION = 1
+
+_CURSOR_PREFIX = "kb1."
+_COMMIT_RE = re.compile(r"^[0-9a-f]{40}(?:[0-9a-f]{24})?$")
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(commit: str) -> str:
+    raw = base64.urlsafe_b64encode(bytes.fromhex(commit)).decode("ascii")
+    return _CURSOR_PREFIX + raw.rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Commit OID behind ``cursor``; consumers should treat cursors as opaque."""
+    if not cursor.startswith(_CURSOR_PREFIX):
+        raise CursorError(f"Invalid cursor: {cursor}")
+    raw = cursor[len(_CURSOR_PREFIX) :]
+    try:
+        commit = base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)).hex()
+    except (binascii.Error, ValueError) as e:
+        raise CursorError(f"Invalid cursor: {cursor}") from e
+    if not _COMMIT_RE.match(commit):
+        raise CursorError(f"Invalid cursor: {cursor}")
+    return commit
+
+
+@dataclass(frozen=True)
+class Change:
+    """One note-level event introduced by a commit (first-parent history)."""
+
+    event: str  # created | updated | moved | deleted
+    note_id: str
+    path: str
+    old_path: str | None
+    meta: dict[str, Any] | None
+    commit: str
+    date: str
+
+    def to_record(self) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "cursor": encode_cursor(self.commit),
+            "event": self.event,
+            "id": self.note_id,
+            "path": self.path,
+        }
+        if self.old_path is not None:
+            record["old_path"] = self.old_path
+        if self.meta is not None:
+            record["meta"] = self.meta
+        record["commit"] = self.commit
+        record["date"] = self.date
+        return record
+
+
+class ChangeFeed:
+    """Note events per commit, resolved once and kept as append-only JSONL.
+
+    Commits are immutable, so an entry never goes stale; the file is only
+    dropped when ``note_dirs`` change (the events would be filtered differently).
+    """
+
+    def __init__(self, path: Path, note_dirs: Iterable[str]) -> None:
+        self.path = path
+        self.note_dirs = list(note_dirs)
+        self.commits: dict[str, list[Change]] = {}
+        if path.exists():
+            self._load()
+
+    @classmethod
+    def for_repo(cls, repo_root: Path, note_dirs: Iterable[str]) -> ChangeFeed:
+        return cls(state_dir(repo_root) / "change-feed.jsonl", note_dirs)
+
+    def _load(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("format") == FEED_FORMAT:
+                    if entry.get("version") != FEED_VERSION or entry.get("dirs") != self.note_dirs:
+                        self.commits = {}
+                        self.path.unlink(missing_ok=True)
+                        return
+                elif "commit" in entry:
+                    self.commits[entry["commit"]] = [Change(**c) for c in entry["changes"]]
+
+    def since(self, repo_root: Path, since: str | None = None) -> tuple[str, list[Change]]:
+        """(HEAD, changes after commit ``since``) in commit order."""
+        head = run_git(repo_root, "rev-parse", "HEAD").decode().strip()
+        rev_range = "HEAD"
+        if since is not None:
+            if since == head:
+                return head, []
+            try:
+                run_git(repo_root, "merge-base", "--is-ancestor", since, "HEAD")
+            except GitError as e:
+                raise CursorError(
+                    "Cursor is not in the history of HEAD (history rewritten?); "
+                    "restart the feed without --since"
+                ) from e
+            rev_range = f"{since}..HEAD"
+
+        out = run_git(
+            repo_root, "log", "--reverse", "--first-parent", "--format=%H%x09%P%x09%cI", rev_range
+        ).decode()
+        commits: list[tuple[str, str | None, str]] = []
+        for line in out.splitlines():
+            commit, parents, date = line.split("\t")
+            commits.append((commit, parents.split()[0] if parents else None, date))
+
+        missing = [c for c in commits if c[0] not in self.commits]
+        if missing:
+            self._resolve(repo_root, missing)
+        return head, [change for commit, _p, _d in commits for change in self.commits[commit]]
+
+    def _resolve(self, repo_root: Path, commits: list[tuple[str, str | None, str]]) -> None:
+        # One diff-tree process for every new commit, each against its first
+        # parent, so merges report what they brought into the mainline.
+        stdin = "".join(f"{c} {p}\n" if p else f"{c}\n" for c, p, _d in commits)
+        out = _diff_tree_stdin(repo_root, self.note_dirs, stdin)
+        parents = {c: p for c, p, _d in commits}
+        dates = {c: d for c, _p, d in commits}
+
+        changes: dict[str, list[Change]] = {c: [] for c, _p, _d in commits}
+        cache = ParseCache.for_repo(repo_root)
+        with CatFileBatch(repo_root) as cat:
+            for commit, status, paths in _parse_name_status(out):
+                change = _to_change(
+                    cat, cache, commit, parents[commit], dates[commit], status, paths
+                )
+                if change is not None:
+                    changes[commit].append(change)
+        cache.save()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        with self.path.open("a", encoding="utf-8") as f:
+            if fresh:
+                header = {"format": FEED_FORMAT, "version": FEED_VERSION, "dirs": self.note_dirs}
+                f.write(json.dumps(header) + "\n")
+            for commit, items in changes.items():
+                entry = {"commit": commit, "changes": [c.__dict__ for c in items]}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.commits.update(changes)
+
+
+def _diff_tree_stdin(repo_root: Path, note_dirs: list[str], stdin: str) -> str:
+    git_process_started()
+    try:
+        result = subprocess.run(
+            [
+                "git",
+                "-c",
+                "core.quotepath=off",
+                "diff-tree",
+                "--stdin",
+                "-r",
+                "-M",
+                "--name-status",
+                "--root",
+                "--",
+                *note_dirs,
+            ],
+            cwd=repo_root,
+            input=stdin.encode("utf-8"),
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise GitError("git diff-tree failed") from e
+    return result.stdout.decode("utf-8")
+
+
+def _parse_name_status(out: str) -> Iterable[tuple[str, str, list[str]]]:
+    commit = ""
+    for line in out.splitlines():
+        if not line:
+            continue
+        if "\t" not in line:
+            commit = line.split()[0]  # diff-tree echoes each input commit
+            continue
+        status, *paths = line.split("\t")
+        yield commit, status, paths
+
+
+def _meta_at(
+    cat: CatFileBatch, cache: ParseCache, commit: str, path: str
+) -> dict[str, Any] | None:
+    data = cat.read(f"{commit}:{path}")
+    if data is None:
+        return None
+    oid = blob_oid(data)
+    record = cache.get(oid)
+    if record is None:
+        record = parse_note_bytes(data)
+        cache.put(oid, record)
+    return record.get("meta")
+
+
+def _to_change(
+    cat: CatFileBatch,
+    cache: ParseCache,
+    commit: str,
+    parent: str | None,
+    date: str,
+    status: str,
+    paths: list[str],
+) -> Change | None:
+    path = paths[-1]
+    if not path.endswith(".md"):
+        return None
+    kind = status[:1]
+    old_path = paths[0] if kind == "R" else None
+    if kind == "D":
+        meta = _meta_at(cat, cache, parent, path) if parent else None
+        event = "deleted"
+    else:
+        meta = _meta_at(cat, cache, commit, path)
+        event = {"A": "created", "C": "created", "R": "moved"}.get(kind, "updated")
+    note_id = str((meta or {}).get("id", "")).upper()
+    return Change(
+        event=event,
+        note_id=note_id,
+        path=path,
+        old_path=old_path,
+        meta=None if kind == "D" else meta,
+        commit=commit,
+        date=date,
+    )
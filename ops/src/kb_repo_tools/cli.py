@@ -1,74 +1,89 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import platform
 import re
+import shutil
 import subprocess
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from getpass import getuser
-from pathlib import Path
-from typing import Any
+from itertools import islice
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Iterable, TypeVar
 
 import click
 
-from .frontmatter import Doc, FrontmatterError, dump_frontmatter, read_doc, write_doc
-from .notes import iter_note_paths, read_note
+from .archive import Archive, ArchiveError, ArchivedNote
+from .changefeed import ChangeFeed, CursorError, decode_cursor, encode_cursor
+from .context import pack_context, render_bundle
+from .frontmatter import (
+    FrontmatterError,
+    atomic_write_text,
+    dump_frontmatter,
+    patch_frontmatter,
+    read_doc,
+    read_meta,
+    split_frontmatter,
+)
+from .gitutil import (
+    CatFileBatch,
+    GitError,
+    changed_paths,
+    git_process_started,
+    head_commit,
+    ls_files_sparse,
+    run_git,
+    sparse_checkout_enabled,
+    staged_changes,
+)
+from .history import HistoryIndex
+from .idset import CommittedIds
+from .index import AmbiguousIdError, IdIndex, is_id_prefix
+from .metrics import RunMetrics, append_jsonl, write_prometheus
+from .notes import iter_note_paths
+from .parsecache import (
+    NoteRecord,
+    ParseCache,
+    load_note_records,
+    load_sparse_records,
+    parse_note_bytes,
+)
+from .pushqueue import PushQueue
 from .repo import Repo, RepoError, open_repo
-from .timeutil import iso_jst_minute, now_jst
-from .ulidutil import is_ulid, new_ulid
+from .rules import (
+    CompiledRules,
+    compile_rules,
+    file_template,
+    normalize_os_name,
+    parse_iso_dt,
+    string_list,
+)
+from .searchcache import SearchCache, worktree_state
+from .sections import Section, find_section, read_section, section_at_line, sections_of
+from .textsearch import is_literal, search as _builtin_search
+from .timeutil import JST, iso_jst_minute, now_jst
+from .ulidutil import is_ulid, new_ulids, ulid_timestamp_ms
 
 
 @dataclass
 class Ctx:
     repo: Repo
+    compiled: CompiledRules  # ``repo.rules`` compiled once per invocation
 
 
+T = TypeVar("T")
+U = TypeVar("U")
+
 AUTO_RELATED_START = "<!-- kb:auto-related-links:start -->"
 AUTO_RELATED_END = "<!-- kb:auto-related-links:end -->"
 
 
-def _rules_scope_values(rules: dict[str, Any]) -> list[str]:
-    fm = rules.get("frontmatter", {})
-    if not isinstance(fm, dict):
-        raise RepoError("Invalid rules: frontmatter must be a mapping")
-    scope = fm.get("scope", {})
-    if not isinstance(scope, dict):
-        raise RepoError("Invalid rules: frontmatter.scope must be a mapping")
-    allowed = scope.get("allowed", ["cross", "os-specific"])
-    if not isinstance(allowed, list) or not all(isinstance(x, str) for x in allowed):
-        raise RepoError("Invalid rules: frontmatter.scope.allowed")
-    values = [x.strip().lower() for x in allowed if x.strip()]
-    if not values:
-        raise RepoError("Invalid rules: frontmatter.scope.allowed must not be empty")
-    return values
-
-
-def _rules_created_os_values(rules: dict[str, Any]) -> list[str]:
-    fm = rules.get("frontmatter", {})
-    if not isinstance(fm, dict):
-        raise RepoError("Invalid rules: frontmatter must be a mapping")
-    created_os = fm.get("created_os", {})
-    if not isinstance(created_os, dict):
-        raise RepoError("Invalid rules: frontmatter.created_os must be a mapping")
-    allowed = created_os.get("allowed", ["macos", "linux", "windows", "other"])
-    if not isinstance(allowed, list) or not all(isinstance(x, str) for x in allowed):
-        raise RepoError("Invalid rules: frontmatter.created_os.allowed")
-    values = [x.strip().lower() for x in allowed if x.strip()]
-    if not values:
-        raise RepoError(
-            "Invalid rules: frontmatter.created_os.allowed must not be empty"
-        )
-    return values
-
-
-def _rules_list(rules: dict[str, Any], key: str) -> list[str]:
-    v = rules.get(key, [])
-    if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
-        raise RepoError(f"Invalid rules field: {key}")
-    return list(v)
-
-
 def _placement_dir(repo_root: Path, rules: dict[str, Any], kind: str, domain: str) -> Path:
     placement = rules.get("placement", {})
     if not isinstance(placement, dict):
@@ -90,6 +105,58 @@ def _placement_dir(repo_root: Path, rules: dict[str, Any], kind: str, domain: st
     return repo_root / str(domain_dir)
 
 
+def _note_dir_state(directory: Path, limit: int) -> tuple[int, bool]:
+    """(notes in ``directory``, counted up to ``limit``; whether it is already sharded).
+
+    Only as much is read as the shard decision needs: the first note found
+    in a subdirectory settles it, and counting stops at ``limit``.
+    """
+    if not directory.is_dir():
+        return 0, False
+    for child in directory.iterdir():
+        if child.is_dir() and next(child.rglob("*.md"), None) is not None:
+            return 0, True
+    return sum(1 for _p in islice(directory.glob("*.md"), limit)), False
+
+
+def _shard_dir(
+    compiled: CompiledRules, base: Path, note_id: str, count: int, *, sharded: bool
+) -> Path:
+    """``base`` or its shard for ``note_id``, given ``count`` notes destined for ``base``.
+
+    A directory is split once it passes the threshold and stays split
+    (``sharded``) when it shrinks again, so notes near the threshold do not
+    move back and forth. Dropping ``placement.shard`` flattens it.
+    """
+    shard = compiled.shard
+    if shard is None or (count <= shard.threshold and not sharded):
+        return base
+    return base / shard.subdir(note_id)
+
+
+def _new_note_dir(
+    repo_root: Path,
+    rules: dict[str, Any],
+    compiled: CompiledRules,
+    meta: dict[str, Any],
+    counts: dict[Path, tuple[int, bool]],
+) -> Path:
+    """Placement for a note being added; ``counts`` memoizes ``_note_dir_state``."""
+    base = _placement_dir(repo_root, rules, meta["kind"], meta["domain"])
+    if compiled.shard is None:
+        return base
+    count, sharded = counts.get(base) or _note_dir_state(base, compiled.shard.threshold + 1)
+    counts[base] = (count + 1, sharded)
+    return _shard_dir(compiled, base, str(meta["id"]), count + 1, sharded=sharded)
+
+
+def _drafts_dir(repo_root: Path, rules: dict[str, Any]) -> Path:
+    placement = rules.get("placement", {})
+    if not isinstance(placement, dict):
+        raise RepoError("Invalid rules: placement must be a mapping")
+    return repo_root / str(placement.get("drafts_dir", "notes/drafts"))
+
+
 def _default_slug(kind: str) -> str:
     # Slug is fixed and does not need to be human-semantic. Keep it stable.
     return kind
@@ -122,39 +189,11 @@ def _note_template(kind: str) -> str:
     return templates.get(kind, "## 本文\n\n")
 
 
-def _parse_iso_dt(value: str) -> datetime | None:
-    try:
-        return datetime.fromisoformat(value)
-    except Exception:
-        return None
-
-
-def _filename_matches_template(name: str, note_id: str, template: str) -> bool:
-    pattern = re.escape(template)
-    pattern = pattern.replace(re.escape("{id}"), re.escape(note_id))
-    pattern = pattern.replace(
-        re.escape("{slug}"),
-        r"[a-z0-9]+(?:-[a-z0-9]+)*",
-    )
-    return re.fullmatch(pattern, name) is not None
-
-
-def _normalize_os_name(value: str) -> str:
-    raw = value.strip().lower()
-    if raw in ("macos", "darwin", "mac"):
-        return "macos"
-    if raw in ("linux",):
-        return "linux"
-    if raw in ("windows", "win32", "win"):
-        return "windows"
-    return "other"
-
-
 def _detect_created_os() -> str:
     env_value = os.environ.get("KB_CREATED_OS")
     if env_value and env_value.strip():
-        return _normalize_os_name(env_value)
-    return _normalize_os_name(platform.system())
+        return normalize_os_name(env_value)
+    return normalize_os_name(platform.system())
 
 
 def _detect_created_by() -> str:
@@ -207,6 +246,7 @@ def _note_link_label(meta: dict[str, Any], fallback: str) -> str:
 def _build_related_block(
     related_ids: list[str],
     note_index: dict[str, tuple[str, dict[str, Any]]],
+    archived: dict[str, ArchivedNote] | None = None,
 ) -> str | None:
     if not related_ids:
         return None
@@ -214,7 +254,12 @@ def _build_related_block(
     for rid in related_ids:
         hit = note_index.get(rid)
         if hit is None:
-            lines.append(f"- [missing] {rid}")
+            entry = (archived or {}).get(rid)
+            if entry is None:
+                lines.append(f"- [missing] {rid}")
+            else:
+                # Not in the vault, so no wikilink; kb show still reads it.
+                lines.append(f"- [archived] {_note_link_label(entry.meta, entry.stem)} ({rid})")
             continue
         stem, meta = hit
         label = _note_link_label(meta, stem)
@@ -236,24 +281,15 @@ def _replace_related_block(body: str, block: str | None) -> str:
     return block
 
 
-def _is_tracked(repo_root: Path, path: Path) -> bool:
-    rel = os.fspath(path.relative_to(repo_root))
-    try:
-        subprocess.run(
-            ["git", "ls-files", "--error-unmatch", rel],
-            cwd=repo_root,
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        return True
-    except Exception:
-        return False
+def _run_git_cmd(cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess[Any]:
+    """``subprocess.run`` for a git command line, counted for run metrics."""
+    git_process_started()
+    return subprocess.run(cmd, **kwargs)
 
 
 def _has_git_worktree(repo_root: Path) -> bool:
     try:
-        subprocess.run(
+        _run_git_cmd(
             ["git", "rev-parse", "--is-inside-work-tree"],
             cwd=repo_root,
             check=True,
@@ -274,7 +310,7 @@ def _require_git_worktree(repo_root: Path) -> None:
 
 
 def _has_upstream(repo_root: Path) -> bool:
-    result = subprocess.run(
+    result = _run_git_cmd(
         ["git", "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{upstream}"],
         cwd=repo_root,
         check=False,
@@ -290,26 +326,79 @@ def _has_upstream(repo_root: Path) -> bool:
     return True
 
 
-def _git_pull_ff_only(repo_root: Path, *, allow_no_upstream: bool = False) -> None:
+def _git_pull_ff_only(
+    repo_root: Path, *, allow_no_upstream: bool = False, label: str | None = None
+) -> None:
+    """``git pull --ff-only``; ``label`` tags its messages when several repos pull at once."""
+    where = f"{label}: " if label is not None else ""
     if not _has_upstream(repo_root):
         if allow_no_upstream:
             click.echo(
-                "No upstream is configured yet; skipping git pull --ff-only for initial bootstrap.",
+                f"{where}No upstream is configured yet; "
+                "skipping git pull --ff-only for initial bootstrap.",
                 err=True,
             )
             return
         raise click.ClickException(
-            "git upstream is not configured. Set upstream first, then retry."
+            f"{where}git upstream is not configured. Set upstream first, then retry."
         )
 
+    # Commands print machine-readable results on stdout; git's chatter goes to
+    # stderr, in one write so concurrent pulls do not interleave mid-output.
     try:
-        subprocess.run(["git", "pull", "--ff-only"], cwd=repo_root, check=True)
+        result = _run_git_cmd(
+            ["git", "pull", "--ff-only"],
+            cwd=repo_root,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
     except subprocess.CalledProcessError as e:
-        raise click.ClickException("git pull --ff-only failed") from e
+        _echo_git_output(e.output, where)
+        raise click.ClickException(f"{where}git pull --ff-only failed") from e
+    _echo_git_output(result.stdout, where)
+
+
+def _echo_git_output(output: str | None, prefix: str) -> None:
+    if output:
+        lines = output.splitlines(keepends=True)
+        click.echo("".join(prefix + line for line in lines), err=True, nl=False)
+
+
+class _BackgroundPull:
+    """Run ``pull`` (the upstream check and ``git pull``) on a worker thread.
+
+    Commands start it first, warm up whatever does not depend on the pulled
+    tree, then call ``changed`` before producing any result, so output still
+    reflects the pulled state. ``changed`` names the files the pull touched,
+    so a warmed-up index only has to re-read those.
+    """
+
+    def __init__(self, repo_root: Path, pull: Callable[[], None]) -> None:
+        self.repo_root = repo_root
+        pool = ThreadPoolExecutor(max_workers=1)
+        self._future = pool.submit(self._run, pull)
+        pool.shutdown(wait=False)
+
+    def _run(self, pull: Callable[[], None]) -> tuple[str | None, str | None]:
+        before = head_commit(self.repo_root)
+        pull()
+        return before, head_commit(self.repo_root)
+
+    def changed(self, dirs: Iterable[str]) -> list[str]:
+        """Wait for the pull (re-raising its error); paths it changed under ``dirs``."""
+        before, after = self._future.result()
+        if after is None or before == after:
+            return []
+        try:
+            return changed_paths(self.repo_root, before, after, dirs)
+        except GitError as e:
+            raise click.ClickException(str(e)) from e
 
 
-def _git_commit_and_push(repo_root: Path, message: str) -> bool:
-    status = subprocess.run(
+def _git_commit(repo_root: Path, message: str) -> bool:
+    status = _run_git_cmd(
         ["git", "status", "--porcelain"],
         cwd=repo_root,
         check=True,
@@ -320,22 +409,89 @@ def _git_commit_and_push(repo_root: Path, message: str) -> bool:
     if not status.stdout.strip():
         return False
 
-    subprocess.run(["git", "add", "-A"], cwd=repo_root, check=True)
-    subprocess.run(["git", "commit", "-m", message], cwd=repo_root, check=True)
+    _run_git_cmd(["git", "add", "-A"], cwd=repo_root, check=True)
+    _run_git_cmd(["git", "commit", "-m", message], cwd=repo_root, check=True)
+    return True
+
+
+def _git_commit_and_push(repo_root: Path, message: str) -> bool:
+    if not _git_commit(repo_root, message):
+        return False
     if _has_upstream(repo_root):
-        subprocess.run(["git", "push"], cwd=repo_root, check=True)
+        _run_git_cmd(["git", "push"], cwd=repo_root, check=True)
     else:
-        subprocess.run(["git", "push", "-u", "origin", "HEAD"], cwd=repo_root, check=True)
+        _run_git_cmd(["git", "push", "-u", "origin", "HEAD"], cwd=repo_root, check=True)
     return True
 
 
-def _move_path(repo_root: Path, src: Path, dst: Path) -> None:
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    rel_src = os.fspath(src.relative_to(repo_root))
-    rel_dst = os.fspath(dst.relative_to(repo_root))
-    if not _is_tracked(repo_root, src):
-        subprocess.run(["git", "add", rel_src], cwd=repo_root, check=True)
-    subprocess.run(["git", "mv", rel_src, rel_dst], cwd=repo_root, check=True)
+def _git_commit_and_queue_push(repo_root: Path, message: str) -> bool:
+    """Commit now and leave the push to a background ``kb sync --worker``."""
+    if not _git_commit(repo_root, message):
+        return False
+    head = run_git(repo_root, "rev-parse", "HEAD").decode().strip()
+    queue = PushQueue.for_repo(repo_root)
+    queue.enqueue(head, message)
+    queue.spawn_worker(repo_root)
+    click.echo(f"push queued ({len(queue.pending())} pending; run kb sync to flush)", err=True)
+    return True
+
+
+def _commit(repo_root: Path, message: str, *, defer_push: bool) -> bool:
+    if defer_push:
+        return _git_commit_and_queue_push(repo_root, message)
+    return _git_commit_and_push(repo_root, message)
+
+
+_defer_push_option = click.option(
+    "--defer-push",
+    is_flag=True,
+    default=False,
+    envvar="KB_DEFER_PUSH",
+    help="Commit locally and push from a background queue (see kb sync).",
+)
+
+
+def _move_paths(
+    repo_root: Path, moves: list[tuple[Path, Path]], prune_below: Iterable[Path] = ()
+) -> None:
+    """``git mv`` each (src, dst), staging untracked sources first.
+
+    One ls-files, one add and one mv per target directory, however many moves.
+    Source directories left empty are removed if they lie strictly below one
+    of ``prune_below`` (shard subdirectories of a placement directory).
+    """
+    rel_moves = [(os.fspath(src.relative_to(repo_root)), dst) for src, dst in moves]
+    tracked = _run_git_cmd(
+        ["git", "ls-files", "-z", "--", *(rel for rel, _ in rel_moves)],
+        cwd=repo_root,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ).stdout.split("\0")
+    untracked = [rel for rel, _ in rel_moves if rel not in tracked]
+    if untracked:
+        _run_git_cmd(["git", "add", "--", *untracked], cwd=repo_root, check=True)
+
+    by_dir: dict[Path, list[str]] = {}
+    for rel, dst in rel_moves:
+        by_dir.setdefault(dst.parent, []).append(rel)
+    for dst_dir, rels in by_dir.items():
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        rel_dir = os.fspath(dst_dir.relative_to(repo_root))
+        _run_git_cmd(["git", "mv", "--", *rels, rel_dir + "/"], cwd=repo_root, check=True)
+
+    # Drop shard directories a migration left empty (e.g. 2026/02, then 2026),
+    # but never a placement directory itself.
+    bases = {b.resolve() for b in prune_below}
+    for src_dir in {src.parent for src, _ in moves}:
+        d = src_dir.resolve()
+        while any(base in d.parents for base in bases):
+            try:
+                d.rmdir()
+            except OSError:
+                break
+            d = d.parent
 
 
 @click.group()
@@ -344,147 +500,1079 @@ def main(ctx: click.Context) -> None:
     """kb repository helper CLI."""
     try:
         repo = open_repo()
+        compiled = compile_rules(repo.rules)
     except RepoError as e:
         raise click.ClickException(str(e))
-    ctx.obj = Ctx(repo=repo)
+    ctx.obj = Ctx(repo=repo, compiled=compiled)
+
+
+@dataclass(frozen=True)
+class _NewNoteSpec:
+    kind: str = "note"
+    domain: str = "cross"
+    title: str | None = None
+    summary: str = ""
+    tags: tuple[str, ...] = ()
+    related_ids: tuple[str, ...] = ()
+    slug: str | None = None
+    scope: str | None = None
+
+
+def _parse_new_note_spec(raw: Any) -> _NewNoteSpec:
+    if not isinstance(raw, dict):
+        raise click.ClickException("note spec must be a JSON object")
+    unknown = set(raw) - {
+        "kind",
+        "domain",
+        "title",
+        "summary",
+        "tags",
+        "related",
+        "slug",
+        "scope",
+    }
+    if unknown:
+        raise click.ClickException(f"unknown field(s): {sorted(unknown)}")
+
+    def _opt_str(key: str) -> str | None:
+        v = raw.get(key)
+        if v is not None and not isinstance(v, str):
+            raise click.ClickException(f"{key} must be a string")
+        return v
+
+    def _str_list(key: str) -> tuple[str, ...]:
+        v = raw.get(key, [])
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
+            raise click.ClickException(f"{key} must be a string list")
+        return tuple(v)
+
+    return _NewNoteSpec(
+        kind=_opt_str("kind") or "note",
+        domain=_opt_str("domain") or "cross",
+        title=_opt_str("title"),
+        summary=_opt_str("summary") or "",
+        tags=_str_list("tags"),
+        related_ids=_str_list("related"),
+        slug=_opt_str("slug"),
+        scope=_opt_str("scope"),
+    )
+
+
+def _validate_new_note_spec(
+    compiled: CompiledRules, spec: _NewNoteSpec
+) -> tuple[dict[str, Any], str]:
+    """Validate a note spec and return (partial meta, slug) without touching disk."""
+    kinds = compiled.kinds
+    domains = compiled.domains
+    scope_values = compiled.scopes
+
+    if spec.kind not in kinds:
+        raise click.ClickException(
+            f"Invalid kind: {spec.kind} (allowed: {sorted(kinds)})"
+        )
+    if spec.domain not in domains:
+        raise click.ClickException(
+            f"Invalid domain: {spec.domain} (allowed: {sorted(domains)})"
+        )
+
+    summary = (spec.summary or "").strip()
+    if not summary:
+        raise click.ClickException("--summary must be non-empty")
+
+    for rid in spec.related_ids:
+        # Unique prefixes are expanded against the index by the caller.
+        if not is_id_prefix(rid.strip()):
+            raise click.ClickException(f"Invalid related ULID: {rid}")
+
+    normalized_scope = (spec.scope or "").strip().lower() or "cross"
+    if normalized_scope not in scope_values:
+        raise click.ClickException(
+            f"Invalid scope: {normalized_scope} (allowed: {sorted(scope_values)})"
+        )
+
+    slug = (spec.slug or _default_slug(spec.kind)).strip()
+    if not re.fullmatch(r"[a-z0-9]+(?:-[a-z0-9]+)*", slug):
+        raise click.ClickException(
+            f"Invalid slug: {slug} (expected lowercase kebab-case)"
+        )
+
+    meta: dict[str, Any] = {
+        "kind": spec.kind,
+        "domain": spec.domain,
+        "scope": normalized_scope,
+        "summary": summary,
+    }
+
+    if spec.title is not None and spec.title.strip():
+        meta["title"] = spec.title.strip()
+
+    if spec.tags:
+        meta["tags"] = [t.strip().lower() for t in spec.tags if t.strip()]
+
+    if spec.related_ids:
+        meta["related"] = [rid.strip().upper() for rid in spec.related_ids]
+
+    return meta, slug
+
+
+def _detect_creator(compiled: CompiledRules) -> tuple[str, str]:
+    created_os_values = compiled.created_os
+    created_by = _detect_created_by()
+    created_os = _detect_created_os()
+    if created_os not in created_os_values:
+        raise click.ClickException(
+            f"Invalid detected created_os: {created_os} "
+            f"(allowed: {sorted(created_os_values)})"
+        )
+    return created_by, created_os
+
+
+def _write_new_note(
+    repo_root: Path,
+    rules: dict[str, Any],
+    compiled: CompiledRules,
+    meta: dict[str, Any],
+    slug: str,
+    counts: dict[Path, tuple[int, bool]],
+) -> Path:
+    out_dir = _new_note_dir(repo_root, rules, compiled, meta, counts)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    out_path = out_dir / compiled.file_template.format(id=meta["id"], slug=slug)
+
+    body = _note_template(meta["kind"])
+    text = dump_frontmatter(meta, body)
+    out_path.write_text(text, encoding="utf-8")
+    return out_path
+
+
+def _read_new_note_batch(
+    compiled: CompiledRules, stream: Any
+) -> list[tuple[dict[str, Any], str]]:
+    prepared: list[tuple[dict[str, Any], str]] = []
+    problems: list[str] = []
+    for lineno, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            spec = _parse_new_note_spec(json.loads(line))
+            prepared.append(_validate_new_note_spec(compiled, spec))
+        except json.JSONDecodeError as e:
+            problems.append(f"line {lineno}: invalid JSON: {e.msg}")
+        except click.ClickException as e:
+            problems.append(f"line {lineno}: {e.message}")
+
+    if problems:
+        for p in problems:
+            click.echo(p, err=True)
+        raise click.ClickException(
+            f"batch validation failed: {len(problems)} problem(s); nothing was written"
+        )
+    return prepared
 
 
 @main.command("new")
 @click.option("--kind", type=str, default="note", show_default=True)
 @click.option("--domain", type=str, default="cross", show_default=True)
 @click.option("--title", type=str, default=None)
-@click.option("--summary", type=str, required=True)
+@click.option("--summary", type=str, default=None)
 @click.option("--tag", "tags", type=str, multiple=True)
 @click.option("--related", "related_ids", type=str, multiple=True)
 @click.option("--slug", type=str, default=None)
 @click.option("--scope", type=str, default=None)
+@click.option(
+    "--batch",
+    is_flag=True,
+    default=False,
+    help="Read note specs as JSONL from stdin and create them with one commit.",
+)
+@_defer_push_option
 @click.pass_obj
 def cmd_new(
     ctx: Ctx,
     kind: str,
     domain: str,
     title: str | None,
-    summary: str,
+    summary: str | None,
     tags: tuple[str, ...],
     related_ids: tuple[str, ...],
     slug: str | None,
     scope: str | None,
+    batch: bool,
+    defer_push: bool,
 ) -> None:
     rules = ctx.repo.rules
+    compiled = ctx.compiled
     repo_root = ctx.repo.root
     _require_git_worktree(repo_root)
-    _git_pull_ff_only(repo_root, allow_no_upstream=True)
-
-    kinds = set(_rules_list(rules, "kinds"))
-    domains = set(_rules_list(rules, "domains"))
-    scope_values = set(_rules_scope_values(rules))
-    created_os_values = set(_rules_created_os_values(rules))
 
-    if kind not in kinds:
-        raise click.ClickException(f"Invalid kind: {kind} (allowed: {sorted(kinds)})")
-    if domain not in domains:
-        raise click.ClickException(
-            f"Invalid domain: {domain} (allowed: {sorted(domains)})"
+    if batch:
+        # Validate everything before the first network round-trip or write so a
+        # bad line never leaves a half-imported batch behind.
+        prepared = _read_new_note_batch(compiled, sys.stdin)
+        if not prepared:
+            click.echo("No notes in batch", err=True)
+            return
+    else:
+        spec = _NewNoteSpec(
+            kind=kind,
+            domain=domain,
+            title=title,
+            summary=summary or "",
+            tags=tags,
+            related_ids=related_ids,
+            slug=slug,
+            scope=scope,
+        )
+        prepared = [_validate_new_note_spec(compiled, spec)]
+
+    created_by, created_os = _detect_creator(compiled)
+    pull = None
+    if not defer_push:
+        # New notes get fresh ULID file names and cannot conflict, so a
+        # deferred push skips the pull too; a rejected push waits for `kb sync` to rebase.
+        pull = _BackgroundPull(
+            repo_root, lambda: _git_pull_ff_only(repo_root, allow_no_upstream=True)
         )
 
-    summary = (summary or "").strip()
-    if not summary:
-        raise click.ClickException("--summary must be non-empty")
+    # Related prefixes resolve against the pulled tree; list the notes meanwhile.
+    index = None
+    related = [rid for partial, _slug in prepared for rid in partial.get("related", [])]
+    if any(not is_ulid(rid.strip().upper()) for rid in related):
+        index = _note_id_index(repo_root, compiled)
+    if pull is not None:
+        changed = pull.changed(_index_dirs(compiled))
+        if index is not None and changed:
+            index = _refresh_note_id_index(repo_root, compiled, index, changed)
+    expand = _id_expander(repo_root, compiled, index)
+    for partial, _slug in prepared:
+        if "related" in partial:
+            partial["related"] = [expand(rid) for rid in partial["related"]]
+
+    note_ids = new_ulids(len(prepared))
+    ts = iso_jst_minute(now_jst())
+    counts: dict[Path, tuple[int, bool]] = {}
+    for note_id, (partial, note_slug) in zip(note_ids, prepared):
+        meta: dict[str, Any] = {
+            "id": note_id,
+            **partial,
+            "created_by": created_by,
+            "created_os": created_os,
+            "created": ts,
+            "updated": ts,
+        }
+        out_path = _write_new_note(repo_root, rules, compiled, meta, note_slug, counts)
+        if batch:
+            click.echo(os.fspath(out_path.relative_to(repo_root)))
+
+    if batch:
+        _commit(repo_root, f"ナレッジを一括追加: {len(note_ids)}件", defer_push=defer_push)
+        return
 
-    for rid in related_ids:
-        if not is_ulid(rid):
-            raise click.ClickException(f"Invalid related ULID: {rid}")
+    _commit(repo_root, f"ナレッジを追加: {note_ids[0]}", defer_push=defer_push)
+    click.echo(os.fspath(out_path.relative_to(repo_root)))
 
-    normalized_scope = (scope or "").strip().lower() or "cross"
-    if normalized_scope not in scope_values:
-        raise click.ClickException(
-            f"Invalid scope: {normalized_scope} (allowed: {sorted(scope_values)})"
-        )
 
-    created_by = _detect_created_by()
-    created_os = _detect_created_os()
-    if created_os not in created_os_values:
-        raise click.ClickException(
-            f"Invalid detected created_os: {created_os} "
-            f"(allowed: {sorted(created_os_values)})"
-        )
+def _body_hash(body: str) -> str:
+    # The auto-related block is regenerated by organize, so it must not make an
+    # otherwise identical draft look new.
+    normalized = _replace_related_block(body, None).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
-    note_id = new_ulid()
-    ts = iso_jst_minute(now_jst())
 
-    meta: dict[str, Any] = {
-        "id": note_id,
-        "kind": kind,
-        "domain": domain,
-        "scope": normalized_scope,
-        "created_by": created_by,
-        "created_os": created_os,
-        "summary": summary,
-        "created": ts,
-        "updated": ts,
-    }
+def _provisional_summary(meta: dict[str, Any], body: str, fallback: str) -> str:
+    title = meta.get("title")
+    if isinstance(title, str) and title.strip():
+        return title.strip()
+    for line in body.splitlines():
+        text = line.strip().lstrip("#").strip()
+        if text:
+            return text[:80]
+    return fallback
+
+
+@dataclass(frozen=True)
+class _Draft:
+    path: Path
+    meta: dict[str, Any]
+    body: str
+    body_hash: str
+
+
+def _read_draft(path: Path) -> _Draft:
+    text = path.read_text(encoding="utf-8")
+    if text.lstrip("\ufeff").startswith("---"):
+        doc = split_frontmatter(text.lstrip("\ufeff"))
+        meta, body = doc.meta, doc.body
+    else:
+        meta, body = {}, text
+    return _Draft(path=path, meta=meta, body=body, body_hash=_body_hash(body))
 
-    if title is not None and title.strip():
-        meta["title"] = title.strip()
 
-    if tags:
-        meta["tags"] = [t.strip().lower() for t in tags if t.strip()]
+def _existing_body_hash(path: Path) -> tuple[str, Path] | None:
+    try:
+        return _body_hash(read_doc(path).body), path
+    except (OSError, FrontmatterError):
+        return None
 
-    if related_ids:
-        meta["related"] = [rid.upper() for rid in related_ids]
 
-    out_dir = _placement_dir(repo_root, rules, kind, domain)
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _fill_draft_meta(
+    compiled: CompiledRules,
+    draft: _Draft,
+    *,
+    note_id: str,
+    ts: str,
+    created_by: str,
+    created_os: str,
+) -> tuple[dict[str, Any], list[str]]:
+    """Complete mechanical fields; return the meta and the decisions left open."""
+    meta = dict(draft.meta)
+    pending: list[str] = []
+
+    existing_id = str(meta.get("id", "")).strip().upper()
+    meta["id"] = existing_id if is_ulid(existing_id) else note_id
+
+    if meta.get("kind") not in compiled.kinds:
+        meta["kind"] = "inbox"
+        pending.append("kind")
+    if meta.get("domain") not in compiled.domains:
+        meta["domain"] = "cross"
+        pending.append("domain")
+    summary = meta.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        meta["summary"] = _provisional_summary(meta, draft.body, draft.path.stem)
+        pending.append("summary")
+
+    scope = meta.get("scope")
+    if not isinstance(scope, str) or scope.strip().lower() not in compiled.scopes:
+        meta["scope"] = "cross"
+    else:
+        meta["scope"] = scope.strip().lower()
+
+    if not isinstance(meta.get("created_by"), str) or not meta["created_by"].strip():
+        meta["created_by"] = created_by
+    os_value = meta.get("created_os")
+    if isinstance(os_value, str) and os_value.strip():
+        os_value = normalize_os_name(os_value)
+    meta["created_os"] = os_value if os_value in compiled.created_os else created_os
+
+    created = meta.get("created")
+    if not isinstance(created, str) or parse_iso_dt(created.strip()) is None:
+        meta["created"] = ts
+    meta["updated"] = ts
+    return meta, pending
+
+
+def _echo_ingest_report(
+    ingested: list[dict[str, Any]],
+    duplicates: list[dict[str, str]],
+    errors: list[dict[str, str]],
+) -> None:
+    report = {"ingested": ingested, "duplicates": duplicates, "errors": errors}
+    click.echo(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+@main.command("ingest")
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Number of threads used to read and hash notes.",
+)
+@click.pass_obj
+def cmd_ingest(ctx: Ctx, workers: int) -> None:
+    rules = ctx.repo.rules
+    compiled = ctx.compiled
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    _git_pull_ff_only(repo_root, allow_no_upstream=True)
 
-    slug = (slug or _default_slug(kind)).strip()
-    if not re.fullmatch(r"[a-z0-9]+(?:-[a-z0-9]+)*", slug):
-        raise click.ClickException(
-            f"Invalid slug: {slug} (expected lowercase kebab-case)"
+    drafts_dir = _drafts_dir(repo_root, rules)
+    draft_paths = (
+        sorted(p for p in drafts_dir.rglob("*.md") if p.is_file())
+        if drafts_dir.exists()
+        else []
+    )
+    if not draft_paths:
+        _echo_ingest_report([], [], [])
+        return
+
+    created_by, created_os = _detect_creator(compiled)
+    note_dirs = compiled.note_dirs
+    errors: list[dict[str, str]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        existing = pool.map(_existing_body_hash, iter_note_paths(repo_root, note_dirs))
+        draft_futures = [(p, pool.submit(_read_draft, p)) for p in draft_paths]
+        known: dict[str, Path] = {}
+        for hit in existing:
+            if hit is not None:
+                known.setdefault(*hit)
+        drafts: list[_Draft] = []
+        for p, fut in draft_futures:
+            try:
+                drafts.append(fut.result())
+            except (OSError, UnicodeDecodeError, FrontmatterError) as e:
+                rel = os.fspath(p.relative_to(repo_root))
+                errors.append({"draft": rel, "error": str(e)})
+
+    # Drafts may carry an id already; it must not be taken anywhere in the repo.
+    id_index = _note_id_index(repo_root, compiled)
+    taken: set[str] = set()
+    ts = iso_jst_minute(now_jst())
+    planned: list[tuple[_Draft, Path, str, dict[str, Any], list[str]]] = []
+    duplicates: list[dict[str, str]] = []
+    counts: dict[Path, tuple[int, bool]] = {}
+    for draft, note_id in zip(drafts, new_ulids(len(drafts))):
+        rel_draft = os.fspath(draft.path.relative_to(repo_root))
+        dup = known.get(draft.body_hash)
+        if dup is not None:
+            rel_dup = os.fspath(dup.relative_to(repo_root))
+            duplicates.append({"draft": rel_draft, "duplicate_of": rel_dup})
+            continue
+        meta, pending = _fill_draft_meta(
+            compiled,
+            draft,
+            note_id=note_id,
+            ts=ts,
+            created_by=created_by,
+            created_os=created_os,
         )
+        owner = id_index.get(meta["id"])
+        if owner is not None or meta["id"] in taken:
+            where = os.fspath(owner.relative_to(repo_root)) if owner else "another draft"
+            errors.append({"draft": rel_draft, "error": f"id already in use: {where}"})
+            continue
+        out_dir = _new_note_dir(repo_root, rules, compiled, meta, counts)
+        out_path = out_dir / compiled.file_template.format(
+            id=meta["id"], slug=_default_slug(meta["kind"])
+        )
+        if out_path.exists():
+            error = f"target exists: {out_path.name}"
+            errors.append({"draft": rel_draft, "error": error})
+            continue
+        known[draft.body_hash] = out_path
+        taken.add(meta["id"])
+        planned.append((draft, out_path, rel_draft, meta, pending))
+
+    def _write(item: tuple[_Draft, Path, str, dict[str, Any], list[str]]) -> None:
+        draft, out_path, _rel, meta, _pending = item
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(dump_frontmatter(meta, draft.body), encoding="utf-8")
+        draft.path.unlink()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_write, planned))
+
+    ingested = [
+        {
+            "draft": rel_draft,
+            "path": os.fspath(out_path.relative_to(repo_root)),
+            "id": meta["id"],
+            "kind": meta["kind"],
+            "domain": meta["domain"],
+            "summary": meta["summary"],
+            "pending": pending,
+        }
+        for _draft, out_path, rel_draft, meta, pending in planned
+    ]
+    if planned:
+        _git_commit_and_push(repo_root, f"下書きを取り込み: {len(planned)}件")
+    _echo_ingest_report(ingested, duplicates, errors)
+    if errors:
+        raise click.ClickException(f"ingest finished with {len(errors)} error(s)")
 
-    filename = (rules.get("naming", {}) or {}).get("file_template", "{slug}--{id}.md")
-    if not isinstance(filename, str):
-        filename = "{slug}--{id}.md"
-    out_path = out_dir / filename.format(id=note_id, slug=slug)
 
-    body = _note_template(kind)
-    text = dump_frontmatter(meta, body)
-    out_path.write_text(text, encoding="utf-8")
-    _git_commit_and_push(repo_root, f"ナレッジを追加: {note_id}")
-    click.echo(os.fspath(out_path.relative_to(repo_root)))
+def _archive(repo_root: Path, compiled: CompiledRules) -> Archive | None:
+    policy = compiled.archive
+    return None if policy is None else Archive(repo_root, policy.dir)
+
+
+def _archived_entries(archive: Archive | None) -> dict[str, ArchivedNote]:
+    if archive is None:
+        return {}
+    try:
+        return archive.entries()
+    except ArchiveError as e:
+        raise click.ClickException(str(e)) from e
+
+
+def _note_id_index(repo_root: Path, compiled: CompiledRules) -> IdIndex:
+    """Ids from file names, including notes outside a sparse checkout or archived."""
+    paths = list(iter_note_paths(repo_root, compiled.note_dirs))
+    if sparse_checkout_enabled(repo_root):
+        sparse = ls_files_sparse(repo_root, compiled.note_dirs)
+        paths.extend(repo_root / rel for rel in sparse)
+    index = IdIndex.from_paths(paths, compiled.file_template)
+    archive = _archive(repo_root, compiled)
+    if archive is not None:
+        archived = [
+            (note_id, repo_root / entry.label)
+            for note_id, entry in _archived_entries(archive).items()
+            if index.get(note_id) is None
+        ]
+        if archived:
+            index = IdIndex([*zip(index.ids, index.paths), *archived])
+    return index
+
+
+def _index_dirs(compiled: CompiledRules) -> list[str]:
+    """Directories ``_note_id_index`` reads: the note dirs plus the archive."""
+    dirs = list(compiled.note_dirs)
+    if compiled.archive is not None:
+        dirs.append(compiled.archive.dir)
+    return dirs
+
+
+def _refresh_note_id_index(
+    repo_root: Path, compiled: CompiledRules, index: IdIndex, changed: list[str]
+) -> IdIndex:
+    """``index`` after a pull changed the files in ``changed``; only those are re-listed."""
+    archive = compiled.archive
+    if sparse_checkout_enabled(repo_root) or (
+        archive is not None and any(rel.startswith(f"{archive.dir}/") for rel in changed)
+    ):
+        return _note_id_index(repo_root, compiled)  # catalog or archive entries moved too
+    stale = [(repo_root / rel).resolve() for rel in changed]
+    return index.refreshed(stale, compiled.file_template)
+
+
+def _id_expander(
+    repo_root: Path, compiled: CompiledRules, index: IdIndex | None = None
+) -> Callable[[str], str]:
+    """Map a full ULID or a unique prefix of one to the full ULID.
+
+    Without a prebuilt ``index`` one is only built the first time a prefix
+    needs resolving.
+    """
+
+    def expand(value: str) -> str:
+        nonlocal index
+        value = value.strip().upper()
+        if is_ulid(value):
+            return value
+        if not is_id_prefix(value):
+            raise click.ClickException(f"Invalid ULID: {value}")
+        if index is None:
+            index = _note_id_index(repo_root, compiled)
+        try:
+            found = index.resolve(value)
+        except AmbiguousIdError as e:
+            shown = [
+                f"  {nid} {os.fspath(p.relative_to(repo_root))}" for nid, p in e.candidates[:10]
+            ]
+            if len(e.candidates) > 10:
+                shown.append(f"  ... and {len(e.candidates) - 10} more")
+            raise click.ClickException("\n".join([str(e), *shown])) from e
+        if found is None:
+            raise click.ClickException(f"Note not found: {value}")
+        return found[0]
+
+    return expand
+
+
+def _find_note_record(
+    repo_root: Path, compiled: CompiledRules, note_id: str
+) -> NoteRecord | ArchivedNote:
+    note_id = _id_expander(repo_root, compiled)(note_id)
+
+    note_dirs = compiled.note_dirs
+    for rec in load_note_records(repo_root, note_dirs):
+        meta = rec.meta
+        if meta is None:
+            continue
+        if str(meta.get("id", "")).upper() == note_id:
+            return rec
+    # Fall back to the catalog of notes outside a sparse checkout.
+    for rec in load_sparse_records(repo_root, note_dirs):
+        meta = rec.meta
+        if meta is not None and str(meta.get("id", "")).upper() == note_id:
+            return rec
+    entry = _archived_entries(_archive(repo_root, compiled)).get(note_id)
+    if entry is not None:
+        return entry
+
+    raise click.ClickException(f"Note not found: {note_id}")
+
+
+def _echo_outside_checkout(repo_root: Path, rec: NoteRecord) -> None:
+    if not rec.in_worktree:
+        rel = os.fspath(rec.path.relative_to(repo_root))
+        click.echo(f"note: {rel} is outside the sparse checkout (see kb sparse)", err=True)
+
+
+def _archived_bytes(repo_root: Path, compiled: CompiledRules, entry: ArchivedNote) -> bytes:
+    click.echo(f"note: {entry.note_id} is archived in {entry.pack}", err=True)
+    archive = _archive(repo_root, compiled)
+    try:
+        if archive is None:
+            raise ArchiveError("archive is not configured in kb.rules.yml")
+        return archive.read(entry)
+    except ArchiveError as e:
+        raise click.ClickException(str(e)) from e
+
+
+def _catalog_bytes(repo_root: Path, rec: NoteRecord) -> bytes:
+    try:
+        with CatFileBatch(repo_root) as batch:
+            data = batch.read(rec.oid)
+    except GitError as e:
+        raise click.ClickException(str(e)) from e
+    if data is None:
+        raise click.ClickException(f"Blob not available locally: {rec.oid}")
+    return data
 
 
 @main.command("resolve")
 @click.argument("note_id", type=str, required=True)
 @click.pass_obj
 def cmd_resolve(ctx: Ctx, note_id: str) -> None:
-    note_id = note_id.strip().upper()
-    if not is_ulid(note_id):
-        raise click.ClickException(f"Invalid ULID: {note_id}")
+    rec = _find_note_record(ctx.repo.root, ctx.compiled, note_id)
+    if isinstance(rec, ArchivedNote):
+        click.echo(rec.label)
+        click.echo(f"note: {rec.note_id} is archived in {rec.pack} (see kb show)", err=True)
+        return
+    click.echo(os.fspath(rec.path.relative_to(ctx.repo.root)))
+    _echo_outside_checkout(ctx.repo.root, rec)
+
 
+@main.command("ids")
+@click.option(
+    "--abbrev",
+    is_flag=True,
+    default=False,
+    help="Print the shortest unique prefix of each id instead of the full id.",
+)
+@click.pass_obj
+def cmd_ids(ctx: Ctx, abbrev: bool) -> None:
+    """List note ids (sorted, oldest first) with their paths."""
     repo_root = ctx.repo.root
-    note_dirs = _rules_list(ctx.repo.rules, "note_dirs")
-    for p in iter_note_paths(repo_root, note_dirs):
-        try:
-            meta = read_doc(p).meta
-        except FrontmatterError:
-            continue
-        if str(meta.get("id", "")).upper() == note_id:
-            click.echo(os.fspath(p.relative_to(repo_root)))
+    index = _note_id_index(repo_root, ctx.compiled)
+    rows = index.abbreviations() if abbrev else zip(index.ids, index.paths)
+    for note_id, path in rows:
+        click.echo(f"{note_id}\t{os.fspath(path.relative_to(repo_root))}")
+
+
+@main.command("show")
+@click.argument("note_id", type=str, required=True)
+@click.option(
+    "--section",
+    "section_name",
+    type=str,
+    default=None,
+    help="Print only this '#' section (e.g. 対処), read with a seek.",
+)
+@click.pass_obj
+def cmd_show(ctx: Ctx, note_id: str, section_name: str | None) -> None:
+    repo_root = ctx.repo.root
+    rec = _find_note_record(repo_root, ctx.compiled, note_id)
+    if isinstance(rec, ArchivedNote):
+        data: bytes | None = _archived_bytes(repo_root, ctx.compiled, rec)
+        record = parse_note_bytes(data)
+    else:
+        _echo_outside_checkout(repo_root, rec)
+        data = None if rec.in_worktree else _catalog_bytes(repo_root, rec)
+        record = rec.record
+    if section_name is None:
+        if data is None:
+            click.echo(rec.path.read_text(encoding="utf-8"), nl=False)
+        else:
+            click.echo(data.decode("utf-8", errors="replace"), nl=False)
+        return
+
+    sections = sections_of(record)
+    section = find_section(sections, section_name)
+    if section is None:
+        available = ", ".join(s.title for s in sections) or "(none)"
+        raise click.ClickException(
+            f"Section not found: {section_name} (available: {available})"
+        )
+    if data is None:
+        text = read_section(rec.path, section)
+    else:
+        text = data[section.start : section.end].decode("utf-8", errors="replace")
+    click.echo(text.rstrip("\n"))
+
+
+def _sparse_dirs(
+    repo_root: Path, rules: dict[str, Any], compiled: CompiledRules, domains: Iterable[str]
+) -> list[str]:
+    """Cone-mode directories for a machine that only needs ``domains``."""
+    always = [
+        _placement_dir(repo_root, rules, "inbox", "cross"),
+        _placement_dir(repo_root, rules, "pattern", "cross"),
+        _drafts_dir(repo_root, rules),
+    ]
+    dirs = ["ops", *(os.fspath(d.relative_to(repo_root)) for d in always)]
+    if compiled.archive is not None:
+        dirs.append(compiled.archive.dir)  # compressed, and resolve/search need it
+    for domain in domains:
+        if domain not in compiled.domains or domain == "cross":
+            raise click.ClickException(f"Invalid domain for sparse checkout: {domain}")
+        d = os.fspath(_placement_dir(repo_root, rules, "note", domain).relative_to(repo_root))
+        if d not in dirs:
+            dirs.append(d)
+    return dirs
+
+
+@main.command("sparse")
+@click.argument("domains", nargs=-1)
+@click.option(
+    "--disable",
+    is_flag=True,
+    default=False,
+    help="Check out every domain again.",
+)
+@click.pass_obj
+def cmd_sparse(ctx: Ctx, domains: tuple[str, ...], disable: bool) -> None:
+    """Check out only DOMAINS (plus ops, inbox, patterns and drafts).
+
+    Without arguments, print the current sparse-checkout directories.
+    """
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    try:
+        if disable:
+            run_git(repo_root, "sparse-checkout", "disable")
+            click.echo("sparse checkout disabled")
             return
+        if not domains:
+            if not sparse_checkout_enabled(repo_root):
+                click.echo("sparse checkout is off")
+                return
+            listed = run_git(repo_root, "sparse-checkout", "list").decode("utf-8")
+            click.echo(listed, nl=False)
+            return
+        dirs = _sparse_dirs(repo_root, ctx.repo.rules, ctx.compiled, domains)
+        run_git(repo_root, "sparse-checkout", "set", "--cone", *dirs)
+    except GitError as e:
+        raise click.ClickException(str(e)) from e
+    for d in dirs:
+        click.echo(d)
 
-    raise click.ClickException(f"Note not found: {note_id}")
+
+@main.group("cache")
+def cmd_cache() -> None:
+    """Parse cache keyed by git blob OID (portable across machines)."""
+
+
+@cmd_cache.command("build")
+@click.pass_obj
+def cmd_cache_build(ctx: Ctx) -> None:
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    cache = ParseCache.for_repo(repo_root)
+    before = len(cache)
+    note_dirs = string_list(ctx.repo.rules, "note_dirs")
+    records = load_note_records(repo_root, note_dirs, cache)
+    click.echo(
+        f"{len(records)} note(s), {len(cache) - before} newly parsed blob(s) "
+        f"-> {cache.path}"
+    )
+
+
+@cmd_cache.command("export")
+@click.argument("dest", type=click.Path(dir_okay=False, path_type=Path))
+@click.pass_obj
+def cmd_cache_export(ctx: Ctx, dest: Path) -> None:
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    cache = ParseCache.for_repo(repo_root)
+    load_note_records(repo_root, string_list(ctx.repo.rules, "note_dirs"), cache)
+    cache.save()  # no notes means nothing was written yet
+    shutil.copyfile(cache.path, dest)
+    click.echo(os.fspath(dest))
+
+
+@cmd_cache.command("import")
+@click.argument("src", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.pass_obj
+def cmd_cache_import(ctx: Ctx, src: Path) -> None:
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    cache = ParseCache.for_repo(repo_root)
+    added = cache.merge_file(src)
+    cache.save()
+    click.echo(f"imported {added} record(s) -> {cache.path}")
+
+
+@main.command("sync")
+@click.option("--status", "status_only", is_flag=True, default=False, help="Only report.")
+@click.option("--worker", is_flag=True, default=False, hidden=True)
+@click.pass_obj
+def cmd_sync(ctx: Ctx, status_only: bool, worker: bool) -> None:
+    """Push commits queued by --defer-push and report the queue state."""
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    queue = PushQueue.for_repo(repo_root)
+    if worker:
+        # Detached background flush; a worker already holding the lock wins.
+        result = queue.flush(repo_root)
+        if result is not None:
+            state = result.error or f"pushed {result.pushed} commit(s)"
+            click.echo(f"{now_jst().isoformat(timespec='seconds')} {state}")
+        return
+
+    if not status_only:
+        result = queue.flush(repo_root, wait=120.0, rebase=True)
+        if result is None:
+            raise click.ClickException("another kb sync is still pushing; retry later")
+        if result.error is not None:
+            click.echo(f"push failed: {result.error}", err=True)
+        elif result.pushed:
+            click.echo(f"pushed {result.pushed} queued commit(s)")
+
+    pending = queue.pending()
+    status = queue.status()
+    click.echo(f"pending: {len(pending)} commit(s)")
+    for entry in pending:
+        click.echo(f"  {entry['commit'][:12]} {entry['message']}")
+    click.echo(f"worker: {'running' if queue.worker_running() else 'idle'}")
+    click.echo(f"last push: {status.get('last_push') or '-'}")
+    if status.get("last_error"):
+        click.echo(f"last error: {status['last_error']}")
+    if not status_only and pending:
+        raise click.ClickException(f"{len(pending)} commit(s) still queued")
+
+
+def _parse_time_bound(value: str | None, param: str) -> datetime | None:
+    if value is None:
+        return None
+    dt = parse_iso_dt(value.strip())
+    if dt is None:
+        raise click.BadParameter(f"expected ISO date/datetime: {value}", param_hint=param)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=JST)
+    return dt
+
+
+def _created_range_rows(
+    repo_root: Path,
+    rules: dict[str, Any],
+    after: datetime | None,
+    before: datetime | None,
+) -> list[tuple[int, str, str, str]]:
+    """(created ms, rel path, created, summary) for notes in range, newest first."""
+    note_dirs = string_list(rules, "note_dirs")
+    paths = iter_note_paths(repo_root, note_dirs)
+    index = IdIndex.from_paths(paths, file_template(rules))
+    rows: list[tuple[int, str, str, str]] = []
+    # Only the matched files are opened, for their summary.
+    for note_id, p in reversed(index.created_between(after, before)):
+        ms = ulid_timestamp_ms(note_id)
+        created = datetime.fromtimestamp(ms / 1000, tz=JST)
+        try:
+            summary = str(read_meta(p).get("summary", "")).strip()
+        except (OSError, FrontmatterError):
+            summary = ""
+        rel = os.fspath(p.relative_to(repo_root))
+        rows.append((ms, rel, iso_jst_minute(created), summary))
+    return rows
+
+
+def _echo_created_range(
+    ctx: Ctx,
+    after: datetime | None,
+    before: datetime | None,
+    roots: tuple[str, ...] = (),
+) -> None:
+    if not roots:
+        rows = _created_range_rows(ctx.repo.root, ctx.repo.rules, after, before)
+        if not rows:
+            click.echo("No matches")
+        for _ms, rel, created, summary in rows:
+            click.echo(f"{rel}\t{created}\t{summary}")
+        return
+
+    repos = _federated_repos(ctx, roots)
+    per_repo = _fan_out(
+        repos, lambda repo: _created_range_rows(repo.root, repo.rules, after, before)
+    )
+    merged = [
+        (row, label) for label, rows in zip(_repo_labels(repos), per_repo) for row in rows
+    ]
+    if not merged:
+        click.echo("No matches")
+    # Newest first across every repo; the sort is stable, so ties keep repo order.
+    for (_ms, rel, created, summary), label in sorted(merged, key=lambda m: -m[0][0]):
+        click.echo(f"{label}\t{rel}\t{created}\t{summary}")
+
+
+_root_option = click.option(
+    "--root",
+    "roots",
+    multiple=True,
+    envvar="KB_EXTRA_ROOTS",
+    help="Also query this KB repository (repeatable; env: KB_EXTRA_ROOTS, space-separated).",
+)
+
+
+def _federated_repos(ctx: Ctx, roots: Iterable[str]) -> list[Repo]:
+    """The current repo followed by each extra root, located like the current one."""
+    repos = [ctx.repo]
+    for root in roots:
+        try:
+            repo = open_repo(Path(root).expanduser())
+        except RepoError as e:
+            raise click.ClickException(f"{root}: {e}") from e
+        if all(repo.root != r.root for r in repos):
+            repos.append(repo)
+    return repos
+
+
+def _repo_labels(repos: list[Repo]) -> list[str]:
+    names = [repo.root.name for repo in repos]
+    return [
+        name if names.count(name) == 1 else os.fspath(repo.root)
+        for name, repo in zip(names, repos)
+    ]
+
+
+def _fan_out(items: list[U], fn: Callable[[U], T]) -> list[T]:
+    """Run ``fn`` for every repo concurrently, so latency tracks the slowest one."""
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        return list(pool.map(fn, items))
+
+
+@main.command("recent")
+@click.option("--days", type=click.IntRange(min=1), default=7, show_default=True)
+@_root_option
+@click.pass_obj
+def cmd_recent(ctx: Ctx, days: int, roots: tuple[str, ...]) -> None:
+    after = now_jst() - timedelta(days=days)
+    _echo_created_range(ctx, after, None, roots)
+
+
+@main.command("query")
+@click.option("--created-after", type=str, default=None, help="Inclusive lower bound.")
+@click.option("--created-before", type=str, default=None, help="Exclusive upper bound.")
+@_root_option
+@click.pass_obj
+def cmd_query(
+    ctx: Ctx, created_after: str | None, created_before: str | None, roots: tuple[str, ...]
+) -> None:
+    after = _parse_time_bound(created_after, "--created-after")
+    before = _parse_time_bound(created_before, "--created-before")
+    _echo_created_range(ctx, after, before, roots)
+
+
+@main.command("log")
+@click.option(
+    "--since",
+    "cursor",
+    type=str,
+    default=None,
+    help="Cursor printed by a previous run; omit to replay from the first commit.",
+)
+@click.pass_obj
+def cmd_log(ctx: Ctx, cursor: str | None) -> None:
+    """Note change events as JSON lines; the last line carries the next cursor."""
+    repo_root = ctx.repo.root
+    _require_git_worktree(repo_root)
+    _git_pull_ff_only(repo_root)
+    feed = ChangeFeed.for_repo(repo_root, string_list(ctx.repo.rules, "note_dirs"))
+    try:
+        since = decode_cursor(cursor) if cursor is not None else None
+        head, changes = feed.since(repo_root, since)
+    except (CursorError, GitError) as e:
+        raise click.ClickException(str(e)) from e
+    for change in changes:
+        click.echo(json.dumps(change.to_record(), ensure_ascii=False))
+    click.echo(json.dumps({"cursor": encode_cursor(head)}))
+
+
+def _compile_query(query: str) -> re.Pattern[str]:
+    try:
+        return re.compile(query)
+    except re.error:
+        return re.compile(re.escape(query))
+
+
+def _search_history(repo_root: Path, note_dirs: list[str], query: str) -> None:
+    index = HistoryIndex.for_repo(repo_root)
+    try:
+        index.update(repo_root, note_dirs)
+    except GitError as e:
+        raise click.ClickException(str(e)) from e
+    hits = index.search(repo_root, _compile_query(query), ParseCache.for_repo(repo_root))
+    if not hits:
+        click.echo("No matches")
+        return
+    for hit in hits:
+        click.echo(
+            f"{hit.commit[:12]} {hit.date} {hit.note_id or '-'} "
+            f"{hit.path}:{hit.line}:{hit.text}"
+        )
 
 
 @main.command("search")
 @click.argument("query", type=str, required=True)
+@click.option(
+    "--history",
+    is_flag=True,
+    default=False,
+    help="Search every committed version of the notes, even moved/deleted ones.",
+)
+@click.option(
+    "--sections",
+    "with_sections",
+    is_flag=True,
+    default=False,
+    help="Prefix each hit with the '#' section it falls in.",
+)
+@click.option(
+    "--no-cache",
+    "no_cache",
+    is_flag=True,
+    default=False,
+    help="Always rescan instead of reusing results for an unchanged tree.",
+)
+@_root_option
 @click.pass_obj
-def cmd_search(ctx: Ctx, query: str) -> None:
+def cmd_search(
+    ctx: Ctx,
+    query: str,
+    history: bool,
+    with_sections: bool,
+    no_cache: bool,
+    roots: tuple[str, ...],
+) -> None:
+    if roots:
+        if history or with_sections:
+            raise click.ClickException("--root cannot be combined with --history/--sections")
+        _search_federated(_federated_repos(ctx, roots), query, use_cache=not no_cache)
+        return
+
     repo_root = ctx.repo.root
     _require_git_worktree(repo_root)
-    _git_pull_ff_only(repo_root)
+    pull = _BackgroundPull(repo_root, lambda: _git_pull_ff_only(repo_root))
+
+    note_dirs = string_list(ctx.repo.rules, "note_dirs")
+    if history:
+        pull.changed(note_dirs)
+        _search_history(repo_root, note_dirs, query)
+        return
+
+    archive = _archive(repo_root, ctx.compiled)
+    if with_sections:
+        output = _search_capture(
+            repo_root, note_dirs, query, use_cache=not no_cache, archive=archive, pull=pull
+        )
+        if not output:
+            click.echo("No matches")
+            return
+        _echo_hits_with_sections(repo_root, note_dirs, output)
+        return
+
+    if not no_cache or shutil.which("rg") is None:
+        output = _search_capture(
+            repo_root, note_dirs, query, use_cache=not no_cache, archive=archive, pull=pull
+        )
+        click.echo(output or "No matches", nl=not output)
+        return
+
+    pull.changed(note_dirs)  # rg streams, so it can only start on the pulled tree
 
-    note_dirs = _rules_list(ctx.repo.rules, "note_dirs")
     cmd = [
         "rg",
         "-n",
@@ -496,171 +1584,578 @@ def cmd_search(ctx: Ctx, query: str) -> None:
     ]
     result = subprocess.run(cmd, cwd=repo_root, check=False)
     if result.returncode in (0, 1):
-        if result.returncode == 1:
+        archived = _archive_capture(archive, query)
+        click.echo(archived, nl=False)
+        if result.returncode == 1 and not archived:
             click.echo("No matches")
         return
     raise click.ClickException(f"rg failed with exit code {result.returncode}")
 
 
-@main.command("lint")
+def _repo_hits(
+    repo: Repo, label: str, query: str, *, use_cache: bool = True
+) -> list[tuple[str, int, str]]:
+    _require_git_worktree(repo.root)
+    pull = _BackgroundPull(repo.root, lambda: _git_pull_ff_only(repo.root, label=label))
+    note_dirs = string_list(repo.rules, "note_dirs")
+    archive = _archive(repo.root, compile_rules(repo.rules))
+    output = _search_capture(
+        repo.root, note_dirs, query, use_cache=use_cache, archive=archive, pull=pull
+    )
+    return [hit for hit in map(_parse_hit, output.splitlines()) if hit is not None]
+
+
+def _search_federated(repos: list[Repo], query: str, *, use_cache: bool = True) -> None:
+    """Search every repo concurrently and print one stream ranked by note.
+
+    Notes with more matching lines come first (ties keep repo order, then
+    path); each line is tagged with the repo it came from.
+    """
+    labels = _repo_labels(repos)
+    per_repo = _fan_out(
+        list(zip(repos, labels)),
+        lambda item: _repo_hits(*item, query, use_cache=use_cache),
+    )
+    groups: dict[tuple[int, str], list[tuple[int, str]]] = {}
+    for i, hits in enumerate(per_repo):
+        for rel, line, text in hits:
+            groups.setdefault((i, rel), []).append((line, text))
+    if not groups:
+        click.echo("No matches")
+        return
+    for (i, rel), lines in sorted(groups.items(), key=lambda g: (-len(g[1]), g[0])):
+        for line, text in sorted(lines):
+            click.echo(f"{labels[i]}\t{rel}:{line}:{text}")
+
+
+def _rg_capture(repo_root: Path, note_dirs: list[str], query: str) -> str:
+    """``path:line:text`` hits, one per line ("" when nothing matches).
+
+    Falls back to the built-in mmap search when rg is not installed.
+    """
+    if shutil.which("rg") is None:
+        try:
+            hits = _builtin_search(repo_root, note_dirs, query)
+        except re.error as e:
+            raise click.ClickException(f"Invalid search pattern: {e}") from e
+        return "".join(f"{hit}\n" for hit in hits)
+
+    return _rg_lines(repo_root, note_dirs, query)
+
+
+def _rg_lines(cwd: Path, paths: list[str], query: str) -> str:
+    cmd = [
+        "rg",
+        "-n",
+        "--no-heading",
+        "--with-filename",
+        "--hidden",
+        "--glob",
+        "!**/.git/**",
+        "--regexp",
+        query,
+        *paths,
+    ]
+    result = subprocess.run(cmd, cwd=cwd, check=False, stdout=subprocess.PIPE, text=True)
+    if result.returncode not in (0, 1):
+        raise click.ClickException(f"rg failed with exit code {result.returncode}")
+    return result.stdout if result.returncode == 0 else ""
+
+
+def _archive_capture(archive: Archive | None, query: str) -> str:
+    """Archived hits in ``_rg_capture`` format, labelled ``pack/member``.
+
+    The query means the same as for the live notes: with rg installed each
+    member a regex could match is read in place and piped through rg.
+    """
+    if archive is None:
+        return ""
+    try:
+        if shutil.which("rg") is None or is_literal(query):
+            # A literal matches the same bytes in either engine.
+            return "".join(f"{hit}\n" for hit in archive.search(query))
+        return "".join(_rg_member(entry.label, data, query) for entry, data in archive.members())
+    except re.error as e:
+        raise click.ClickException(f"Invalid search pattern: {e}") from e
+    except ArchiveError as e:
+        raise click.ClickException(str(e)) from e
+
+
+def _rg_member(label: str, data: bytes, query: str) -> str:
+    """``_rg_capture`` lines for one archived note fed to rg on stdin."""
+    cmd = ["rg", "-n", "--no-heading", "--with-filename", "--label", label, "--regexp", query, "-"]
+    result = subprocess.run(cmd, input=data, check=False, stdout=subprocess.PIPE)
+    if result.returncode not in (0, 1):
+        raise click.ClickException(f"rg failed with exit code {result.returncode}")
+    return result.stdout.decode("utf-8", errors="replace") if result.returncode == 0 else ""
+
+
+# Past this many files changed by a pull, rescanning everything is simpler.
+RESCAN_LIMIT = 500
+
+
+def _rescan_changed(
+    repo_root: Path,
+    note_dirs: list[str],
+    query: str,
+    archive: Archive | None,
+    output: str,
+    changed: list[str],
+) -> str:
+    """Patch ``output`` (hits from before a pull) to match the pulled tree.
+
+    Only files the pull changed are searched again; hits in every other
+    file are still exact.
+    """
+    prefix = f"{archive.directory}/" if archive is not None else None
+
+    def in_archive(rel: str) -> bool:
+        return prefix is not None and rel.startswith(prefix)
+
+    def archive_hits() -> str:
+        # The pull may have added packs, so read the indexes again.
+        fresh = Archive(repo_root, archive.directory) if archive is not None else None
+        return _archive_capture(fresh, query)
+
+    notes = [rel for rel in changed if not in_archive(rel)]
+    if len(notes) > RESCAN_LIMIT:
+        return _rg_capture(repo_root, note_dirs, query) + archive_hits()
+
+    stale = set(notes)
+    kept: list[tuple[str, str]] = []
+    archived: list[str] = []
+    for hit in output.splitlines():
+        rel = hit.partition(":")[0]
+        if in_archive(rel):
+            archived.append(hit)
+        elif rel not in stale:
+            kept.append((rel, hit))
+    existing = [rel for rel in notes if (repo_root / rel).is_file()]
+    if existing:
+        rescanned = _rg_capture(repo_root, existing, query)
+        kept.extend((hit.partition(":")[0], hit) for hit in rescanned.splitlines())
+    kept.sort(key=lambda item: item[0])  # stable: lines keep their order per file
+    lines = [hit for _rel, hit in kept]
+    if len(notes) < len(changed):  # a pack changed
+        lines.extend(archive_hits().splitlines())
+    else:
+        lines.extend(archived)
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _search_capture(
+    repo_root: Path,
+    note_dirs: list[str],
+    query: str,
+    *,
+    use_cache: bool = True,
+    archive: Archive | None = None,
+    pull: _BackgroundPull | None = None,
+) -> str:
+    """``_rg_capture`` (plus archived notes) behind the on-disk search cache.
+
+    Entries are keyed by HEAD and a fingerprint of uncommitted changes under
+    ``note_dirs``, so a hit is only reused while every note is unchanged.
+    With a ``pull`` in flight the lookup or scan overlaps it, and the files
+    the pull changed are searched again once it has finished.
+    """
+    dirs = list(note_dirs)
+    if archive is not None:
+        dirs.append(archive.directory)
+
+    def capture() -> str:
+        return _rg_capture(repo_root, note_dirs, query) + _archive_capture(archive, query)
+
+    def reconcile(output: str) -> tuple[str, bool]:
+        changed = pull.changed(dirs) if pull is not None else []
+        if not changed:
+            return output, False
+        return _rescan_changed(repo_root, note_dirs, query, archive, output, changed), True
+
+    engine = "rg" if shutil.which("rg") is not None else "builtin"
+    cache: SearchCache | None = None
+    key = ""
+    if use_cache:
+        try:
+            head, fingerprint = worktree_state(repo_root, dirs)
+            cache = SearchCache.for_repo(repo_root)
+            key = cache.key(query, [engine, *dirs], head, fingerprint)
+        except GitError:
+            cache = None
+    if cache is None:
+        return reconcile(capture())[0]
+
+    output = cache.get(key)
+    fresh = output is None
+    output, pulled = reconcile(capture() if output is None else output)
+    if pulled:
+        # The key described the tree before the pull; store under the new one.
+        try:
+            head, fingerprint = worktree_state(repo_root, dirs)
+        except GitError:
+            return output
+        key = cache.key(query, [engine, *dirs], head, fingerprint)
+    if fresh or pulled:
+        cache.put(key, output)
+    return output
+
+
+def _parse_hit(hit: str) -> tuple[str, int, str] | None:
+    rel, _, rest = hit.partition(":")
+    line_no, _, text = rest.partition(":")
+    if not line_no.isdigit():
+        return None
+    return rel, int(line_no), text
+
+
+def _echo_hits_with_sections(repo_root: Path, note_dirs: list[str], output: str) -> None:
+    """Annotate ``path:line:text`` hits with the heading of the enclosing section."""
+    records = {
+        rec.path.relative_to(repo_root).as_posix(): rec.record
+        for rec in load_note_records(repo_root, note_dirs)
+    }
+    sections_by_path: dict[str, list[Section]] = {}
+    for hit in output.splitlines():
+        parsed = _parse_hit(hit)
+        record = records.get(parsed[0]) if parsed is not None else None
+        if parsed is None or record is None:
+            click.echo(hit)
+            continue
+        rel, line_no, text = parsed
+        if rel not in sections_by_path:
+            sections_by_path[rel] = sections_of(record)
+        section = section_at_line(sections_by_path[rel], line_no)
+        label = f"[{section.title}] " if section is not None else ""
+        click.echo(f"{rel}:{line_no}:{label}{text}")
+
+
+@main.command("context")
+@click.argument("query", type=str, required=True)
+@click.option(
+    "--budget",
+    type=click.IntRange(min=1),
+    default=2000,
+    show_default=True,
+    help="Approximate token budget for the whole bundle.",
+)
 @click.pass_obj
-def cmd_lint(ctx: Ctx) -> None:
+def cmd_context(ctx: Ctx, query: str, budget: int) -> None:
+    """Pack summaries, matching sections and related notes into one bundle."""
     repo_root = ctx.repo.root
-    rules = ctx.repo.rules
+    _require_git_worktree(repo_root)
+    _git_pull_ff_only(repo_root)
 
-    note_dirs = _rules_list(rules, "note_dirs")
-    required = (rules.get("frontmatter", {}) or {}).get("required", [])
-    if not isinstance(required, list):
-        raise click.ClickException("Invalid rules: frontmatter.required")
-    required = [str(x) for x in required]
-
-    allowed_kinds = set(_rules_list(rules, "kinds"))
-    allowed_domains = set(_rules_list(rules, "domains"))
-    allowed_scopes = set(_rules_scope_values(rules))
-    allowed_created_os = set(_rules_created_os_values(rules))
-    filename_template = (rules.get("naming", {}) or {}).get(
-        "file_template", "{slug}--{id}.md"
-    )
-    if not isinstance(filename_template, str):
-        filename_template = "{slug}--{id}.md"
+    note_dirs = string_list(ctx.repo.rules, "note_dirs")
+    hits: dict[str, list[int]] = {}
+    for hit in _search_capture(repo_root, note_dirs, query).splitlines():
+        parsed = _parse_hit(hit)
+        if parsed is not None:
+            hits.setdefault(parsed[0], []).append(parsed[1])
+
+    records = load_note_records(repo_root, note_dirs)
+    chunks = pack_context(repo_root, records, _compile_query(query), hits, budget)
+    if not chunks:
+        click.echo("No matches")
+        return
+    click.echo(render_bundle(query, chunks, budget))
+
+
+def _link_graph_problems(
+    ids: dict[str, list[str]],
+    links: dict[str, tuple[str, list[str]]],
+    *,
+    reciprocal: bool,
+    external: frozenset[str] = frozenset(),
+) -> list[str]:
+    """Repository-wide checks over the id set and the ``related`` graph, O(N + E).
 
+    Links of notes in ``external`` (outside the checkout) are targets only;
+    their own links are not checked.
+    """
     problems: list[str] = []
+    for note_id, rels in ids.items():
+        if len(rels) > 1:
+            problems.append(f"duplicate id: {note_id} ({', '.join(rels)})")
 
-    for p in iter_note_paths(repo_root, note_dirs):
+    for rel, (src_id, targets) in links.items():
+        if rel in external:
+            continue
+        for rid in targets:
+            if rid == src_id:
+                problems.append(f"{rel}: related points to itself: {rid}")
+            elif rid not in ids:
+                problems.append(f"{rel}: related target not found: {rid}")
+            elif reciprocal and not any(
+                src_id in links[target_rel][1] for target_rel in ids[rid]
+            ):
+                problems.append(f"{rel}: related link to {rid} is not reciprocated")
+    return problems
+
+
+@main.command("lint")
+@click.option(
+    "--reciprocal",
+    is_flag=True,
+    default=False,
+    help="Also require every related link to be mirrored by the target note.",
+)
+@click.option(
+    "--staged",
+    is_flag=True,
+    default=False,
+    help="Check only staged notes, as staged (for a pre-commit hook).",
+)
+@click.pass_obj
+def cmd_lint(ctx: Ctx, reciprocal: bool, staged: bool) -> None:
+    repo_root = ctx.repo.root
+    compiled = ctx.compiled
+    if staged:
+        if reciprocal:
+            raise click.ClickException("--reciprocal cannot be combined with --staged")
+        _lint_staged(repo_root, compiled, _archive(repo_root, compiled))
+        return
+
+    problems: list[str] = []
+    # Collected during the single traversal for the repository-wide checks.
+    ids: dict[str, list[str]] = {}
+    links: dict[str, tuple[str, list[str]]] = {}
+
+    for p in iter_note_paths(repo_root, compiled.note_dirs):
         rel = os.fspath(p.relative_to(repo_root))
         try:
-            doc = read_doc(p)
+            meta = read_meta(p)  # every check is frontmatter-only
         except FrontmatterError as e:
             problems.append(f"{rel}: {e}")
             continue
-        meta = doc.meta
-
-        for k in required:
-            if k not in meta or meta[k] in (None, ""):
-                problems.append(f"{rel}: missing required field: {k}")
+        problems.extend(f"{rel}: {msg}" for msg in compiled.validate(p.name, meta))
 
         note_id = str(meta.get("id", "")).upper()
-        if note_id and not is_ulid(note_id):
-            problems.append(f"{rel}: invalid id (expected ULID): {meta.get('id')}")
-
-        # Filename should match naming.file_template
-        if note_id:
-            if not _filename_matches_template(p.name, note_id, filename_template):
-                problems.append(
-                    f"{rel}: filename does not match template '{filename_template}' "
-                    f"for id '{note_id}' (got: {p.name})"
-                )
-
-        kind = str(meta.get("kind", ""))
-        if kind and kind not in allowed_kinds:
-            problems.append(f"{rel}: invalid kind: {kind}")
+        if is_ulid(note_id):
+            ids.setdefault(note_id, []).append(rel)
+            links[rel] = (note_id, _extract_related_ids(meta))
+
+    external: set[str] = set()
+    for rec in load_sparse_records(repo_root, compiled.note_dirs):
+        meta = rec.meta
+        note_id = str((meta or {}).get("id", "")).upper()
+        if meta is not None and is_ulid(note_id):
+            rel = os.fspath(rec.path.relative_to(repo_root))
+            external.add(rel)
+            ids.setdefault(note_id, []).append(rel)
+            links[rel] = (note_id, _extract_related_ids(meta))
+    # Archived notes stay valid link targets.
+    for note_id, entry in _archived_entries(_archive(repo_root, compiled)).items():
+        if note_id not in ids:
+            external.add(entry.label)
+            ids[note_id] = [entry.label]
+            links[entry.label] = (note_id, _extract_related_ids(entry.meta))
+
+    problems.extend(
+        _link_graph_problems(ids, links, reciprocal=reciprocal, external=frozenset(external))
+    )
 
-        domain = str(meta.get("domain", ""))
-        if domain and domain not in allowed_domains:
-            problems.append(f"{rel}: invalid domain: {domain}")
+    if problems:
+        for p in problems:
+            click.echo(p, err=True)
+        raise click.ClickException(f"lint failed: {len(problems)} problem(s)")
 
-        scope = meta.get("scope")
-        if scope is not None:
-            if not isinstance(scope, str) or not scope.strip():
-                problems.append(f"{rel}: scope must be a non-empty string")
-            else:
-                normalized_scope = scope.strip().lower()
-                if normalized_scope not in allowed_scopes:
-                    problems.append(
-                        f"{rel}: invalid scope: {scope} (allowed: {sorted(allowed_scopes)})"
-                    )
+    click.echo("OK")
 
-        created_by = meta.get("created_by")
-        if created_by is not None:
-            if not isinstance(created_by, str) or not created_by.strip():
-                problems.append(f"{rel}: created_by must be a non-empty string")
 
-        created_os = meta.get("created_os")
-        if created_os is not None:
-            if not isinstance(created_os, str) or not created_os.strip():
-                problems.append(f"{rel}: created_os must be a non-empty string")
-            else:
-                normalized_created_os = _normalize_os_name(created_os)
-                if normalized_created_os not in allowed_created_os:
-                    problems.append(
-                        f"{rel}: invalid created_os: {created_os} "
-                        f"(allowed: {sorted(allowed_created_os)})"
-                    )
-
-        for ts_field in ("created", "updated"):
-            v = meta.get(ts_field)
-            if isinstance(v, str) and v.strip():
-                if _parse_iso_dt(v.strip()) is None:
-                    problems.append(f"{rel}: invalid {ts_field}: {v}")
-
-        created = meta.get("created")
-        updated = meta.get("updated")
-        if isinstance(created, str) and isinstance(updated, str):
-            cdt = _parse_iso_dt(created.strip())
-            udt = _parse_iso_dt(updated.strip())
-            if cdt and udt and udt < cdt:
-                problems.append(f"{rel}: updated is before created")
-
-        tags = meta.get("tags")
-        if tags is not None:
-            if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
-                problems.append(f"{rel}: tags must be a string list")
-            else:
-                tag_re = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
-                for t in tags:
-                    if not tag_re.fullmatch(t):
-                        problems.append(f"{rel}: invalid tag: {t}")
-
-        related = meta.get("related")
-        if related is not None:
-            if not isinstance(related, list) or not all(
-                isinstance(x, str) for x in related
-            ):
-                problems.append(f"{rel}: related must be a string list")
-            else:
-                for rid in related:
-                    if not is_ulid(rid):
-                        problems.append(f"{rel}: invalid related ULID: {rid}")
+def _staged_problems(
+    repo_root: Path, compiled: CompiledRules, archive: Archive | None = None
+) -> list[str]:
+    """Lint the index versions of staged notes against the committed id set.
 
+    Staged blobs and any ids missing from the caches go through a single
+    ``git cat-file --batch`` process; unchanged notes are never read.
+    """
+    note_dirs = list(compiled.note_dirs)
+    changes = [c for c in staged_changes(repo_root, note_dirs) if c[1].endswith(".md")]
+    if not changes:
+        return []
+    touched = {rel for _status, rel, _oid in changes}
+    problems: list[str] = []
+    staged_ids: dict[str, list[str]] = {}
+    links: dict[str, tuple[str, list[str]]] = {}
+
+    committed = CommittedIds.for_repo(repo_root, note_dirs)
+    cache = ParseCache.for_repo(repo_root)
+    with CatFileBatch(repo_root) as cat:
+        committed.update(repo_root, cat, cache)
+        for status, rel, oid in changes:
+            if status == "D":
+                continue
+            data = cat.read(oid)
+            if data is None:
+                problems.append(f"{rel}: staged blob {oid} is missing")
+                continue
+            try:
+                meta = split_frontmatter(data.decode("utf-8")).meta
+            except (FrontmatterError, UnicodeDecodeError) as e:
+                problems.append(f"{rel}: {e}")
+                continue
+            name = rel.rsplit("/", 1)[-1]
+            problems.extend(f"{rel}: {msg}" for msg in compiled.validate(name, meta))
+            note_id = str(meta.get("id", "")).upper()
+            if is_ulid(note_id):
+                staged_ids.setdefault(note_id, []).append(rel)
+                links[rel] = (note_id, _extract_related_ids(meta))
+
+    def paths_of(note_id: str) -> list[str]:
+        kept = [p for p in committed.paths(note_id) if p not in touched]
+        return kept + staged_ids.get(note_id, [])
+
+    ids = {note_id: paths_of(note_id) for note_id in staged_ids}
+    archived = archive.entries() if archive is not None else {}
+    for _src, targets in links.values():
+        for rid in targets:
+            if rid not in ids and paths_of(rid):
+                ids[rid] = paths_of(rid)[:1]  # existence is all a target needs
+            elif rid not in ids and rid in archived:
+                ids[rid] = [archived[rid].label]
+    problems.extend(_link_graph_problems(ids, links, reciprocal=False))
+    return problems
+
+
+def _lint_staged(repo_root: Path, compiled: CompiledRules, archive: Archive | None) -> None:
+    try:
+        problems = _staged_problems(repo_root, compiled, archive)
+    except (GitError, ArchiveError) as e:
+        raise click.ClickException(str(e)) from e
     if problems:
         for p in problems:
             click.echo(p, err=True)
         raise click.ClickException(f"lint failed: {len(problems)} problem(s)")
-
     click.echo("OK")
 
 
-@main.command("organize")
-@click.pass_obj
-def cmd_organize(ctx: Ctx) -> None:
-    repo_root = ctx.repo.root
-    rules = ctx.repo.rules
-    _require_git_worktree(repo_root)
-    _git_pull_ff_only(repo_root)
-    note_dirs = _rules_list(rules, "note_dirs")
-    allowed_scopes = set(_rules_scope_values(rules))
-    allowed_created_os = set(_rules_created_os_values(rules))
-    default_created_by = _detect_created_by()
-    default_created_os = _detect_created_os()
-    if default_created_os not in allowed_created_os:
-        default_created_os = "other"
-    ts = iso_jst_minute(now_jst())
+def _label_meta(meta: dict[str, Any]) -> dict[str, Any]:
+    # Only what _note_link_label needs, so the index stays small.
+    return {k: meta[k] for k in ("title", "summary") if k in meta}
+
 
-    notes = [read_note(p) for p in iter_note_paths(repo_root, note_dirs)]
+def _collect_note_index(
+    paths: Iterable[Path],
+) -> tuple[list[Path], dict[str, tuple[str, dict[str, Any]]]]:
+    """First organize pass: read frontmatter only and build the link index."""
+    seen: list[Path] = []
     note_index: dict[str, tuple[str, dict[str, Any]]] = {}
-    for note in notes:
-        note_id = str(note.meta.get("id", "")).upper()
+    for p in paths:
+        seen.append(p)
+        meta = read_meta(p)
+        note_id = str(meta.get("id", "")).upper()
         if not note_id or not is_ulid(note_id):
             continue
-        note_index[note_id] = (note.path.stem, note.meta)
+        note_index[note_id] = (p.stem, _label_meta(meta))
+    return seen, note_index
 
-    moved: list[tuple[Path, Path]] = []
-    metadata_updated: list[Path] = []
 
-    for note in notes:
-        p = note.path
-        meta = dict(note.meta)
-        changed = False
+def _warm_note_index(
+    repo_root: Path, note_dirs: Iterable[str]
+) -> tuple[dict[str, tuple[str, dict[str, Any]]], set[str]]:
+    """``_collect_note_index`` while a pull may be rewriting notes.
+
+    Notes that cannot be read right now come back (as repo-relative paths)
+    to be read again once the pull has finished, like the ones it changed.
+    """
+    note_index: dict[str, tuple[str, dict[str, Any]]] = {}
+    unreadable: set[str] = set()
+    for p in iter_note_paths(repo_root, note_dirs):
+        try:
+            meta = read_meta(p)
+        except (OSError, UnicodeDecodeError, FrontmatterError):
+            unreadable.add(p.relative_to(repo_root).as_posix())
+            continue
+        note_id = str(meta.get("id", "")).upper()
+        if is_ulid(note_id):
+            note_index[note_id] = (p.stem, _label_meta(meta))
+    return note_index, unreadable
+
+
+def _refresh_note_index(
+    repo_root: Path,
+    note_dirs: Iterable[str],
+    note_index: dict[str, tuple[str, dict[str, Any]]],
+    stale: set[str],
+) -> tuple[list[Path], dict[str, tuple[str, dict[str, Any]]]]:
+    """Re-read just the ``stale`` notes; the directories are listed again."""
+    stems = {PurePosixPath(rel).stem for rel in stale}
+    kept = {nid: entry for nid, entry in note_index.items() if entry[0] not in stems}
+    paths = list(iter_note_paths(repo_root, note_dirs))
+    _seen, fresh = _collect_note_index(
+        p for p in paths if p.relative_to(repo_root).as_posix() in stale
+    )
+    kept.update(fresh)
+    return paths, kept
+
+
+@dataclass(frozen=True)
+class _NotePatch:
+    path: Path
+    updates: dict[str, Any]
+    # The regenerated related block; bodies are re-read at apply time so the
+    # plan never holds note contents.
+    related_block: str | None
+    rewrite_body: bool
+
+
+@dataclass(frozen=True)
+class _OrganizePlan:
+    patches: list[_NotePatch]
+    moves: list[tuple[Path, Path]]
+    # Shard migration moves left for later runs (placement.shard.batch_size).
+    deferred: int = 0
+    # Placement directories; emptied shard directories below them are removed.
+    placement_dirs: frozenset[Path] = frozenset()
+    # Notes whose frontmatter was indexed / that were fully parsed.
+    scanned: int = 0
+    parsed: int = 0
+
+
+def _patched_text(original: str, patch: _NotePatch) -> str:
+    if not patch.rewrite_body:
+        return patch_frontmatter(original, patch.updates)
+    doc = split_frontmatter(original)
+    body = _replace_related_block(doc.body, patch.related_block)
+    return patch_frontmatter(original, patch.updates, body)
+
+
+def _plan_organize(
+    repo_root: Path,
+    rules: dict[str, Any],
+    compiled: CompiledRules,
+    *,
+    ts: str,
+    default_created_by: str,
+    default_created_os: str,
+    warm: tuple[list[Path], dict[str, tuple[str, dict[str, Any]]]] | None = None,
+) -> _OrganizePlan:
+    """Plan rewrites and moves; ``warm`` is a note index already collected."""
+    allowed_scopes = compiled.scopes
+    allowed_created_os = compiled.created_os
+    if warm is None:
+        warm = _collect_note_index(iter_note_paths(repo_root, compiled.note_dirs))
+    paths, note_index = warm
+    # Notes outside a sparse checkout still render as links, not [missing].
+    for rec in load_sparse_records(repo_root, compiled.note_dirs):
+        note_id = str((rec.meta or {}).get("id", "")).upper()
+        if rec.meta is not None and is_ulid(note_id):
+            note_index.setdefault(note_id, (rec.path.stem, _label_meta(rec.meta)))
+    archived = _archived_entries(_archive(repo_root, compiled))
+
+    patches: list[_NotePatch] = []
+    moves: list[tuple[Path, Path]] = []
+    placements: list[tuple[Path, Path, str]] = []
+
+    parsed = 0
+    for p in paths:
+        # Second pass: one note in memory at a time.
+        original = p.read_bytes().decode("utf-8")
+        doc = split_frontmatter(original)
+        parsed += 1
+        meta = doc.meta
+        updates: dict[str, Any] = {}
 
         kind = str(meta.get("kind", ""))
         domain = str(meta.get("domain", ""))
@@ -672,60 +2167,297 @@ def cmd_organize(ctx: Ctx) -> None:
 
         scope = meta.get("scope")
         if scope is None or (isinstance(scope, str) and not scope.strip()):
-            meta["scope"] = "cross"
-            changed = True
+            updates["scope"] = "cross"
         elif isinstance(scope, str):
             normalized_scope = scope.strip().lower()
             if normalized_scope in allowed_scopes and normalized_scope != scope:
-                meta["scope"] = normalized_scope
-                changed = True
+                updates["scope"] = normalized_scope
 
         created_by = meta.get("created_by")
         if created_by is None or (isinstance(created_by, str) and not created_by.strip()):
-            meta["created_by"] = default_created_by
-            changed = True
+            updates["created_by"] = default_created_by
 
         created_os = meta.get("created_os")
         if created_os is None or (isinstance(created_os, str) and not created_os.strip()):
-            meta["created_os"] = default_created_os
-            changed = True
+            updates["created_os"] = default_created_os
         elif isinstance(created_os, str):
-            normalized_created_os = _normalize_os_name(created_os)
+            normalized_created_os = normalize_os_name(created_os)
             if (
                 normalized_created_os in allowed_created_os
                 and normalized_created_os != created_os
             ):
-                meta["created_os"] = normalized_created_os
-                changed = True
+                updates["created_os"] = normalized_created_os
 
-        related_block = _build_related_block(_extract_related_ids(meta), note_index)
-        next_body = _replace_related_block(note.body, related_block)
-        if next_body != note.body:
-            changed = True
+        related_block = _build_related_block(
+            _extract_related_ids(meta), note_index, archived
+        )
+        next_body = _replace_related_block(doc.body, related_block)
+        body_changed = next_body != doc.body.strip("\n")
+
+        if updates or body_changed:
+            updates["updated"] = ts
+            patch = _NotePatch(
+                path=p,
+                updates=updates,
+                related_block=related_block,
+                rewrite_body=body_changed,
+            )
+            # Patch only the touched fields so untouched lines keep their bytes.
+            if _patched_text(original, patch) != original:
+                patches.append(patch)
 
-        if changed:
-            meta["updated"] = ts
-            write_doc(p, Doc(meta=meta, body=next_body))
-            metadata_updated.append(p)
+        placements.append((p, _placement_dir(repo_root, rules, kind, domain), note_id))
 
-        desired_dir = _placement_dir(repo_root, rules, kind, domain)
+    counts = Counter(base for _p, base, _id in placements)
+    sharded = {
+        base for p, base, _id in placements if base.resolve() in p.parent.resolve().parents
+    }
+    migrations: list[tuple[Path, Path]] = []
+    for p, base, note_id in placements:
+        desired_dir = _shard_dir(compiled, base, note_id, counts[base], sharded=base in sharded)
         if desired_dir.resolve() == p.parent.resolve():
             continue
+        resolved_base = base.resolve()
+        if resolved_base == p.parent.resolve() or resolved_base in p.parent.parents:
+            # Same domain directory, different shard: a layout migration.
+            migrations.append((p, desired_dir / p.name))
+        else:
+            moves.append((p, desired_dir / p.name))
+
+    deferred = 0
+    shard = compiled.shard
+    if shard is not None and len(migrations) > shard.batch_size:
+        deferred = len(migrations) - shard.batch_size
+        migrations = migrations[: shard.batch_size]
+    moves.extend(migrations)
+
+    return _OrganizePlan(
+        patches=patches,
+        moves=moves,
+        deferred=deferred,
+        placement_dirs=frozenset(counts),
+        scanned=len(paths),
+        parsed=parsed,
+    )
+
+
+def _apply_patch(patch: _NotePatch) -> int:
+    """Rewrite one note; returns the bytes written (0 when nothing changed)."""
+    original = patch.path.read_bytes().decode("utf-8")
+    text = _patched_text(original, patch)
+    if text == original:
+        return 0
+    atomic_write_text(patch.path, text)
+    return len(text.encode("utf-8"))
+
+
+def _apply_organize(
+    repo_root: Path,
+    plan: _OrganizePlan,
+    *,
+    workers: int,
+    metrics: RunMetrics | None = None,
+) -> list[Path]:
+    """Rewrite notes in a thread pool, then apply all moves in one batch."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = list(pool.map(_apply_patch, plan.patches))
+    if plan.moves:
+        _move_paths(repo_root, plan.moves, plan.placement_dirs)
+    if metrics is not None:
+        metrics.add("bytes_written", sum(written))
+    return [patch.path for patch, n in zip(plan.patches, written) if n]
+
 
-        dst = desired_dir / p.name
-        _move_path(repo_root, p, dst)
-        moved.append((p, dst))
+def _echo_deferred(plan: _OrganizePlan) -> None:
+    if plan.deferred:
+        click.echo(f"shard migration: {plan.deferred} note(s) left for the next organize run")
 
-    if not moved and not metadata_updated:
+
+@main.command("organize")
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Print the planned rewrites and moves without touching files or git.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of threads used to rewrite notes.",
+)
+@click.option(
+    "--metrics-log",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="KB_METRICS_LOG",
+    default=None,
+    help="Append this run's metrics as one JSON line (env: KB_METRICS_LOG).",
+)
+@click.option(
+    "--metrics-prom",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="KB_METRICS_PROM",
+    default=None,
+    help="Write this run's metrics as a Prometheus textfile (env: KB_METRICS_PROM).",
+)
+@_defer_push_option
+@click.pass_obj
+def cmd_organize(
+    ctx: Ctx,
+    dry_run: bool,
+    workers: int,
+    metrics_log: Path | None,
+    metrics_prom: Path | None,
+    defer_push: bool,
+) -> None:
+    metrics = RunMetrics("organize")
+    try:
+        with metrics.track_git():
+            _run_organize(
+                ctx, metrics, dry_run=dry_run, workers=workers, defer_push=defer_push
+            )
+    except BaseException:
+        metrics.status = "failed"
+        raise
+    finally:
+        if metrics_log is not None or metrics_prom is not None:
+            record = metrics.to_record()
+            if metrics_log is not None:
+                append_jsonl(metrics_log, record)
+            if metrics_prom is not None:
+                write_prometheus(metrics_prom, record)
+
+
+def _run_organize(
+    ctx: Ctx, metrics: RunMetrics, *, dry_run: bool, workers: int, defer_push: bool = False
+) -> None:
+    repo_root = ctx.repo.root
+    compiled = ctx.compiled
+    _require_git_worktree(repo_root)
+    note_dirs = list(compiled.note_dirs)
+    warm = None
+    if not dry_run:
+        # Index every note's frontmatter while the pull runs, then re-read
+        # only what it changed; the plan itself is made on the pulled tree.
+        pull = _BackgroundPull(repo_root, lambda: _git_pull_ff_only(repo_root))
+        with metrics.phase("plan"):
+            note_index, stale = _warm_note_index(repo_root, note_dirs)
+        with metrics.phase("pull"):
+            stale.update(pull.changed(note_dirs))
+        with metrics.phase("plan"):
+            warm = _refresh_note_index(repo_root, note_dirs, note_index, stale)
+    default_created_by = _detect_created_by()
+    default_created_os = _detect_created_os()
+    if default_created_os not in compiled.created_os:
+        default_created_os = "other"
+    ts = iso_jst_minute(now_jst())
+
+    with metrics.phase("plan"):
+        plan = _plan_organize(
+            repo_root,
+            ctx.repo.rules,
+            compiled,
+            ts=ts,
+            default_created_by=default_created_by,
+            default_created_os=default_created_os,
+            warm=warm,
+        )
+    metrics.add("notes_scanned", plan.scanned)
+    metrics.add("notes_parsed", plan.parsed)
+    metrics.add("notes_rewritten", 0)
+    metrics.add("notes_moved", 0)
+    metrics.add("notes_deferred", plan.deferred)
+    metrics.add("bytes_written", 0)
+
+    if not plan.moves and not plan.patches:
+        metrics.status = "no-changes"
         click.echo("No changes")
         return
 
-    for src, dst in moved:
+    if dry_run:
+        metrics.status = "dry-run"
+        for patch in plan.patches:
+            fields = sorted(patch.updates)
+            if patch.rewrite_body:
+                fields.append("body:related-links")
+            rel = os.fspath(patch.path.relative_to(repo_root))
+            click.echo(f"patch: {rel} ({', '.join(fields)})")
+        for src, dst in plan.moves:
+            click.echo(
+                f"move: {os.fspath(src.relative_to(repo_root))} -> "
+                f"{os.fspath(dst.relative_to(repo_root))}"
+            )
+        _echo_deferred(plan)
+        return
+
+    with metrics.phase("apply"):
+        metadata_updated = _apply_organize(repo_root, plan, workers=workers, metrics=metrics)
+    metrics.add("notes_rewritten", len(metadata_updated))
+    metrics.add("notes_moved", len(plan.moves))
+
+    for src, dst in plan.moves:
         click.echo(
             f"{os.fspath(src.relative_to(repo_root))} -> {os.fspath(dst.relative_to(repo_root))}"
         )
 
     for path in metadata_updated:
         click.echo(f"metadata updated: {os.fspath(path.relative_to(repo_root))}")
+    _echo_deferred(plan)
 
-    _git_commit_and_push(repo_root, "ナレッジ配置とメタデータを整理")
+    with metrics.phase("commit"):
+        _commit(repo_root, "ナレッジ配置とメタデータを整理", defer_push=defer_push)
+    metrics.status = "executed"
+
+
+@main.command("archive")
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Print the notes the policy selects without touching files or git.",
+)
+@_defer_push_option
+@click.pass_obj
+def cmd_archive(ctx: Ctx, dry_run: bool, defer_push: bool) -> None:
+    """Move notes matching the archive policy in kb.rules.yml into a new pack.
+
+    Archived notes stay reachable through resolve, show, search and related
+    links; run kb organize afterwards to relabel links pointing at them.
+    """
+    repo_root = ctx.repo.root
+    compiled = ctx.compiled
+    policy = compiled.archive
+    if policy is None:
+        raise click.ClickException("No archive policy: add an archive section to kb.rules.yml")
+    _require_git_worktree(repo_root)
+    if not dry_run:
+        _git_pull_ff_only(repo_root)
+
+    now = now_jst()
+    selected: list[tuple[Path, dict[str, Any]]] = []
+    for p in iter_note_paths(repo_root, compiled.note_dirs):
+        try:
+            meta = read_meta(p)
+        except FrontmatterError:
+            continue  # kb lint reports it; never archive what we cannot parse
+        if is_ulid(str(meta.get("id", "")).upper()) and policy.matches(meta, now):
+            selected.append((p, meta))
+    if not selected:
+        click.echo("No notes to archive")
+        return
+    if dry_run:
+        for p, _meta in selected:
+            click.echo(f"archive: {os.fspath(p.relative_to(repo_root))}")
+        return
+
+    archive = Archive(repo_root, policy.dir)
+    notes = ((p.relative_to(repo_root).as_posix(), p.read_bytes(), meta) for p, meta in selected)
+    try:
+        written = archive.write_pack(new_ulids(1)[0], notes)
+    except ArchiveError as e:
+        raise click.ClickException(str(e)) from e
+    for p, _meta in selected:
+        p.unlink()
+    click.echo(f"archived {len(written)} note(s) -> {written[0].pack}")
+    _commit(repo_root, f"ノートをアーカイブ: {len(written)}件", defer_push=defer_push)
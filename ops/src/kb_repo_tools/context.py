@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .parsecache import NoteRecord, approx_tokens
+from .sections import Section, read_section, section_at_line, sections_of
+
+# A summary or tag hit says more about relevance than one body line does.
+SUMMARY_WEIGHT = 3
+TAG_WEIGHT = 2
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """One piece of evidence in a context bundle, anchored to ``rel:line``."""
+
+    kind: str  # "summary" | "section" | "related"
+    rel: str
+    line: int
+    end_line: int
+    title: str
+    text: str
+    tokens: int
+
+
+@dataclass(frozen=True)
+class _Candidate:
+    rec: NoteRecord
+    rel: str
+    score: int
+    hit_lines: tuple[int, ...]
+
+
+def _summary_line(rel: str, meta: dict[str, Any], via: str | None = None) -> str:
+    tags = meta.get("tags") or []
+    line = f"- {rel}:1 [{meta.get('id', '')}] {meta.get('summary', '')}"
+    if isinstance(tags, list) and tags:
+        line += f" (tags: {', '.join(str(t) for t in tags)})"
+    if via:
+        line += f" (related to {via})"
+    return line
+
+
+def _rank(
+    repo_root: Path,
+    records: list[NoteRecord],
+    pattern: re.Pattern[str],
+    hits: dict[str, list[int]],
+) -> list[_Candidate]:
+    out: list[_Candidate] = []
+    for rec in records:
+        meta = rec.meta
+        if meta is None:
+            continue
+        rel = rec.path.relative_to(repo_root).as_posix()
+        lines = tuple(hits.get(rel, ()))
+        score = len(lines)
+        if pattern.search(str(meta.get("summary", ""))):
+            score += SUMMARY_WEIGHT
+        tags = meta.get("tags") or []
+        if isinstance(tags, list) and any(pattern.search(str(t)) for t in tags):
+            score += TAG_WEIGHT
+        if score:
+            out.append(_Candidate(rec=rec, rel=rel, score=score, hit_lines=lines))
+    out.sort(key=lambda c: (-c.score, c.rel))
+    return out
+
+
+def _matching_sections(cand: _Candidate) -> list[tuple[Section, int]]:
+    """Sections holding body hits, most hits first (lines above any heading are
+    covered by the summary)."""
+    sections = sections_of(cand.rec.record)
+    counts: dict[Section, int] = {}
+    for line in cand.hit_lines:
+        section = section_at_line(sections, line)
+        if section is not None:
+            counts[section] = counts.get(section, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0].line))
+
+
+def pack_context(
+    repo_root: Path,
+    records: list[NoteRecord],
+    pattern: re.Pattern[str],
+    hits: dict[str, list[int]],
+    budget: int,
+) -> list[Chunk]:
+    """Greedily fill ``budget`` (approximate tokens) with evidence for a query.
+
+    Tiers go in order: summaries of the ranked notes, then their matching
+    sections, then summaries of ``related`` neighbours not already included.
+    A chunk that does not fit is skipped so smaller ones later can still use
+    the remaining budget.
+    """
+    ranked = _rank(repo_root, records, pattern, hits)
+    by_id = {
+        str(rec.meta.get("id", "")).upper(): rec for rec in records if rec.meta is not None
+    }
+    remaining = budget
+    packed: list[Chunk] = []
+
+    def take(chunk: Chunk) -> None:
+        nonlocal remaining
+        if chunk.tokens <= remaining:
+            packed.append(chunk)
+            remaining -= chunk.tokens
+
+    for cand in ranked:
+        meta = cand.rec.meta or {}
+        text = _summary_line(cand.rel, meta)
+        take(Chunk("summary", cand.rel, 1, 1, "", text, approx_tokens(text)))
+
+    for cand in ranked:
+        for section, _count in _matching_sections(cand):
+            if section.end - section.start > remaining * 4:
+                continue  # cannot fit even as pure ASCII; skip the read
+            text = read_section(cand.rec.path, section).rstrip("\n")
+            end_line = section.line + text.count("\n")
+            take(
+                Chunk(
+                    "section",
+                    cand.rel,
+                    section.line,
+                    end_line,
+                    section.title,
+                    text,
+                    approx_tokens(text),
+                )
+            )
+
+    seen = {cand.rel for cand in ranked}
+    for cand in ranked:
+        meta = cand.rec.meta or {}
+        related = meta.get("related") or []
+        if not isinstance(related, list):
+            continue
+        for rid in related:
+            rec = by_id.get(str(rid).upper())
+            if rec is None or rec.meta is None:
+                continue
+            rel = rec.path.relative_to(repo_root).as_posix()
+            if rel in seen:
+                continue
+            seen.add(rel)
+            text = _summary_line(rel, rec.meta, via=str(meta.get("id", "")))
+            take(Chunk("related", rel, 1, 1, "", text, approx_tokens(text)))
+
+    return packed
+
+
+def render_bundle(query: str, chunks: list[Chunk], budget: int) -> str:
+    used = sum(c.tokens for c in chunks)
+    out = [f"# kb context: {query} (~{used}/{budget} tokens)"]
+    for kind, heading in (("summary", "notes"), ("section", "sections"), ("related", "related")):
+        group = [c for c in chunks if c.kind == kind]
+        if not group:
+            continue
+        out.append("")
+        out.append(f"## {heading}")
+        for c in group:
+            if kind == "section":
+                out.append("")
+                out.append(f"### {c.rel}:{c.line}-{c.end_line} {c.title}")
+                out.append(c.text)
+            else:
+                out.append(c.text)
+    return "\n".join(out)
@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import contextlib
+import os
+import re
+import stat
+import tempfile
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -11,9 +17,18 @@ class FrontmatterError(ValueError):
     pass
 
 
-_yaml = YAML(typ="safe")
-_yaml.default_flow_style = False
-_yaml.allow_unicode = True
+_local = threading.local()
+
+
+def _yaml() -> YAML:
+    # YAML instances keep parser state, so each thread gets its own.
+    y = getattr(_local, "yaml", None)
+    if y is None:
+        y = YAML(typ="safe")
+        y.default_flow_style = False
+        y.allow_unicode = True
+        _local.yaml = y
+    return y
 
 
 PREFERRED_KEY_ORDER = [
@@ -32,36 +47,49 @@ PREFERRED_KEY_ORDER = [
 ]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Doc:
     meta: dict[str, Any]
     body: str
 
 
-def split_frontmatter(text: str) -> Doc:
-    lines = text.splitlines()
-    if not lines or lines[0].strip() != "---":
-        raise FrontmatterError("Missing YAML frontmatter (expected starting ---)")
-
-    end_idx = None
-    for i in range(1, len(lines)):
-        if lines[i].strip() == "---":
-            end_idx = i
-            break
+def _frontmatter_span(text: str) -> tuple[int, int, int]:
+    """Offsets (fm_start, fm_end, rest_start) of the frontmatter lines and body.
 
-    if end_idx is None:
-        raise FrontmatterError("Frontmatter not closed (missing terminating ---)")
+    Scans only as far as the closing ``---`` so the body is never split.
+    """
+    first_end = text.find("\n")
+    first = text if first_end < 0 else text[:first_end]
+    if first.strip() != "---":
+        raise FrontmatterError("Missing YAML frontmatter (expected starting ---)")
+    fm_start = pos = len(text) if first_end < 0 else first_end + 1
+    while pos < len(text):
+        nl = text.find("\n", pos)
+        line_end = len(text) if nl < 0 else nl
+        if text[pos:line_end].strip() == "---":
+            return fm_start, pos, line_end if nl < 0 else nl + 1
+        pos = line_end + 1
+    raise FrontmatterError("Frontmatter not closed (missing terminating ---)")
 
-    fm_text = "\n".join(lines[1:end_idx]).strip() + "\n"
-    body = "\n".join(lines[end_idx + 1 :]).lstrip("\n")
 
-    meta = _yaml.load(fm_text) or {}
+def split_frontmatter(text: str) -> Doc:
+    fm_start, fm_end, rest_start = _frontmatter_span(text)
+    fm_text = text[fm_start:fm_end].strip() + "\n"
+    rest = text[rest_start:]
+    if "\r" in rest:
+        body = "\n".join(rest.splitlines()).lstrip("\n")
+    else:
+        body = (rest[:-1] if rest.endswith("\n") else rest).lstrip("\n")
+    return Doc(meta=_load_meta(fm_text), body=body)
+
+
+def _load_meta(fm_text: str) -> dict[str, Any]:
+    meta = _yaml().load(fm_text) or {}
     if not isinstance(meta, dict):
         raise FrontmatterError("Frontmatter must be a YAML mapping")
 
     # ruamel.yaml returns CommentedMap sometimes; normalize to plain dict
-    meta = dict(meta)
-    return Doc(meta=meta, body=body)
+    return dict(meta)
 
 
 def dump_frontmatter(meta: dict[str, Any], body: str) -> str:
@@ -80,13 +108,105 @@ def dump_frontmatter(meta: dict[str, Any], body: str) -> str:
     from io import StringIO
 
     buf = StringIO()
-    _yaml.dump(ordered, buf)
+    _yaml().dump(ordered, buf)
     fm_text = buf.getvalue().rstrip() + "\n"
 
     body = body.rstrip() + "\n"
     return f"---\n{fm_text}---\n\n{body}"
 
 
+def _field_span(fm_lines: list[str], key: str) -> tuple[int, int] | None:
+    key_re = re.compile(rf"^{re.escape(key)}\s*:")
+    for i, line in enumerate(fm_lines):
+        if not key_re.match(line):
+            continue
+        j = i + 1
+        # A value continues over indented lines and column-0 block sequence items.
+        while j < len(fm_lines) and fm_lines[j][:1] in (" ", "\t", "-"):
+            j += 1
+        return i, j
+    return None
+
+
+def _render_field(key: str, value: Any, newline: str) -> list[str]:
+    from io import StringIO
+
+    buf = StringIO()
+    _yaml().dump({key: value}, buf)
+    return [line + newline for line in buf.getvalue().rstrip("\n").split("\n")]
+
+
+def _insert_at(fm_lines: list[str], key: str) -> int:
+    if key in PREFERRED_KEY_ORDER:
+        for later in PREFERRED_KEY_ORDER[PREFERRED_KEY_ORDER.index(key) + 1 :]:
+            span = _field_span(fm_lines, later)
+            if span is not None:
+                return span[0]
+    return len(fm_lines)
+
+
+def patch_frontmatter(
+    text: str, updates: dict[str, Any], body: str | None = None
+) -> str:
+    """Apply field updates (None deletes) and an optional new body to ``text``.
+
+    Only the lines of fields whose value actually changes are re-rendered; key
+    order, quoting, comments and the body bytes are otherwise kept as-is.
+    """
+    fm_start, fm_end, rest_start = _frontmatter_span(text)
+    head = text[:fm_start]
+    newline = "\r\n" if head.endswith("\r\n") else "\n"
+    fm_lines = text[fm_start:fm_end].splitlines(keepends=True)
+
+    for key, value in updates.items():
+        span = _field_span(fm_lines, key)
+        if span is not None:
+            current = _yaml().load("".join(fm_lines[span[0] : span[1]])) or {}
+            if isinstance(current, dict) and key in current and current[key] == value:
+                continue
+            del fm_lines[span[0] : span[1]]
+            at = span[0]
+        elif value is None:
+            continue
+        else:
+            at = _insert_at(fm_lines, key)
+        if value is not None:
+            fm_lines[at:at] = _render_field(key, value, newline)
+
+    closing = text[fm_end:rest_start]
+    if not closing.endswith(("\n", "\r")):
+        closing += newline
+    if body is not None:
+        # Compare in place: notes can be large and slicing would copy the body.
+        start = rest_start
+        while start < len(text) and text[start] in "\r\n":
+            start += 1
+        end = len(text)
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        new_body = body.rstrip()
+        if end - start != len(new_body) or not text.startswith(new_body, start, end):
+            sep = text[rest_start:start] or newline
+            return "".join([head, *fm_lines, closing, sep, new_body, "\n"])
+    return "".join([head, *fm_lines, closing, text[rest_start:]])
+
+
+def read_meta(path: Path) -> dict[str, Any]:
+    """Parse only the frontmatter of ``path``; the body is never read."""
+    with path.open(encoding="utf-8") as f:
+        first = f.readline()
+        if first.strip() != "---":
+            raise FrontmatterError("Missing YAML frontmatter (expected starting ---)")
+        fm_lines: list[str] = []
+        for line in f:
+            if line.strip() == "---":
+                break
+            fm_lines.append(line.rstrip("\r\n"))
+        else:
+            raise FrontmatterError("Frontmatter not closed (missing terminating ---)")
+    return _load_meta("\n".join(fm_lines).strip() + "\n")
+
+
 def read_doc(path: Path) -> Doc:
     return split_frontmatter(path.read_text(encoding="utf-8"))
 
@@ -94,3 +214,26 @@ def read_doc(path: Path) -> Doc:
 def write_doc(path: Path, doc: Doc) -> None:
     text = dump_frontmatter(doc.meta, doc.body)
     path.write_text(text, encoding="utf-8")
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write via a temp file in the same directory and ``os.replace`` it in.
+
+    A reader (or a crash) sees either the old or the new file, never a
+    truncated one. The existing permission bits are kept.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, stat.S_IMODE(path.stat().st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+
+class GitError(RuntimeError):
+    pass
+
+
+# Called once per git process kb starts; see counting_git_processes.
+_git_process_listeners: list[Callable[[], None]] = []
+
+
+@contextmanager
+def counting_git_processes(listener: Callable[[], None]) -> Iterator[None]:
+    """Call ``listener`` for every git subprocess started while active."""
+    _git_process_listeners.append(listener)
+    try:
+        yield
+    finally:
+        _git_process_listeners.remove(listener)
+
+
+def git_process_started() -> None:
+    """Report one git subprocess; every place that starts git calls this."""
+    for listener in tuple(_git_process_listeners):
+        listener()
+
+
+def run_git(repo_root: Path, *args: str) -> bytes:
+    git_process_started()
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=repo_root,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise GitError(f"git {args[0]} failed") from e
+    return result.stdout
+
+
+def state_dir(repo_root: Path) -> Path:
+    """Directory for kb's local caches (``KB_CACHE_DIR`` or ``<git-dir>/kb``)."""
+    env_value = os.environ.get("KB_CACHE_DIR")
+    if env_value and env_value.strip():
+        return Path(env_value.strip()).expanduser()
+    common = run_git(repo_root, "rev-parse", "--git-common-dir").decode().strip()
+    return (repo_root / common).resolve() / "kb"
+
+
+def blob_oid(data: bytes) -> str:
+    # Same digest `git hash-object` produces for a SHA-1 repository.
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _ls_files_tagged(repo_root: Path, paths: Iterable[str]) -> list[tuple[str, str, str]]:
+    """(status tag, repo-relative path, staged blob OID) for tracked files."""
+    out = run_git(repo_root, "ls-files", "-s", "-t", "-z", "--", *paths)
+    entries: list[tuple[str, str, str]] = []
+    for record in out.split(b"\0"):
+        if not record:
+            continue
+        info, _, rel = record.partition(b"\t")
+        tag, _mode, oid, _stage = info.split(b" ")
+        entries.append((tag.decode(), rel.decode("utf-8"), oid.decode()))
+    return entries
+
+
+def ls_files_stage(repo_root: Path, paths: Iterable[str]) -> dict[str, str]:
+    """Map repo-relative path -> staged blob OID for tracked files under ``paths``.
+
+    Entries outside a sparse checkout (skip-worktree) are left out; see
+    ``ls_files_sparse``.
+    """
+    entries = _ls_files_tagged(repo_root, paths)
+    return {rel: oid for tag, rel, oid in entries if tag != "S"}
+
+
+def ls_files_sparse(repo_root: Path, paths: Iterable[str]) -> dict[str, str]:
+    """Map path -> blob OID for tracked files the sparse checkout leaves out."""
+    entries = _ls_files_tagged(repo_root, paths)
+    return {rel: oid for tag, rel, oid in entries if tag == "S"}
+
+
+def sparse_checkout_enabled(repo_root: Path) -> bool:
+    try:
+        out = run_git(repo_root, "config", "--bool", "core.sparseCheckout")
+    except GitError:
+        return False  # unset
+    return out.strip() == b"true"
+
+
+def ls_files_dirty(repo_root: Path, paths: Iterable[str]) -> list[str]:
+    """Paths whose worktree content may differ from the index (incl. untracked)."""
+    out = run_git(
+        repo_root, "ls-files", "-m", "-o", "--exclude-standard", "-z", "--", *paths
+    )
+    return sorted({rel.decode("utf-8") for rel in out.split(b"\0") if rel})
+
+
+def staged_changes(repo_root: Path, paths: Iterable[str]) -> list[tuple[str, str, str]]:
+    """(status letter, path, staged blob OID) for index changes against HEAD."""
+    out = run_git(
+        repo_root,
+        "diff",
+        "--cached",
+        "--raw",
+        "-z",
+        "--no-renames",
+        "--no-abbrev",
+        "--",
+        *paths,
+    )
+    fields = out.split(b"\0")
+    changes: list[tuple[str, str, str]] = []
+    for info, rel in zip(fields[0::2], fields[1::2]):
+        new_oid, status = info.split()[3:5]
+        changes.append((status.decode()[:1], rel.decode("utf-8"), new_oid.decode()))
+    return changes
+
+
+def head_commit(repo_root: Path) -> str | None:
+    try:
+        return run_git(repo_root, "rev-parse", "--verify", "-q", "HEAD").decode().strip()
+    except GitError:
+        return None  # unborn branch (or not a repository)
+
+
+def changed_paths(
+    repo_root: Path, old: str | None, new: str, paths: Iterable[str]
+) -> list[str]:
+    """Files under ``paths`` that differ between commits (every file if ``old`` is None)."""
+    if old is None:
+        out = run_git(repo_root, "ls-tree", "-r", "-z", "--name-only", new, "--", *paths)
+    else:
+        out = run_git(
+            repo_root,
+            "diff-tree",
+            "-r",
+            "-z",
+            "--name-only",
+            "--no-renames",
+            old,
+            new,
+            "--",
+            *paths,
+        )
+    return [rel.decode("utf-8") for rel in out.split(b"\0") if rel]
+
+
+class CatFileBatch:
+    """One long-lived ``git cat-file --batch`` process for reading many objects."""
+
+    def __init__(self, repo_root: Path) -> None:
+        git_process_started()
+        try:
+            self._proc = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=repo_root,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise GitError("git cat-file failed") from e
+
+    def read(self, rev: str) -> bytes | None:
+        """Contents of ``rev`` (an OID or ``<commit>:<path>``), None if missing."""
+        stdin = self._proc.stdin
+        stdout = self._proc.stdout
+        assert stdin is not None and stdout is not None
+        stdin.write(rev.encode("utf-8") + b"\n")
+        stdin.flush()
+        header = stdout.readline()
+        if not header:
+            raise GitError("git cat-file exited unexpectedly")
+        parts = header.split()
+        if len(parts) != 3:
+            return None  # "<rev> missing" / "<rev> ambiguous"
+        data = stdout.read(int(parts[2]))
+        stdout.read(1)  # trailing LF
+        return data
+
+    def close(self) -> None:
+        if self._proc.stdin is not None:
+            self._proc.stdin.close()
+        self._proc.wait()
+        if self._proc.stdout is not None:
+            self._proc.stdout.close()
+
+    def __enter__(self) -> CatFileBatch:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from .gitutil import CatFileBatch, GitError, run_git, state_dir
+from .parsecache import ParseCache, parse_note_bytes
+
+INDEX_FORMAT = "kb-history-index"
+INDEX_VERSION = 1
+
+_ZERO_OID = "0" * 40
+
+
+@dataclass(frozen=True)
+class Version:
+    """One note blob as it was introduced by a commit."""
+
+    oid: str
+    commit: str
+    time: int
+    date: str
+    path: str
+
+
+@dataclass(frozen=True)
+class HistoryHit:
+    note_id: str
+    commit: str
+    time: int
+    date: str
+    path: str
+    line: int
+    text: str
+
+
+class HistoryIndex:
+    """Every note blob ever committed, with the commit, date and path it had.
+
+    Stored as append-only JSONL; each update walks only the commits after the
+    last indexed head.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.head: str | None = None
+        self.versions: list[Version] = []
+        if path.exists():
+            self._load()
+
+    @classmethod
+    def for_repo(cls, repo_root: Path) -> HistoryIndex:
+        return cls(state_dir(repo_root) / "history-index.jsonl")
+
+    def _load(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("format") == INDEX_FORMAT:
+                    if entry.get("version") != INDEX_VERSION:
+                        self.head = None
+                        self.versions = []
+                        return
+                elif "head" in entry:
+                    self.head = entry["head"]
+                elif "oid" in entry:
+                    self.versions.append(Version(**entry))
+
+    def _reset(self) -> None:
+        self.head = None
+        self.versions = []
+        self.path.unlink(missing_ok=True)
+
+    def update(self, repo_root: Path, note_dirs: Iterable[str]) -> int:
+        """Index commits reachable from HEAD that are not indexed yet."""
+        head = run_git(repo_root, "rev-parse", "HEAD").decode().strip()
+        if head == self.head:
+            return 0
+        rev_range = "HEAD"
+        if self.head is not None:
+            try:
+                run_git(repo_root, "merge-base", "--is-ancestor", self.head, "HEAD")
+                rev_range = f"{self.head}..HEAD"
+            except GitError:
+                self._reset()  # history was rewritten; start over
+
+        out = run_git(
+            repo_root,
+            "-c",
+            "core.quotepath=off",
+            "log",
+            "--reverse",
+            "--no-renames",
+            "--raw",
+            "--no-abbrev",
+            "--format=commit %H %ct %cI",
+            rev_range,
+            "--",
+            *note_dirs,
+        ).decode("utf-8")
+        added = list(_parse_raw_log(out))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        with self.path.open("a", encoding="utf-8") as f:
+            if fresh:
+                header = {"format": INDEX_FORMAT, "version": INDEX_VERSION}
+                f.write(json.dumps(header) + "\n")
+            for v in added:
+                f.write(json.dumps(v.__dict__, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"head": head}) + "\n")
+        self.versions.extend(added)
+        self.head = head
+        return len(added)
+
+    def search(
+        self,
+        repo_root: Path,
+        pattern: re.Pattern[str],
+        cache: ParseCache | None = None,
+    ) -> list[HistoryHit]:
+        """Lines matching ``pattern`` in any indexed version, newest first.
+
+        Each distinct blob is read once; a line that survives many edits of the
+        same note is reported once, at the latest version that still had it.
+        """
+        # Versions are kept in commit order; the position breaks timestamp ties.
+        newest_by_oid: dict[str, tuple[int, Version]] = {}
+        for seq, v in enumerate(self.versions):
+            newest_by_oid[v.oid] = (seq, v)
+
+        latest: dict[tuple[str, str], tuple[tuple[int, int], HistoryHit]] = {}
+        with CatFileBatch(repo_root) as cat:
+            for oid, (seq, newest) in newest_by_oid.items():
+                data = cat.read(oid)
+                if data is None:
+                    continue
+                text = data.decode("utf-8", errors="replace")
+                if pattern.search(text) is None:
+                    continue
+                note_id = _note_id(oid, data, cache)
+                rank = (newest.time, seq)
+                for lineno, line in enumerate(text.splitlines(), start=1):
+                    if pattern.search(line) is None:
+                        continue
+                    key = (note_id or newest.path, line)
+                    if key in latest and latest[key][0] >= rank:
+                        continue
+                    latest[key] = (
+                        rank,
+                        HistoryHit(
+                            note_id=note_id,
+                            commit=newest.commit,
+                            time=newest.time,
+                            date=newest.date,
+                            path=newest.path,
+                            line=lineno,
+                            text=line,
+                        ),
+                    )
+        if cache is not None:
+            cache.save()
+        ranked = sorted(latest.values(), key=lambda item: (item[0], item[1].line))
+        return [hit for _rank, hit in reversed(ranked)]
+
+
+def _note_id(oid: str, data: bytes, cache: ParseCache | None) -> str:
+    record = cache.get(oid) if cache is not None else None
+    if record is None:
+        record = parse_note_bytes(data)
+        if cache is not None:
+            cache.put(oid, record)
+    meta = record.get("meta") or {}
+    return str(meta.get("id", "")).upper()
+
+
+def _parse_raw_log(out: str) -> Iterable[Version]:
+    commit = date = ""
+    time = 0
+    for line in out.splitlines():
+        if line.startswith("commit "):
+            _, commit, ts, date = line.split(" ", 3)
+            time = int(ts)
+        elif line.startswith(":"):
+            info, _, path = line.partition("\t")
+            fields = info.split()
+            new_oid, status = fields[3], fields[4]
+            if status.startswith("D") or new_oid == _ZERO_OID:
+                continue
+            if path.endswith(".md"):
+                yield Version(oid=new_oid, commit=commit, time=time, date=date, path=path)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable
+
+from .frontmatter import atomic_write_text
+from .gitutil import CatFileBatch, GitError, run_git, state_dir
+from .parsecache import ParseCache, parse_note_bytes
+
+IDSET_FORMAT = "kb-id-set"
+IDSET_VERSION = 1
+
+
+def _note_id(cat: CatFileBatch, cache: ParseCache, oid: str) -> str:
+    record = cache.get(oid)
+    if record is None:
+        data = cat.read(oid)
+        if data is None:
+            return ""
+        record = parse_note_bytes(data)
+        cache.put(oid, record)
+    return str((record.get("meta") or {}).get("id", "")).upper()
+
+
+class CommittedIds:
+    """Note id of every ``.md`` blob in a commit's tree, cached by tree OID.
+
+    Moving to a newer tree diffs it against the cached one, so only blobs that
+    changed are looked up (in the parse cache first, then via cat-file).
+    """
+
+    def __init__(self, path: Path, note_dirs: Iterable[str]) -> None:
+        self.path = path
+        self.note_dirs = list(note_dirs)
+        self.tree: str | None = None
+        self.by_path: dict[str, str] = {}
+        self._by_id: dict[str, list[str]] | None = None
+        if path.exists():
+            self._load()
+
+    @classmethod
+    def for_repo(cls, repo_root: Path, note_dirs: Iterable[str]) -> CommittedIds:
+        return cls(state_dir(repo_root) / "id-set.json", note_dirs)
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if (
+            data.get("format") != IDSET_FORMAT
+            or data.get("version") != IDSET_VERSION
+            or data.get("dirs") != self.note_dirs
+        ):
+            return
+        self.tree = data.get("tree")
+        self.by_path = dict(data.get("paths") or {})
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "format": IDSET_FORMAT,
+            "version": IDSET_VERSION,
+            "dirs": self.note_dirs,
+            "tree": self.tree,
+            "paths": self.by_path,
+        }
+        atomic_write_text(self.path, json.dumps(payload, ensure_ascii=False))
+
+    def paths(self, note_id: str) -> list[str]:
+        if self._by_id is None:
+            self._by_id = {}
+            for rel, nid in self.by_path.items():
+                self._by_id.setdefault(nid, []).append(rel)
+        return self._by_id.get(note_id, [])
+
+    def update(
+        self, repo_root: Path, cat: CatFileBatch, cache: ParseCache, rev: str = "HEAD"
+    ) -> None:
+        try:
+            tree = run_git(repo_root, "rev-parse", "--verify", "-q", f"{rev}^{{tree}}")
+        except GitError:
+            return  # no commits yet: nothing is committed
+        tree_oid = tree.decode().strip()
+        if tree_oid == self.tree:
+            return
+
+        changed: list[tuple[str, str | None]] | None = None
+        if self.tree is not None:
+            try:
+                changed = _tree_diff(repo_root, self.tree, tree_oid, self.note_dirs)
+            except GitError:
+                pass  # the cached tree is gone (gc); list the whole tree
+        if changed is None:
+            self.by_path = {}
+            changed = _tree_listing(repo_root, tree_oid, self.note_dirs)
+
+        for rel, oid in changed:
+            self.by_path.pop(rel, None)
+            if oid is None or not rel.endswith(".md"):
+                continue
+            note_id = _note_id(cat, cache, oid)
+            if note_id:
+                self.by_path[rel] = note_id
+        self.tree = tree_oid
+        self._by_id = None
+        cache.save()
+        self._save()
+
+
+def _tree_diff(
+    repo_root: Path, old: str, new: str, note_dirs: list[str]
+) -> list[tuple[str, str | None]]:
+    """(path, new blob OID or None if deleted) for each path changed between trees."""
+    out = run_git(
+        repo_root,
+        "diff-tree",
+        "-r",
+        "-z",
+        "--no-renames",
+        "--no-abbrev",
+        old,
+        new,
+        "--",
+        *note_dirs,
+    )
+    fields = out.split(b"\0")
+    changed: list[tuple[str, str | None]] = []
+    for info, rel in zip(fields[0::2], fields[1::2]):
+        new_oid, status = info.split()[3:5]
+        changed.append((rel.decode("utf-8"), None if status == b"D" else new_oid.decode()))
+    return changed
+
+
+def _tree_listing(
+    repo_root: Path, tree: str, note_dirs: list[str]
+) -> list[tuple[str, str | None]]:
+    out = run_git(repo_root, "ls-tree", "-r", "-z", tree, "--", *note_dirs)
+    listing: list[tuple[str, str | None]] = []
+    for record in out.split(b"\0"):
+        if record:
+            info, _, rel = record.partition(b"\t")
+            listing.append((rel.decode("utf-8"), info.split()[2].decode()))
+    return listing
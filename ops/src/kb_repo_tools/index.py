@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from .ulidutil import ulid_time_prefix
+
+ULID_PATTERN = r"[0-9A-HJKMNP-TV-Z]{26}"
+_ID_PREFIX_RE = re.compile(r"[0-9A-HJKMNP-TV-Z]{1,26}")
+_SLUG_PATTERN = r"[a-z0-9]+(?:-[a-z0-9]+)*"
+
+
+def compile_file_template(
+    template: str, id_pattern: str = ULID_PATTERN
+) -> re.Pattern[str]:
+    """Compile ``naming.file_template`` into a regex capturing the note id."""
+    pattern = re.escape(template)
+    pattern = pattern.replace(re.escape("{id}"), f"(?P<id>{id_pattern})", 1)
+    pattern = pattern.replace(re.escape("{slug}"), _SLUG_PATTERN)
+    return re.compile(pattern)
+
+
+def is_id_prefix(value: str) -> bool:
+    return _ID_PREFIX_RE.fullmatch(value.upper()) is not None
+
+
+class AmbiguousIdError(ValueError):
+    def __init__(self, prefix: str, candidates: list[tuple[str, Path]]) -> None:
+        super().__init__(f"Ambiguous id prefix: {prefix} ({len(candidates)} notes)")
+        self.prefix = prefix
+        self.candidates = candidates
+
+
+class IdIndex:
+    """Note ids taken from filenames, kept sorted for binary search.
+
+    ULIDs sort lexicographically in creation order, so time-range lookups only
+    need the filenames, not the note contents.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, Path]]) -> None:
+        pairs = sorted(entries)
+        self.ids: list[str] = [note_id for note_id, _ in pairs]
+        self.paths: list[Path] = [path for _, path in pairs]
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Path], template: str) -> IdIndex:
+        name_re = compile_file_template(template)
+        entries: list[tuple[str, Path]] = []
+        for p in paths:
+            m = name_re.fullmatch(p.name)
+            if m is not None:
+                entries.append((m.group("id"), p))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def refreshed(self, changed: Iterable[Path], template: str) -> IdIndex:
+        """A copy with just ``changed`` re-taken from disk (dropped if gone)."""
+        stale = set(changed)
+        kept = [(i, p) for i, p in zip(self.ids, self.paths) if p not in stale]
+        fresh = IdIndex.from_paths([p for p in stale if p.is_file()], template)
+        return IdIndex([*kept, *zip(fresh.ids, fresh.paths)])
+
+    def get(self, note_id: str) -> Path | None:
+        note_id = note_id.upper()
+        i = bisect_left(self.ids, note_id)
+        if i < len(self.ids) and self.ids[i] == note_id:
+            return self.paths[i]
+        return None
+
+    def with_prefix(self, prefix: str) -> list[tuple[str, Path]]:
+        """Entries whose id starts with ``prefix``: one contiguous sorted run."""
+        prefix = prefix.upper()
+        lo = bisect_left(self.ids, prefix)
+        hi = bisect_left(self.ids, prefix + "~", lo)  # "~" sorts after every ULID char
+        return list(zip(self.ids[lo:hi], self.paths[lo:hi]))
+
+    def resolve(self, prefix: str) -> tuple[str, Path] | None:
+        """The entry a full id or unique prefix names, like git's short hashes.
+
+        A prefix naming one id is unique even if that id is duplicated (lint
+        reports those); like the full id, it resolves to the first copy.
+        """
+        matches = self.with_prefix(prefix)
+        if matches and matches[0][0] != matches[-1][0]:
+            raise AmbiguousIdError(prefix.upper(), matches)
+        return matches[0] if matches else None
+
+    def abbreviations(self, min_length: int = 4) -> list[tuple[str, Path]]:
+        """Shortest unique prefix (at least ``min_length`` chars) of every id.
+
+        In a sorted list an id shares the longest prefix with its nearest
+        different neighbours, so one pass over each run of equal ids (a
+        duplicated id) is enough.
+        """
+        out: list[tuple[str, Path]] = []
+        ids = self.ids
+        start = 0
+        while start < len(ids):
+            end = start
+            while end < len(ids) and ids[end] == ids[start]:
+                end += 1
+            shared = 0
+            for j in (start - 1, end):  # nearest different id on each side
+                if 0 <= j < len(ids):
+                    shared = max(shared, _common_prefix(ids[start], ids[j]))
+            prefix = ids[start][: max(min_length, shared + 1)]
+            out.extend((prefix, path) for path in self.paths[start:end])
+            start = end
+        return out
+
+    def created_between(
+        self, after: datetime | None = None, before: datetime | None = None
+    ) -> list[tuple[str, Path]]:
+        """Entries created at or after ``after`` and strictly before ``before``."""
+        lo = 0
+        hi = len(self.ids)
+        if after is not None:
+            lo = bisect_left(self.ids, ulid_time_prefix(_to_ms(after)))
+        if before is not None:
+            hi = bisect_left(self.ids, ulid_time_prefix(_to_ms(before)))
+        return list(zip(self.ids[lo:hi], self.paths[lo:hi]))
+
+
+def _to_ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
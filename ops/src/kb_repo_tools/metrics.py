@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from .frontmatter import atomic_write_text
+from .gitutil import counting_git_processes
+from .timeutil import now_jst
+
+
+class RunMetrics:
+    """Counters and per-phase wall times for one kb command run."""
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.counters: dict[str, int] = {}
+        self.phases: dict[str, float] = {}
+        self.git_subprocesses = 0
+        self.status = "unknown"
+        self._started = time.perf_counter()
+        self._started_at = now_jst()
+
+    def add(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def track_git(self) -> Iterator[RunMetrics]:
+        """Count the git subprocesses kb starts (any thread) while active."""
+        with counting_git_processes(self._git_process_started):
+            yield self
+
+    def _git_process_started(self) -> None:
+        self.git_subprocesses += 1
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "ts": self._started_at.isoformat(timespec="seconds"),
+            "command": self.command,
+            "status": self.status,
+            **dict(sorted(self.counters.items())),
+            "git_subprocesses": self.git_subprocesses,
+            "phases": {k: round(v, 6) for k, v in self.phases.items()},
+            "wall_seconds": round(time.perf_counter() - self._started, 6),
+        }
+
+
+def append_jsonl(path: Path, record: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def prometheus_text(record: dict[str, Any], prefix: str = "kb") -> str:
+    """Render a run record in the Prometheus text exposition format."""
+    base = f"{prefix}_{record['command']}"
+    lines: list[str] = []
+
+    def gauge(name: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    for key, value in record.items():
+        if isinstance(value, int) and not isinstance(value, bool):
+            gauge(f"{base}_{key}", f"{key} in the last {record['command']} run.", [("", value)])
+    gauge(
+        f"{base}_phase_seconds",
+        "Wall time per phase of the last run.",
+        [(f'{{phase="{k}"}}', v) for k, v in record["phases"].items()],
+    )
+    gauge(f"{base}_wall_seconds", "Wall time of the last run.", [("", record["wall_seconds"])])
+    gauge(
+        f"{base}_last_run_timestamp_seconds",
+        "Unix time the last run finished.",
+        [(f'{{status="{record["status"]}"}}', round(time.time(), 3))],
+    )
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path, record: dict[str, Any]) -> None:
+    # node_exporter's textfile collector must never see a half-written file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, prometheus_text(record))
@@ -1,17 +1,64 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import os
 from pathlib import Path
 from typing import Any, Iterable
 
-from .frontmatter import Doc, FrontmatterError, read_doc
+from .frontmatter import FrontmatterError, read_doc, read_meta
 
 
-@dataclass(frozen=True)
 class Note:
-    path: Path
-    meta: dict[str, Any]
-    body: str
+    """A note file whose frontmatter and body are read on first access.
+
+    Slotted and lazy so that holding many of them costs little more than the
+    path; ``meta`` never reads past the closing ``---``. Notes are equal (and
+    hash alike) when they point at the same file, loaded or not.
+    """
+
+    __slots__ = ("_path", "_meta", "_body")
+
+    def __init__(
+        self,
+        path: Path | str,
+        meta: dict[str, Any] | None = None,
+        body: str | None = None,
+    ) -> None:
+        self._path = os.fspath(path)
+        self._meta = meta
+        self._body = body
+
+    @property
+    def path(self) -> Path:
+        return Path(self._path)
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        if self._meta is None:
+            self._meta = read_meta(self.path)
+        return self._meta
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            doc = read_doc(self.path)
+            self._meta = doc.meta
+            self._body = doc.body
+        return self._body
+
+    @property
+    def id(self) -> str:
+        return str(self.meta.get("id", "")).upper()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Note):
+            return NotImplemented
+        return self._path == other._path
+
+    def __hash__(self) -> int:
+        return hash(self._path)
+
+    def __repr__(self) -> str:
+        return f"Note({self._path!r})"
 
 
 def iter_note_paths(repo_root: Path, note_dirs: Iterable[str]) -> Iterable[Path]:
@@ -25,8 +72,8 @@ def iter_note_paths(repo_root: Path, note_dirs: Iterable[str]) -> Iterable[Path]
 
 
 def read_note(path: Path) -> Note:
-    doc: Doc = read_doc(path)
-    return Note(path=path, meta=doc.meta, body=doc.body)
+    doc = read_doc(path)
+    return Note(path, meta=doc.meta, body=doc.body)
 
 
 def try_read_note(path: Path) -> Note | None:
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from .frontmatter import FrontmatterError, split_frontmatter
+from .gitutil import (
+    CatFileBatch,
+    GitError,
+    blob_oid,
+    ls_files_dirty,
+    ls_files_sparse,
+    ls_files_stage,
+    sparse_checkout_enabled,
+    state_dir,
+)
+from .notes import iter_note_paths
+
+CACHE_FORMAT = "kb-parse-cache"
+# Bump when parse_note_bytes output changes; older entries are then ignored.
+PARSER_VERSION = 1
+
+_HEADING_RE = re.compile(rb"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE_RE = re.compile(rb"^(```|~~~)")
+
+
+def approx_tokens(text: str) -> int:
+    """Rough LLM token estimate: ~4 ASCII chars per token, ~1 per CJK char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _json_safe(value: Any) -> Any:
+    # YAML may yield dates and other non-JSON scalars; store them as text.
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _headings(data: bytes) -> list[list[Any]]:
+    """[level, title, line (1-based), byte offset] for each ATX heading."""
+    out: list[list[Any]] = []
+    offset = 0
+    in_fence = False
+    in_frontmatter = data.startswith(b"---")
+    for lineno, line in enumerate(data.splitlines(keepends=True), start=1):
+        stripped = line.rstrip(b"\r\n")
+        if in_frontmatter:
+            if lineno > 1 and stripped.strip() == b"---":
+                in_frontmatter = False
+        elif _FENCE_RE.match(stripped):
+            in_fence = not in_fence
+        elif not in_fence:
+            m = _HEADING_RE.match(stripped)
+            if m is not None:
+                title = m.group(2).decode("utf-8", errors="replace")
+                out.append([len(m.group(1)), title, lineno, offset])
+        offset += len(line)
+    return out
+
+
+def parse_note_bytes(data: bytes) -> dict[str, Any]:
+    """Parse one note blob into a JSON-serializable record."""
+    text = data.decode("utf-8", errors="replace")
+    record: dict[str, Any] = {
+        "v": PARSER_VERSION,
+        "headings": _headings(data),
+        "stats": {
+            "bytes": len(data),
+            "lines": text.count("\n") + (0 if text.endswith("\n") or not text else 1),
+            "tokens": approx_tokens(text),
+        },
+    }
+    try:
+        record["meta"] = _json_safe(split_frontmatter(text).meta)
+    except FrontmatterError as e:
+        record["error"] = str(e)
+    except Exception as e:  # malformed YAML inside an otherwise framed block
+        record["error"] = f"Invalid YAML frontmatter: {e}"
+    return record
+
+
+class ParseCache:
+    """Parse records keyed by git blob OID, stored as portable JSONL.
+
+    The file holds no paths or timestamps, so a cache built on one machine can
+    be copied to (or merged into) another checkout of the same repository.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._records: dict[str, dict[str, Any]] = {}
+        self._new: dict[str, dict[str, Any]] = {}
+        self._loaded = False
+
+    @classmethod
+    def for_repo(cls, repo_root: Path) -> ParseCache:
+        return cls(state_dir(repo_root) / "parse-cache.jsonl")
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._records)
+
+    def load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path.exists():
+            self._records.update(_read_cache_file(self.path))
+
+    def get(self, oid: str) -> dict[str, Any] | None:
+        self.load()
+        return self._records.get(oid)
+
+    def put(self, oid: str, record: dict[str, Any]) -> None:
+        self.load()
+        if oid not in self._records:
+            self._new[oid] = record
+        self._records[oid] = record
+
+    def merge_file(self, path: Path) -> int:
+        """Import records from another cache file; returns how many were new."""
+        added = 0
+        for oid, record in _read_cache_file(path).items():
+            if self.get(oid) is None:
+                self.put(oid, record)
+                added += 1
+        return added
+
+    def save(self) -> None:
+        """Append new records; a missing file is created with just its header."""
+        if not self._new and self.path.exists():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        with self.path.open("a", encoding="utf-8") as f:
+            if fresh:
+                header = {"format": CACHE_FORMAT, "version": PARSER_VERSION}
+                f.write(json.dumps(header) + "\n")
+            for oid, record in self._new.items():
+                f.write(json.dumps({"oid": oid, **record}, ensure_ascii=False) + "\n")
+        self._new.clear()
+
+
+def _read_cache_file(path: Path) -> dict[str, dict[str, Any]]:
+    records: dict[str, dict[str, Any]] = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # tolerate a torn trailing line from an interrupted run
+            if not isinstance(entry, dict) or entry.get("v") != PARSER_VERSION:
+                continue
+            oid = entry.pop("oid", None)
+            if isinstance(oid, str):
+                records[oid] = entry
+    return records
+
+
+@dataclass(frozen=True, slots=True)
+class NoteRecord:
+    path: Path
+    oid: str
+    record: dict[str, Any]
+    # False for catalog entries outside a sparse checkout (no file on disk).
+    in_worktree: bool = True
+
+    @property
+    def meta(self) -> dict[str, Any] | None:
+        return self.record.get("meta")
+
+
+def _note_blob_oids(repo_root: Path, note_dirs: list[str]) -> dict[str, str | None]:
+    """Repo-relative note path -> blob OID (None when it must be hashed locally)."""
+    staged = ls_files_stage(repo_root, note_dirs)
+    entries: dict[str, str | None] = {
+        rel: oid for rel, oid in staged.items() if rel.endswith(".md")
+    }
+    for rel in ls_files_dirty(repo_root, note_dirs):
+        if rel.endswith(".md"):
+            entries[rel] = None
+    return entries
+
+
+def load_note_records(
+    repo_root: Path,
+    note_dirs: Iterable[str],
+    cache: ParseCache | None = None,
+) -> list[NoteRecord]:
+    """Parse records for every note, only parsing blobs the cache hasn't seen.
+
+    Enumeration uses ``git ls-files -s`` so unchanged files are never read;
+    files that differ from the index are hashed like ``git hash-object``.
+    Outside a git worktree every note is parsed directly.
+    """
+    note_dirs = list(note_dirs)
+    if cache is None:
+        try:
+            cache = ParseCache.for_repo(repo_root)
+        except GitError:
+            cache = None
+    try:
+        entries = _note_blob_oids(repo_root, note_dirs)
+    except GitError:
+        entries = {
+            p.relative_to(repo_root).as_posix(): None
+            for p in iter_note_paths(repo_root, note_dirs)
+        }
+
+    out: list[NoteRecord] = []
+    for rel in sorted(entries):
+        oid = entries[rel]
+        path = repo_root / rel
+        record = cache.get(oid) if (cache is not None and oid is not None) else None
+        if record is None:
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue  # deleted in the worktree but still in the index
+            oid = blob_oid(data)
+            record = cache.get(oid) if cache is not None else None
+            if record is None:
+                record = parse_note_bytes(data)
+                if cache is not None:
+                    cache.put(oid, record)
+        out.append(NoteRecord(path=path, oid=oid, record=record))
+
+    if cache is not None:
+        cache.save()
+    return out
+
+
+def load_sparse_records(
+    repo_root: Path,
+    note_dirs: Iterable[str],
+    cache: ParseCache | None = None,
+) -> list[NoteRecord]:
+    """Catalog of the notes a sparse checkout leaves out of the worktree.
+
+    Their blob OIDs come from the index (skip-worktree entries); records are
+    served from the parse cache, and blobs it hasn't seen are read through a
+    single ``git cat-file --batch`` without checking anything out. Empty when
+    sparse checkout is off or git is unavailable.
+    """
+    note_dirs = list(note_dirs)
+    try:
+        if not sparse_checkout_enabled(repo_root):
+            return []
+        entries = {
+            rel: oid
+            for rel, oid in ls_files_sparse(repo_root, note_dirs).items()
+            if rel.endswith(".md")
+        }
+        if cache is None:
+            cache = ParseCache.for_repo(repo_root)
+    except GitError:
+        return []
+
+    out: list[NoteRecord] = []
+    missing = [rel for rel in sorted(entries) if cache.get(entries[rel]) is None]
+    if missing:
+        try:
+            with CatFileBatch(repo_root) as batch:
+                for rel in missing:
+                    data = batch.read(entries[rel])
+                    if data is not None:
+                        cache.put(entries[rel], parse_note_bytes(data))
+        except GitError:
+            pass  # keep whatever was read; the rest stays out of the catalog
+        cache.save()
+    for rel in sorted(entries):
+        oid = entries[rel]
+        record = cache.get(oid)
+        if record is not None:
+            path = repo_root / rel
+            out.append(NoteRecord(path=path, oid=oid, record=record, in_worktree=False))
+    return out
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from .frontmatter import atomic_write_text
+from .gitutil import git_process_started, state_dir
+from .timeutil import now_jst
+
+# A lock older than this belongs to a worker that died without cleaning up.
+STALE_LOCK_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class FlushResult:
+    pushed: int  # queued commits delivered by this flush
+    error: str | None = None
+
+
+@contextlib.contextmanager
+def _file_lock(path: Path, *, wait: float = 0.0) -> Iterator[bool]:
+    """Exclusive lock file (O_EXCL, so it also works on Windows); yields False if busy."""
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            with contextlib.suppress(FileNotFoundError):
+                if time.time() - path.stat().st_mtime > STALE_LOCK_SECONDS:
+                    path.unlink()
+                    continue
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield True
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+
+
+def _git(repo_root: Path, *args: str) -> str | None:
+    """Run git; None on success, otherwise the last line git printed."""
+    git_process_started()
+    result = subprocess.run(
+        ["git", *args],
+        cwd=repo_root,
+        check=False,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode == 0:
+        return None
+    lines = (result.stderr or result.stdout).strip().splitlines()
+    return lines[-1] if lines else f"git {args[0]} exited with {result.returncode}"
+
+
+class PushQueue:
+    """Local commits waiting to be pushed, delivered by one worker at a time.
+
+    ``pending`` is an append-only JSONL list of queued commits; a flush pushes
+    the branch once, however many commits are queued, and then drops the
+    entries it delivered.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.pending_path = directory / "push-queue.jsonl"
+        self.status_path = directory / "push-queue-status.json"
+        self.log_path = directory / "push-queue.log"
+        self._worker_lock = directory / "push-queue.lock"
+        self._file_lock = directory / "push-queue.jsonl.lock"
+
+    @classmethod
+    def for_repo(cls, repo_root: Path) -> PushQueue:
+        return cls(state_dir(repo_root))
+
+    def pending(self) -> list[dict[str, Any]]:
+        if not self.pending_path.exists():
+            return []
+        entries = []
+        for line in self.pending_path.read_text(encoding="utf-8").splitlines():
+            with contextlib.suppress(json.JSONDecodeError):
+                entries.append(json.loads(line))
+        return entries
+
+    def status(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.status_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def worker_running(self) -> bool:
+        try:
+            return time.time() - self._worker_lock.stat().st_mtime <= STALE_LOCK_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def enqueue(self, commit: str, message: str) -> None:
+        self.pending_path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"commit": commit, "message": message, "queued": now_jst().isoformat()}
+        # Append even if the lock looks stuck: a lost entry is worse than a race.
+        with _file_lock(self._file_lock, wait=10.0):
+            with self.pending_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _drop(self, delivered: int) -> None:
+        with _file_lock(self._file_lock, wait=10.0):
+            rest = self.pending()[delivered:]
+            if rest:
+                lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in rest)
+                atomic_write_text(self.pending_path, lines)
+            else:
+                self.pending_path.unlink(missing_ok=True)
+
+    def flush(
+        self, repo_root: Path, *, retries: int = 3, wait: float = 0.0, rebase: bool = False
+    ) -> FlushResult | None:
+        """Push until the queue is empty; None if another flush holds the lock.
+
+        Only a foreground flush passes ``rebase``: replaying commits rewrites
+        HEAD, which must never happen under a command committing in the same
+        worktree. A background flush records the rejection and stops.
+        """
+        self.pending_path.parent.mkdir(parents=True, exist_ok=True)
+        pushed = 0
+        while True:
+            with _file_lock(self._worker_lock, wait=wait) as locked:
+                if not locked:
+                    return None
+                queued = len(self.pending())
+                if queued:
+                    error = _push_with_retry(repo_root, retries if rebase else 1, rebase=rebase)
+                    record: dict[str, Any] = {
+                        "last_attempt": now_jst().isoformat(),
+                        "last_error": error,
+                    }
+                    if error is None:
+                        self._drop(queued)
+                        pushed += queued
+                        record["last_push"] = record["last_attempt"]
+                    else:
+                        record["last_push"] = self.status().get("last_push")
+                    atomic_write_text(self.status_path, json.dumps(record, ensure_ascii=False))
+                    if error is not None:
+                        return FlushResult(pushed=pushed, error=error)
+            # An enqueue that saw the lock held did not spawn a worker, so look
+            # again once it is released: its commit is never stranded.
+            if not queued and not self.pending():
+                return FlushResult(pushed=pushed)
+
+    def spawn_worker(self, repo_root: Path) -> None:
+        """Flush in a detached ``kb sync --worker`` process; output goes to the log."""
+        if self.worker_running():
+            return  # the running worker re-checks the queue before it exits
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.log_path.open("ab") as log:
+            kwargs: dict[str, Any] = {}
+            if sys.platform == "win32":
+                kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+            else:
+                kwargs["start_new_session"] = True
+            subprocess.Popen(
+                [sys.executable, "-m", "kb_repo_tools", "sync", "--worker"],
+                cwd=repo_root,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                **kwargs,
+            )
+
+
+def _push_with_retry(repo_root: Path, retries: int, *, rebase: bool) -> str | None:
+    has_upstream = _git(repo_root, "rev-parse", "--symbolic-full-name", "@{u}") is None
+    error: str | None = None
+    for attempt in range(retries):
+        if has_upstream:
+            error = _git(repo_root, "push")
+        else:
+            error = _git(repo_root, "push", "-u", "origin", "HEAD")
+            has_upstream = error is None
+        if error is None:
+            return None
+        if not rebase:
+            return f"{error} (run kb sync to rebase and push)"
+        if not has_upstream or attempt == retries - 1:
+            break
+        # Rejected (usually non-fast-forward): replay the local commits on top
+        # of the remote and try again.
+        rebase_error = _git(repo_root, "pull", "--rebase", "--autostash")
+        if rebase_error is not None:
+            _git(repo_root, "rebase", "--abort")
+            return f"git pull --rebase failed: {rebase_error}"
+    return error
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from .index import compile_file_template
+from .repo import RepoError
+from .timeutil import JST
+from .ulidutil import is_ulid, ulid_timestamp_ms
+
+DEFAULT_FILE_TEMPLATE = "{slug}--{id}.md"
+DEFAULT_TAG_PATTERN = r"^[a-z0-9]+(?:-[a-z0-9]+)*$"
+
+
+def scope_values(rules: dict[str, Any]) -> list[str]:
+    fm = rules.get("frontmatter", {})
+    if not isinstance(fm, dict):
+        raise RepoError("Invalid rules: frontmatter must be a mapping")
+    scope = fm.get("scope", {})
+    if not isinstance(scope, dict):
+        raise RepoError("Invalid rules: frontmatter.scope must be a mapping")
+    allowed = scope.get("allowed", ["cross", "os-specific"])
+    if not isinstance(allowed, list) or not all(isinstance(x, str) for x in allowed):
+        raise RepoError("Invalid rules: frontmatter.scope.allowed")
+    values = [x.strip().lower() for x in allowed if x.strip()]
+    if not values:
+        raise RepoError("Invalid rules: frontmatter.scope.allowed must not be empty")
+    return values
+
+
+def created_os_values(rules: dict[str, Any]) -> list[str]:
+    fm = rules.get("frontmatter", {})
+    if not isinstance(fm, dict):
+        raise RepoError("Invalid rules: frontmatter must be a mapping")
+    created_os = fm.get("created_os", {})
+    if not isinstance(created_os, dict):
+        raise RepoError("Invalid rules: frontmatter.created_os must be a mapping")
+    allowed = created_os.get("allowed", ["macos", "linux", "windows", "other"])
+    if not isinstance(allowed, list) or not all(isinstance(x, str) for x in allowed):
+        raise RepoError("Invalid rules: frontmatter.created_os.allowed")
+    values = [x.strip().lower() for x in allowed if x.strip()]
+    if not values:
+        raise RepoError(
+            "Invalid rules: frontmatter.created_os.allowed must not be empty"
+        )
+    return values
+
+
+def string_list(rules: dict[str, Any], key: str) -> list[str]:
+    v = rules.get(key, [])
+    if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
+        raise RepoError(f"Invalid rules field: {key}")
+    return list(v)
+
+
+def file_template(rules: dict[str, Any]) -> str:
+    template = (rules.get("naming", {}) or {}).get("file_template", DEFAULT_FILE_TEMPLATE)
+    if not isinstance(template, str):
+        return DEFAULT_FILE_TEMPLATE
+    return template
+
+
+def normalize_os_name(value: str) -> str:
+    raw = value.strip().lower()
+    if raw in ("macos", "darwin", "mac"):
+        return "macos"
+    if raw in ("linux",):
+        return "linux"
+    if raw in ("windows", "win32", "win"):
+        return "windows"
+    return "other"
+
+
+def parse_iso_dt(value: str) -> datetime | None:
+    try:
+        return datetime.fromisoformat(value)
+    except Exception:
+        return None
+
+
+SHARD_MODES = ("month", "prefix")
+
+
+@dataclass(frozen=True)
+class ShardRule:
+    """``placement.shard``: split a note directory into subdirectories once it
+    holds more than ``threshold`` notes."""
+
+    by: str
+    threshold: int
+    prefix_len: int = 3
+    batch_size: int = 500
+
+    def subdir(self, note_id: str) -> str:
+        if self.by == "prefix":
+            return note_id[: self.prefix_len].upper()
+        created = datetime.fromtimestamp(ulid_timestamp_ms(note_id) / 1000, tz=JST)
+        return f"{created.year:04d}/{created.month:02d}"
+
+
+def shard_rule(rules: dict[str, Any]) -> ShardRule | None:
+    placement = rules.get("placement", {}) or {}
+    shard = placement.get("shard") if isinstance(placement, dict) else None
+    if shard is None:
+        return None
+    if not isinstance(shard, dict):
+        raise RepoError("Invalid rules: placement.shard must be a mapping")
+    by = shard.get("by", "month")
+    if by not in SHARD_MODES:
+        raise RepoError(f"Invalid rules: placement.shard.by must be one of {list(SHARD_MODES)}")
+    ints: dict[str, int] = {}
+    for key, default in (("threshold", 2000), ("prefix_len", 3), ("batch_size", 500)):
+        value = shard.get(key, default)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise RepoError(f"Invalid rules: placement.shard.{key} must be a positive integer")
+        ints[key] = value
+    return ShardRule(by=by, **ints)
+
+
+ARCHIVE_FILTERS = ("kinds", "domains")
+
+
+@dataclass(frozen=True)
+class ArchiveRule:
+    """One ``archive.rules`` entry; every criterion it sets must hold."""
+
+    kinds: frozenset[str] = frozenset()
+    domains: frozenset[str] = frozenset()
+    older_than_months: int | None = None
+
+    def matches(self, meta: dict[str, Any], now: datetime) -> bool:
+        if self.kinds and str(meta.get("kind", "")) not in self.kinds:
+            return False
+        if self.domains and str(meta.get("domain", "")) not in self.domains:
+            return False
+        if self.older_than_months is not None:
+            updated = meta.get("updated")
+            dt = parse_iso_dt(updated.strip()) if isinstance(updated, str) else None
+            if dt is None or dt.tzinfo is None:
+                return False  # an unknown age never qualifies
+            return dt < months_before(now, self.older_than_months)
+        return True
+
+
+@dataclass(frozen=True)
+class ArchivePolicy:
+    """``archive``: notes that ``kb archive`` moves into packs under ``dir``."""
+
+    dir: str
+    rules: tuple[ArchiveRule, ...]
+
+    def matches(self, meta: dict[str, Any], now: datetime) -> bool:
+        return any(rule.matches(meta, now) for rule in self.rules)
+
+
+def months_before(dt: datetime, months: int) -> datetime:
+    """``dt`` moved back by calendar months (the day clamps to the month's end)."""
+    total = dt.year * 12 + dt.month - 1 - months
+    year, month = divmod(total, 12)
+    month += 1
+    days = (datetime(year + month // 12, month % 12 + 1, 1) - datetime(year, month, 1)).days
+    return dt.replace(year=year, month=month, day=min(dt.day, days))
+
+
+def archive_policy(rules: dict[str, Any]) -> ArchivePolicy | None:
+    archive = rules.get("archive")
+    if archive is None:
+        return None
+    if not isinstance(archive, dict):
+        raise RepoError("Invalid rules: archive must be a mapping")
+    directory = archive.get("dir", "archive")
+    if not isinstance(directory, str) or not directory.strip("/ "):
+        raise RepoError("Invalid rules: archive.dir must be a non-empty path")
+    directory = directory.strip("/ ")
+    for note_dir in string_list(rules, "note_dirs"):
+        if directory == note_dir or directory.startswith(f"{note_dir}/"):
+            raise RepoError(f"Invalid rules: archive.dir must be outside note_dirs ({note_dir})")
+
+    entries = archive.get("rules", [])
+    if not isinstance(entries, list) or not entries:
+        raise RepoError("Invalid rules: archive.rules must be a non-empty list")
+    parsed: list[ArchiveRule] = []
+    for n, entry in enumerate(entries):
+        where = f"archive.rules[{n}]"
+        if not isinstance(entry, dict):
+            raise RepoError(f"Invalid rules: {where} must be a mapping")
+        unknown = sorted(set(entry) - {*ARCHIVE_FILTERS, "older_than_months"})
+        if unknown:
+            raise RepoError(f"Invalid rules: {where}: unknown key(s): {unknown}")
+        filters: dict[str, frozenset[str]] = {}
+        for key in ARCHIVE_FILTERS:
+            value = entry.get(key, [])
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+                raise RepoError(f"Invalid rules: {where}.{key} must be a string list")
+            unknown = sorted(set(value) - set(string_list(rules, key)))
+            if unknown:
+                raise RepoError(f"Invalid rules: {where}.{key}: not in {key}: {unknown}")
+            filters[key] = frozenset(value)
+        months = entry.get("older_than_months")
+        if months is not None and (
+            not isinstance(months, int) or isinstance(months, bool) or months < 1
+        ):
+            raise RepoError(f"Invalid rules: {where}.older_than_months must be a positive integer")
+        if not any(filters.values()) and months is None:
+            raise RepoError(f"Invalid rules: {where} must set kinds, domains or older_than_months")
+        parsed.append(ArchiveRule(older_than_months=months, **filters))
+    return ArchivePolicy(dir=directory, rules=tuple(parsed))
+
+
+# A check takes the compiled rules, the file name and the frontmatter and
+# yields problem messages (without the path prefix).
+Check = Callable[["CompiledRules", str, dict[str, Any]], Iterable[str]]
+
+
+def _check_required(cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    for k in cr.required:
+        if k not in meta or meta[k] in (None, ""):
+            yield f"missing required field: {k}"
+
+
+def _check_id(_cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    note_id = str(meta.get("id", "")).upper()
+    if note_id and not is_ulid(note_id):
+        yield f"invalid id (expected ULID): {meta.get('id')}"
+
+
+def _check_filename(cr: CompiledRules, name: str, meta: dict[str, Any]) -> Iterable[str]:
+    note_id = str(meta.get("id", "")).upper()
+    if not note_id:
+        return
+    m = cr.filename_re.fullmatch(name)
+    if m is None or m.group("id") != note_id:
+        yield (
+            f"filename does not match template '{cr.file_template}' "
+            f"for id '{note_id}' (got: {name})"
+        )
+
+
+def _check_kind(cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    kind = str(meta.get("kind", ""))
+    if kind and kind not in cr.kinds:
+        yield f"invalid kind: {kind}"
+
+
+def _check_domain(cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    domain = str(meta.get("domain", ""))
+    if domain and domain not in cr.domains:
+        yield f"invalid domain: {domain}"
+
+
+def _check_scope(cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    scope = meta.get("scope")
+    if scope is None:
+        return
+    if not isinstance(scope, str) or not scope.strip():
+        yield "scope must be a non-empty string"
+    elif scope.strip().lower() not in cr.scopes:
+        yield f"invalid scope: {scope} (allowed: {sorted(cr.scopes)})"
+
+
+def _check_created_by(
+    _cr: CompiledRules, _name: str, meta: dict[str, Any]
+) -> Iterable[str]:
+    created_by = meta.get("created_by")
+    if created_by is not None:
+        if not isinstance(created_by, str) or not created_by.strip():
+            yield "created_by must be a non-empty string"
+
+
+def _check_created_os(
+    cr: CompiledRules, _name: str, meta: dict[str, Any]
+) -> Iterable[str]:
+    created_os = meta.get("created_os")
+    if created_os is None:
+        return
+    if not isinstance(created_os, str) or not created_os.strip():
+        yield "created_os must be a non-empty string"
+    elif normalize_os_name(created_os) not in cr.created_os:
+        yield (
+            f"invalid created_os: {created_os} "
+            f"(allowed: {sorted(cr.created_os)})"
+        )
+
+
+def _check_timestamps(
+    _cr: CompiledRules, _name: str, meta: dict[str, Any]
+) -> Iterable[str]:
+    parsed: dict[str, datetime | None] = {}
+    for ts_field in ("created", "updated"):
+        v = meta.get(ts_field)
+        if isinstance(v, str) and v.strip():
+            parsed[ts_field] = parse_iso_dt(v.strip())
+            if parsed[ts_field] is None:
+                yield f"invalid {ts_field}: {v}"
+    cdt = parsed.get("created")
+    udt = parsed.get("updated")
+    if cdt and udt and udt < cdt:
+        yield "updated is before created"
+
+
+def _check_tags(cr: CompiledRules, _name: str, meta: dict[str, Any]) -> Iterable[str]:
+    tags = meta.get("tags")
+    if tags is None:
+        return
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        yield "tags must be a string list"
+        return
+    for t in tags:
+        if not cr.tag_re.fullmatch(t):
+            yield f"invalid tag: {t}"
+
+
+def _check_related(
+    _cr: CompiledRules, _name: str, meta: dict[str, Any]
+) -> Iterable[str]:
+    related = meta.get("related")
+    if related is None:
+        return
+    if not isinstance(related, list) or not all(isinstance(x, str) for x in related):
+        yield "related must be a string list"
+        return
+    for rid in related:
+        if not is_ulid(rid):
+            yield f"invalid related ULID: {rid}"
+
+
+CHECKS: dict[str, Check] = {
+    "required": _check_required,
+    "id": _check_id,
+    "filename": _check_filename,
+    "kind": _check_kind,
+    "domain": _check_domain,
+    "scope": _check_scope,
+    "created_by": _check_created_by,
+    "created_os": _check_created_os,
+    "timestamps": _check_timestamps,
+    "tags": _check_tags,
+    "related": _check_related,
+}
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """kb.rules.yml resolved into sets, precompiled regexes and a check list."""
+
+    note_dirs: tuple[str, ...]
+    kinds: frozenset[str]
+    domains: frozenset[str]
+    scopes: frozenset[str]
+    created_os: frozenset[str]
+    required: tuple[str, ...]
+    file_template: str
+    filename_re: re.Pattern[str]
+    tag_re: re.Pattern[str]
+    checks: tuple[Check, ...]
+    shard: ShardRule | None
+    archive: ArchivePolicy | None
+
+    def validate(self, name: str, meta: dict[str, Any]) -> list[str]:
+        problems: list[str] = []
+        for check in self.checks:
+            problems.extend(check(self, name, meta))
+        return problems
+
+
+def _frontmatter_section(rules: dict[str, Any], key: str) -> dict[str, Any]:
+    fm = rules.get("frontmatter", {}) or {}
+    section = fm.get(key, {}) if isinstance(fm, dict) else {}
+    return section if isinstance(section, dict) else {}
+
+
+def _compile(rules: dict[str, Any]) -> CompiledRules:
+    required = (rules.get("frontmatter", {}) or {}).get("required", [])
+    if not isinstance(required, list):
+        raise RepoError("Invalid rules: frontmatter.required")
+
+    tag_pattern = _frontmatter_section(rules, "tags").get("allowed", DEFAULT_TAG_PATTERN)
+    try:
+        tag_re = re.compile(str(tag_pattern))
+    except re.error as e:
+        raise RepoError(f"Invalid rules: frontmatter.tags.allowed: {e}") from e
+
+    check_names = (rules.get("lint", {}) or {}).get("checks", list(CHECKS))
+    if not isinstance(check_names, list):
+        raise RepoError("Invalid rules: lint.checks must be a list")
+    unknown = [c for c in check_names if c not in CHECKS]
+    if unknown:
+        raise RepoError(f"Invalid rules: unknown lint check(s): {unknown}")
+    checks = [CHECKS[c] for c in check_names]
+    # Drop checks the rules file opts out of by declaring another field type.
+    if _frontmatter_section(rules, "id").get("type", "ulid") != "ulid":
+        checks = [c for c in checks if c is not _check_id]
+    if _frontmatter_section(rules, "related").get("type", "ulid_list") != "ulid_list":
+        checks = [c for c in checks if c is not _check_related]
+
+    template = file_template(rules)
+    return CompiledRules(
+        note_dirs=tuple(string_list(rules, "note_dirs")),
+        kinds=frozenset(string_list(rules, "kinds")),
+        domains=frozenset(string_list(rules, "domains")),
+        scopes=frozenset(scope_values(rules)),
+        created_os=frozenset(created_os_values(rules)),
+        required=tuple(str(x) for x in required),
+        file_template=template,
+        filename_re=compile_file_template(template, id_pattern=r".+?"),
+        tag_re=tag_re,
+        checks=tuple(checks),
+        shard=shard_rule(rules),
+        archive=archive_policy(rules),
+    )
+
+
+_compiled: dict[str, CompiledRules] = {}
+
+
+def compile_rules(rules: dict[str, Any]) -> CompiledRules:
+    """Compile ``rules`` once per distinct content and reuse the result."""
+    key = hashlib.sha256(
+        json.dumps(rules, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _compiled[key] = _compile(rules)
+    return compiled
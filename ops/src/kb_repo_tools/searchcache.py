@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable
+
+from .frontmatter import atomic_write_text
+from .gitutil import run_git, state_dir
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _status_paths(record: bytes) -> list[bytes]:
+    # git status --porcelain=v2 -z: ordinary (1), renamed (2), unmerged (u)
+    # and untracked (?) entries; the path is always the last field.
+    kind = record[:1]
+    fields = {b"1": 8, b"2": 9, b"u": 10, b"?": 1}.get(kind)
+    if fields is None:
+        return []
+    return [record.split(b" ", fields)[-1]]
+
+
+def worktree_state(repo_root: Path, note_dirs: Iterable[str]) -> tuple[str, str]:
+    """(HEAD commit, fingerprint of uncommitted changes) from one ``git status``.
+
+    The fingerprint covers staged blobs (status lists their OIDs) and the
+    size/mtime of every modified or untracked file, so any edit under
+    ``note_dirs`` changes it while clean notes are never read. Ignored files
+    are left out: neither rg nor the built-in engine searches them.
+    """
+    out = run_git(
+        repo_root,
+        "--no-optional-locks",
+        "status",
+        "--porcelain=v2",
+        "--branch",
+        "-z",
+        "--untracked-files=all",
+        "--",
+        *note_dirs,
+    )
+    head = ""
+    digest = hashlib.sha256()
+    orig_path_next = False
+    for record in out.split(b"\0"):
+        if orig_path_next:
+            orig_path_next = False  # a rename's source path; nothing to stat
+            digest.update(record + b"\0")
+            continue
+        if record.startswith(b"# branch.oid "):
+            head = record[len(b"# branch.oid ") :].decode()
+            continue
+        if not record or record.startswith(b"#"):
+            continue
+        orig_path_next = record.startswith(b"2 ")
+        digest.update(record + b"\0")
+        for rel in _status_paths(record):
+            try:
+                st = os.stat(repo_root / os.fsdecode(rel))
+                digest.update(b"%d:%d\0" % (st.st_size, st.st_mtime_ns))
+            except OSError:
+                digest.update(b"missing\0")
+    return head, digest.hexdigest()
+
+
+class SearchCache:
+    """Search output on disk, one file per key, evicted least recently used.
+
+    The key includes HEAD and the worktree fingerprint, so a changed note
+    simply stops matching old entries; they age out under the size bounds.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def for_repo(cls, repo_root: Path) -> SearchCache:
+        return cls(state_dir(repo_root) / "search-cache")
+
+    @staticmethod
+    def key(query: str, flags: Iterable[str], head: str, fingerprint: str) -> str:
+        material = [CACHE_VERSION, query, sorted(flags), head, fingerprint]
+        return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        path = self.directory / f"{key}.txt"
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)  # mark as recently used
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        if len(text.encode("utf-8")) > self.max_bytes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.directory / f"{key}.txt", text)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.txt"):
+            with contextlib.suppress(OSError):
+                st = path.stat()
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        entries.sort(reverse=True)  # most recently used first
+        total = 0
+        for n, (_mtime, size, path) in enumerate(entries):
+            total += size
+            if n >= self.max_entries or total > self.max_bytes:
+                with contextlib.suppress(OSError):
+                    path.unlink()
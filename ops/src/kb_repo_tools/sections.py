@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+
+@dataclass(frozen=True)
+class Section:
+    """A heading and the byte range it covers, up to the next heading of the
+    same or a higher level (or the end of the file)."""
+
+    level: int
+    title: str
+    line: int
+    start: int
+    end: int
+
+
+def sections_of(record: dict[str, Any]) -> list[Section]:
+    """Sections of a note from its parse-cache record (no file access)."""
+    headings = record.get("headings") or []
+    size = int((record.get("stats") or {}).get("bytes", 0))
+    out: list[Section] = []
+    for i, (level, title, line, start) in enumerate(headings):
+        end = size
+        for next_level, _title, _line, next_start in headings[i + 1 :]:
+            if next_level <= level:
+                end = next_start
+                break
+        out.append(Section(level=level, title=title, line=line, start=start, end=end))
+    return out
+
+
+def find_section(sections: list[Section], name: str) -> Section | None:
+    """Exact title match first, then the first case-insensitive substring match."""
+    wanted = name.strip().lstrip("#").strip()
+    for s in sections:
+        if s.title.strip() == wanted:
+            return s
+    folded = wanted.casefold()
+    for s in sections:
+        if folded in s.title.casefold():
+            return s
+    return None
+
+
+def section_at_line(sections: list[Section], line: int) -> Section | None:
+    """The innermost section containing ``line`` (1-based): the last heading
+    at or before it, since no other heading can sit in between."""
+    i = bisect_right([s.line for s in sections], line) - 1
+    return sections[i] if i >= 0 else None
+
+
+def read_section(path: Path, section: Section) -> str:
+    """Read only the section's bytes with a seek, not the whole file."""
+    with path.open("rb") as f:
+        f.seek(section.start)
+        data = f.read(section.end - section.start)
+    return data.decode("utf-8", errors="replace")
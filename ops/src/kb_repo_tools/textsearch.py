@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .gitutil import GitError, run_git
+
+# Anything here makes the query a regex; otherwise it is searched as raw bytes.
+_REGEX_CHARS = frozenset("\\^$.|?*+()[]{}")
+
+
+@dataclass(frozen=True)
+class Hit:
+    rel: str
+    line: int
+    text: str
+
+    def __str__(self) -> str:
+        return f"{self.rel}:{self.line}:{self.text}"
+
+
+def is_literal(query: str) -> bool:
+    return not any(ch in _REGEX_CHARS for ch in query)
+
+
+def _walk(repo_root: Path, dirs: Iterable[str]) -> Iterator[str]:
+    """Files rg would search under ``dirs``: hidden ones too, never ``.git``.
+
+    In a git worktree that means ``git ls-files`` (tracked plus untracked,
+    minus what .gitignore excludes); elsewhere nothing is ignored, as with rg.
+    """
+    dirs = list(dirs)
+    try:
+        out = run_git(
+            repo_root, "ls-files", "-z", "--cached", "--others", "--exclude-standard", "--", *dirs
+        )
+    except GitError:
+        yield from _walk_tree(repo_root, dirs)
+        return
+    for rel in sorted({r.decode("utf-8") for r in out.split(b"\0") if r}):
+        if (repo_root / rel).is_file():  # sparse or deleted entries have no file
+            yield rel
+
+
+def _walk_tree(repo_root: Path, dirs: Iterable[str]) -> Iterator[str]:
+    for d in dirs:
+        base = repo_root / d
+        if base.is_file():
+            yield d
+            continue
+        for top, subdirs, files in os.walk(base):
+            subdirs[:] = sorted(s for s in subdirs if s != ".git")
+            rel_top = Path(top).relative_to(repo_root).as_posix()
+            for name in sorted(files):
+                yield f"{rel_top}/{name}"
+
+
+def _line_hits(rel: str, data: bytes | mmap.mmap, offsets: Iterable[int]) -> list[Hit]:
+    """One hit per matching line; ``offsets`` must be ascending."""
+    hits: list[Hit] = []
+    line_no = 1
+    counted_to = 0
+    next_line = 0
+    for pos in offsets:
+        if pos < next_line:
+            continue  # another match on a line already reported
+        line_no += data[counted_to:pos].count(b"\n")  # mmap has no count()
+        start = data.rfind(b"\n", 0, pos) + 1
+        end = data.find(b"\n", pos)
+        if end < 0:
+            end = len(data)
+        text = data[start:end].rstrip(b"\r").decode("utf-8", errors="replace")
+        hits.append(Hit(rel=rel, line=line_no, text=text))
+        counted_to = pos
+        next_line = end + 1
+    return hits
+
+
+def _literal_offsets(data: bytes | mmap.mmap, needle: bytes) -> Iterator[int]:
+    # UTF-8 is self-synchronizing: a valid encoded needle can only match on
+    # character boundaries, so a byte search is safe for Japanese text.
+    pos = data.find(needle)
+    while pos >= 0:
+        yield pos
+        end = data.find(b"\n", pos)
+        if end < 0:
+            return
+        pos = data.find(needle, end + 1)
+
+
+def _regex_offsets(data: bytes, regex: re.Pattern[str]) -> Iterator[int]:
+    """Byte offset of every line of ``data`` that ``regex`` matches.
+
+    Like rg, the regex sees one line at a time (without its ``\\n``), so
+    ``\\s`` or ``[^x]`` never match across lines.
+    """
+    pos = 0
+    for line in data.split(b"\n"):
+        # Decoded per line so classes like [あ-ん] see whole characters.
+        if regex.search(line.decode("utf-8", errors="replace")):
+            yield pos
+        pos += len(line) + 1
+
+
+def _search_file(
+    repo_root: Path, rel: str, query: str, regex: re.Pattern[str] | None
+) -> list[Hit]:
+    try:
+        with open(repo_root / rel, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b"\0", 0, 8192) >= 0:
+                    return []  # binary file; rg skips these too
+                if regex is None:
+                    needle = query.encode("utf-8")
+                    return _line_hits(rel, data, _literal_offsets(data, needle))
+                encoded = data[:]
+    except OSError:
+        return []
+    return _line_hits(rel, encoded, _regex_offsets(encoded, regex))
+
+
+def compile_query(query: str) -> re.Pattern[str] | None:
+    """The regex ``query`` stands for, or None when it is searched literally."""
+    return None if is_literal(query) else re.compile(query)
+
+
+def search_data(rel: str, data: bytes, query: str, regex: re.Pattern[str] | None) -> list[Hit]:
+    """Hits in a file already in memory (e.g. a member of an archive pack)."""
+    if not data or data.find(b"\0", 0, 8192) >= 0:
+        return []
+    if regex is None:
+        return _line_hits(rel, data, _literal_offsets(data, query.encode("utf-8")))
+    return _line_hits(rel, data, _regex_offsets(data, regex))
+
+
+def search(
+    repo_root: Path,
+    dirs: Iterable[str],
+    query: str,
+    *,
+    workers: int | None = None,
+) -> list[Hit]:
+    """Search files under ``dirs`` for ``query`` (literal or Python regex).
+
+    A fallback for hosts without ripgrep: files are memory-mapped and scanned
+    in a thread pool. Hits come back in path order.
+    """
+    regex = compile_query(query)
+    rels = list(_walk(repo_root, dirs))
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        per_file = pool.map(lambda rel: _search_file(repo_root, rel, query, regex), rels)
+        return [hit for hits in per_file for hit in hits]
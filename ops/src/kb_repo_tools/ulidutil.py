@@ -6,6 +6,8 @@ from typing import Final
 import ulid
 
 _ULID_RE: Final[re.Pattern[str]] = re.compile(r"^[0-9A-HJKMNP-TV-Z]{26}$")
+_CROCKFORD: Final[str] = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_TIME_LEN: Final[int] = 10
 
 
 def new_ulid() -> str:
@@ -13,8 +15,32 @@ def new_ulid() -> str:
     return str(ulid.new()).upper()
 
 
+def new_ulids(count: int) -> list[str]:
+    # Monotonic provider: ids minted within the same millisecond still sort
+    # in creation order (randomness is incremented instead of redrawn).
+    return [str(ulid.monotonic.new()).upper() for _ in range(count)]
+
+
 def is_ulid(value: str) -> bool:
     if not isinstance(value, str):
         return False
     return bool(_ULID_RE.match(value.upper()))
 
+
+def ulid_timestamp_ms(value: str) -> int:
+    """Decode the millisecond timestamp held in the first 10 chars of a ULID."""
+    ms = 0
+    for ch in value[:_TIME_LEN].upper():
+        ms = ms * 32 + _CROCKFORD.index(ch)
+    return ms
+
+
+def ulid_time_prefix(ms: int) -> str:
+    """Encode ``ms`` as a 10-char ULID prefix; ids sort the same as their times."""
+    if ms < 0:
+        ms = 0
+    chars: list[str] = []
+    for _ in range(_TIME_LEN):
+        ms, rem = divmod(ms, 32)
+        chars.append(_CROCKFORD[rem])
+    return "".join(reversed(chars))
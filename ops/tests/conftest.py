@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import dump_frontmatter
+
+RULES_SRC = Path(__file__).resolve().parents[1] / "rules" / "kb.rules.yml"
+NOTE_ID = "01KH5AP6B38MDFJESSS7EW3WHA"
+
+
+@pytest.fixture
+def kb_root(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A throwaway kb tree with the shipped rules; git checks are stubbed out."""
+    (tmp_path / "ops" / "rules").mkdir(parents=True)
+    shutil.copy(RULES_SRC, tmp_path / "ops" / "rules" / "kb.rules.yml")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("KB_CREATED_BY", "test-host")
+    monkeypatch.setenv("KB_CREATED_OS", "linux")
+    monkeypatch.setattr(cli, "_require_git_worktree", lambda _root: None)
+    return tmp_path
+
+
+def write_file(root: Path, rel: str, text: str) -> Path:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def write_note(
+    root: Path, note_id: str, body: str = "body", *, rel_dir: str | None = None, **meta: Any
+) -> Path:
+    """Write a note with complete frontmatter; ``meta`` overrides or adds fields.
+
+    The file is ``<rel_dir>/<kind>--<id>.md``, ``rel_dir`` defaulting to
+    ``notes/<domain>``.
+    """
+    full = {
+        "id": note_id,
+        "kind": "note",
+        "domain": "dev",
+        "summary": "s",
+        "scope": "cross",
+        "created_by": "test-host",
+        "created_os": "linux",
+        "created": "2026-02-10T23:15+09:00",
+        "updated": "2026-02-10T23:15+09:00",
+        **meta,
+    }
+    if rel_dir is None:
+        rel_dir = f"notes/{full['domain']}"
+    rel = (Path(rel_dir) / f"{full['kind']}--{note_id}.md").as_posix()
+    return write_file(root, rel, dump_frontmatter(full, body))
+
+
+def git(root: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=root, check=True, capture_output=True, text=True
+    ).stdout
+
+
+@pytest.fixture
+def git_kb_root(kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """``kb_root`` initialised as a real git repository with one commit."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "kb-test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "kb-test@example.invalid")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "kb-test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "kb-test@example.invalid")
+    monkeypatch.delenv("KB_CACHE_DIR", raising=False)
+    git(kb_root, "init", "-q", "-b", "main")
+    git(kb_root, "add", "-A")
+    git(kb_root, "commit", "-q", "-m", "init")
+    return kb_root
+
+
+def _fake_move_paths(_root: Path, moves: list[tuple[Path, Path]], *_prune: object) -> None:
+    for src, dst in moves:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        src.rename(dst)
+
+
+@pytest.fixture
+def organize_root(kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """``kb_root`` with pull, commit/push and ``git mv`` replaced by no-op fakes."""
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    monkeypatch.setattr(cli, "_git_commit_and_push", lambda _root, _msg: True)
+    monkeypatch.setattr(cli, "_move_paths", _fake_move_paths)
+    return kb_root
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from kb_repo_tools import KnowledgeBase, Note
+from kb_repo_tools.notes import read_note
+from kb_repo_tools.timeutil import JST
+
+from conftest import write_note
+
+OLD = "01KH5AP6B38MDFJESSS7EW3WHA"  # 2026-02-11
+NEW = "01KJ0000008MDFJESSS7EW3WHA"  # 2026-02-21
+
+
+def test_knowledge_base_lookup_and_query(git_kb_root: Path) -> None:
+    old = write_note(git_kb_root, OLD, "## 対処\n\n再起動する\n", kind="troubleshoot", tags=["vpn"])
+    write_note(git_kb_root, NEW, "本文\n", kind="howto", tags=["docker"])
+
+    kb = KnowledgeBase.open(git_kb_root / "notes")
+    assert kb.root == git_kb_root
+    assert len(kb) == 2
+
+    note = kb.get(OLD.lower())
+    assert note is not None and note.path == old.resolve()
+    assert note.meta["kind"] == "troubleshoot" and note.id == OLD
+    assert note.body.startswith("## 対処")
+    assert kb.get("01KH5AP6B38MDFJESSS7EW3WHB") is None
+
+    assert [n.id for n in kb.created_between(before=datetime(2026, 2, 15, tzinfo=JST))] == [OLD]
+    assert [n.id for n in kb.query(kind="howto")] == [NEW]
+    assert [n.id for n in kb.query(domain="dev", tag="vpn")] == [OLD]
+    assert kb.query(tag="nope") == []
+    assert [str(h) for h in kb.search("再起動")] == [
+        f"notes/dev/troubleshoot--{OLD}.md:17:再起動する"
+    ]
+
+
+def test_new_note_is_visible_after_refresh(git_kb_root: Path) -> None:
+    kb = KnowledgeBase.open(git_kb_root)
+    assert kb.get(OLD) is None
+    write_note(git_kb_root, OLD, "x\n")
+    assert kb.get(OLD) is None  # index is cached
+    kb.refresh()
+    assert kb.get(OLD) is not None
+
+
+def test_note_loads_nothing_until_accessed(tmp_path: Path) -> None:
+    note = Note(tmp_path / "missing.md")  # no I/O on construction
+    assert repr(note) == f"Note({str(tmp_path / 'missing.md')!r})"
+    assert not hasattr(note, "__dict__")
+
+    path = write_note(tmp_path, OLD, "本文\n")
+    note = Note(path)
+    assert note.meta["id"] == OLD
+    assert note._body is None  # meta alone never reads the body
+    assert note.body == "本文"
+
+    assert read_note(path) == read_note(path) == note
+    assert len({note, Note(path), Note(tmp_path / "other.md")}) == 2
+
+
+def _retained(fn) -> tuple[int, object]:
+    tracemalloc.start()
+    try:
+        kept = fn()
+        return tracemalloc.get_traced_memory()[0], kept
+    finally:
+        tracemalloc.stop()
+
+
+def test_lazy_notes_retain_far_less_than_eager_ones(kb_root: Path) -> None:
+    count = 1000
+    for i in range(count):
+        note_id = f"01KH5AP6B38MDFJE{i:010d}"
+        write_note(kb_root, note_id, "本文の一行\n" * 40, tags=["a", "b"])
+    kb = KnowledgeBase.open(kb_root)
+    paths = list(kb._paths())
+
+    lazy, notes = _retained(lambda: list(kb))
+    eager, loaded = _retained(lambda: [read_note(p) for p in paths])
+    assert len(notes) == len(loaded) == count
+    assert lazy * 4 < eager
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import subprocess
+import zipfile
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import read_doc
+
+from conftest import write_note
+
+OLD = "01KH5AP6B38MDFJESSS7EW3WHA"
+FRESH = "01KJ0000008MDFJESSS7EW3WHA"
+LINKER = "01KK0000008MDFJESSS7EW3WHA"
+
+ARCHIVE_RULES = """
+archive:
+  dir: archive
+  rules:
+    - kinds: [inbox]
+      older_than_months: 3
+"""
+
+
+@pytest.fixture
+def archive_root(organize_root: Path) -> Path:
+    rules = organize_root / "ops" / "rules" / "kb.rules.yml"
+    rules.write_text(rules.read_text(encoding="utf-8") + ARCHIVE_RULES, encoding="utf-8")
+    inbox = {"kind": "inbox", "domain": "cross", "rel_dir": "notes/inbox"}
+    write_note(
+        organize_root,
+        OLD,
+        "# 対処\n\nVPN を再起動する\n\n# 背景\n\n古い話\n",
+        **inbox,
+        summary="古いメモ",
+        created="2025-01-05T10:00+09:00",
+        updated="2025-01-05T10:00+09:00",
+    )
+    write_note(
+        organize_root,
+        FRESH,
+        "VPN の設定\n",
+        **inbox,
+        summary="新しいメモ",
+        created="2025-01-05T10:00+09:00",
+        updated="2099-01-01T10:00+09:00",
+    )
+    write_note(
+        organize_root,
+        LINKER,
+        "本文\n",
+        summary="参照元",
+        created="2025-01-05T10:00+09:00",
+        updated="2025-01-05T10:00+09:00",
+        related=[OLD],
+    )
+    return organize_root
+
+
+def _invoke(*args: str) -> str:
+    result = CliRunner().invoke(cli.main, list(args))
+    assert result.exit_code == 0, result.output + result.stderr
+    return result.stdout
+
+
+def test_archive_moves_matching_notes_into_a_pack(archive_root: Path) -> None:
+    original = (archive_root / f"notes/inbox/inbox--{OLD}.md").read_bytes()
+    assert _invoke("archive", "--dry-run") == f"archive: notes/inbox/inbox--{OLD}.md\n"
+    assert (archive_root / f"notes/inbox/inbox--{OLD}.md").exists()
+
+    out = _invoke("archive")
+    assert out.startswith("archived 1 note(s) -> archive/pack-")
+    assert not (archive_root / f"notes/inbox/inbox--{OLD}.md").exists()
+    assert (archive_root / f"notes/inbox/inbox--{FRESH}.md").exists()
+
+    (pack,) = (archive_root / "archive").glob("pack-*.zip")
+    with zipfile.ZipFile(pack) as zf:
+        assert zf.namelist() == [f"notes/inbox/inbox--{OLD}.md"]
+        assert zf.getinfo(f"notes/inbox/inbox--{OLD}.md").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read(f"notes/inbox/inbox--{OLD}.md") == original
+    assert (archive_root / "archive" / f"{pack.stem}.idx.jsonl").exists()
+    assert _invoke("archive") == "No notes to archive\n"
+
+
+def test_archived_notes_stay_reachable(archive_root: Path) -> None:
+    original = (archive_root / f"notes/inbox/inbox--{OLD}.md").read_text(encoding="utf-8")
+    _invoke("archive")
+    (pack,) = (archive_root / "archive").glob("pack-*.zip")
+    label = f"archive/{pack.name}/notes/inbox/inbox--{OLD}.md"
+
+    assert _invoke("resolve", "01kh5") == f"{label}\n"
+    assert _invoke("show", OLD) == original
+    assert _invoke("show", OLD, "--section", "対処") == "# 対処\n\nVPN を再起動する\n"
+    assert f"{OLD}\t{label}" in _invoke("ids").splitlines()
+
+    hits = _invoke("search", "VPN").splitlines()
+    assert f"{label}:15:VPN を再起動する" in hits
+    assert f"notes/inbox/inbox--{FRESH}.md:13:VPN の設定" in hits
+
+    assert _invoke("lint") == "OK\n"
+    _invoke("organize")
+    body = read_doc(archive_root / f"notes/dev/note--{LINKER}.md").body
+    assert f"- [archived] 古いメモ ({OLD})" in body
+
+
+def test_archived_notes_are_piped_through_rg_when_installed(
+    archive_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    original = (archive_root / f"notes/inbox/inbox--{OLD}.md").read_bytes()
+    _invoke("archive")
+    (pack,) = (archive_root / "archive").glob("pack-*.zip")
+    label = f"archive/{pack.name}/notes/inbox/inbox--{OLD}.md"
+    query = r"\p{Han}を再起動"  # rg syntax that Python's re rejects
+    real_run = cli.subprocess.run
+    piped: list[list[str]] = []
+
+    def fake_run(cmd, **kwargs):
+        if cmd[0] != "rg":
+            return real_run(cmd, **kwargs)
+        if cmd[-1] != "-":  # the live notes
+            return subprocess.CompletedProcess(cmd, 1, stdout="")
+        piped.append(cmd)
+        # The member is read from the pack, never unpacked to disk.
+        assert kwargs["input"] == original
+        assert cmd[cmd.index("--label") + 1] == label
+        assert cmd[cmd.index("--regexp") + 1] == query
+        hit = f"{label}:15:VPN を再起動する\n"
+        return subprocess.CompletedProcess(cmd, 0, stdout=hit.encode())
+
+    monkeypatch.setattr(cli.subprocess, "run", fake_run)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: "/usr/bin/rg")
+    assert _invoke("search", query) == f"{label}:15:VPN を再起動する\n"
+    assert len(piped) == 1
+
+    # A literal means the same bytes to either engine, so no rg per member.
+    piped.clear()
+    assert _invoke("search", "再起動") == f"{label}:15:VPN を再起動する\n"
+    assert piped == []
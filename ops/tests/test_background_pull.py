@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import read_doc
+
+from conftest import git, write_note
+
+KEPT = "01KH5AP6B38MDFJESSS7EW3WHA"
+EDITED = "01KH5AP6B38MDFJESSS7EW3WHB"
+DELETED = "01KH5AP6B38MDFJESSS7EW3WHC"
+ADDED = "01KJ0000008MDFJESSS7EW3WHA"
+
+
+@pytest.fixture
+def clones(git_kb_root: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch) -> tuple:
+    """(work, other): two clones of one bare remote; commands run in ``work``."""
+    for note_id in (KEPT, EDITED, DELETED):
+        write_note(git_kb_root, note_id, "VPN を再起動する\n", related=[ADDED])
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "notes")
+    base = tmp_path_factory.mktemp("remote")
+    git(base, "clone", "-q", "--bare", str(git_kb_root), "kb.git")
+    git(base, "clone", "-q", "kb.git", "work")
+    git(base, "clone", "-q", "kb.git", "other")
+    monkeypatch.chdir(base / "work")
+    return base / "work", base / "other"
+
+
+def _push_changes(other: Path) -> None:
+    write_note(other, EDITED, "無関係な本文\n")
+    (other / f"notes/dev/note--{DELETED}.md").unlink()
+    write_note(other, ADDED, "本文\n\nVPN の設定\n", summary="追加されたノート")
+    git(other, "add", "-A")
+    git(other, "commit", "-q", "-m", "remote edits")
+    git(other, "push", "-q")
+
+
+def _invoke(*args: str) -> str:
+    result = CliRunner().invoke(cli.main, list(args))
+    assert result.exit_code == 0, result.output
+    return result.stdout
+
+
+def test_search_rescans_only_files_the_pull_changed(
+    clones: tuple[Path, Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    work, other = clones
+    before = _invoke("search", "VPN").splitlines()
+    assert len(before) == 3
+
+    scans: list[list[str]] = []
+    real_capture = cli._rg_capture
+
+    def recording_capture(root: Path, dirs: list[str], query: str) -> str:
+        scans.append(list(dirs))
+        return real_capture(root, dirs, query)
+
+    monkeypatch.setattr(cli, "_rg_capture", recording_capture)
+    _push_changes(other)
+    after = _invoke("search", "VPN").splitlines()
+    assert after == [
+        f"notes/dev/note--{KEPT}.md:15:VPN を再起動する",
+        f"notes/dev/note--{ADDED}.md:15:VPN の設定",
+    ]
+    assert (work / f"notes/dev/note--{ADDED}.md").exists()  # the pull did run
+    # Whatever overlapped the pull, the last scan covered just the changed files.
+    assert scans[-1] == [f"notes/dev/note--{EDITED}.md", f"notes/dev/note--{ADDED}.md"]
+
+    scans.clear()
+    assert _invoke("search", "VPN").splitlines() == after
+    assert scans == []  # cached under the pulled tree
+
+
+def test_organize_and_new_see_notes_the_pull_brought(clones: tuple[Path, Path]) -> None:
+    work, other = clones
+    _push_changes(other)
+
+    _invoke("organize")
+    body = read_doc(work / f"notes/dev/note--{KEPT}.md").body
+    assert f"- [[note--{ADDED}|追加されたノート]]" in body
+    assert "[missing]" not in body
+
+    created = _invoke("new", "--summary", "s", "--related", "01kj").strip().splitlines()[-1]
+    assert read_doc(work / created).meta["related"] == [ADDED]
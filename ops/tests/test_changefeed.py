@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import changefeed, cli
+from kb_repo_tools.changefeed import CursorError, decode_cursor, encode_cursor
+
+from conftest import git, write_note
+
+A = "01KH5AP6B38MDFJESSS7EW3WHA"
+B = "01KJ0000008MDFJESSS7EW3WHA"
+NOTE_BODY = "本文\n" * 20
+
+
+def _commit(root: Path, message: str) -> None:
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", message)
+
+
+def _log(*args: str) -> tuple[list[dict], str]:
+    result = CliRunner().invoke(cli.main, ["log", *args])
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.output.splitlines()]
+    assert set(lines[-1]) == {"cursor"}
+    return lines[:-1], lines[-1]["cursor"]
+
+
+@pytest.fixture
+def feed_root(git_kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root: None)
+    return git_kb_root
+
+
+def test_cursor_roundtrip() -> None:
+    commit = "0123456789abcdef0123456789abcdef01234567"
+    assert decode_cursor(encode_cursor(commit)) == commit
+    for bad in ("", "0123456789abcdef", "kb1.!!", "kb1.AAAA"):
+        with pytest.raises(CursorError):
+            decode_cursor(bad)
+
+
+def test_log_emits_note_events_and_resumes(feed_root: Path) -> None:
+    a_path = f"notes/dev/note--{A}.md"
+    write_note(feed_root, A, NOTE_BODY, summary="v1")
+    _commit(feed_root, "add a")
+    events, cursor = _log()
+    assert [(e["event"], e["id"], e["path"]) for e in events] == [("created", A, a_path)]
+    assert events[0]["meta"]["summary"] == "v1"
+
+    write_note(feed_root, A, NOTE_BODY, summary="v2")
+    write_note(feed_root, B, NOTE_BODY, summary="b")
+    (feed_root / "README.md").write_text("not a note\n", encoding="utf-8")
+    _commit(feed_root, "edit a, add b")
+    (feed_root / "notes" / "infra").mkdir()
+    git(feed_root, "mv", a_path, f"notes/infra/note--{A}.md")
+    _commit(feed_root, "move a")
+    git(feed_root, "rm", "-q", f"notes/dev/note--{B}.md")
+    _commit(feed_root, "delete b")
+
+    events, next_cursor = _log("--since", cursor)
+    assert [(e["event"], e["id"]) for e in events] == [
+        ("updated", A),
+        ("created", B),
+        ("moved", A),
+        ("deleted", B),
+    ]
+    assert events[0]["meta"]["summary"] == "v2"
+    assert events[2]["old_path"] == a_path
+    assert events[2]["path"] == f"notes/infra/note--{A}.md"
+    assert "meta" not in events[3]
+    assert events[-1]["cursor"] == next_cursor
+
+    events, again = _log("--since", next_cursor)
+    assert events == [] and again == next_cursor
+
+
+def test_resolved_commits_are_cached(feed_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    write_note(feed_root, A, NOTE_BODY, summary="v1")
+    _commit(feed_root, "add a")
+    first, _ = _log()
+
+    def no_diff_tree(*_args: object) -> str:
+        raise AssertionError("commit resolved twice")
+
+    monkeypatch.setattr(changefeed, "_diff_tree_stdin", no_diff_tree)
+    again, _ = _log()
+    assert again == first
+
+
+def test_log_rejects_unknown_cursor(feed_root: Path) -> None:
+    result = CliRunner().invoke(cli.main, ["log", "--since", encode_cursor("ab" * 20)])
+    assert result.exit_code != 0
+    assert "not in the history of HEAD" in result.output
+    result = CliRunner().invoke(cli.main, ["log", "--since", "bogus"])
+    assert "Invalid cursor" in result.output
+
+
+def test_log_keeps_pull_output_off_stdout(
+    git_kb_root: Path,
+    tmp_path_factory: pytest.TempPathFactory,
+    monkeypatch: pytest.MonkeyPatch,
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    base = tmp_path_factory.mktemp("remote")
+    git(base, "clone", "-q", "--bare", str(git_kb_root), "kb.git")
+    git(base, "clone", "-q", "kb.git", "work")
+    git(base, "clone", "-q", "kb.git", "other")
+    write_note(base / "other", A, NOTE_BODY, summary="remote")
+    _commit(base / "other", "add a")
+    git(base / "other", "push", "-q")
+    monkeypatch.chdir(base / "work")
+
+    result = CliRunner().invoke(cli.main, ["log"])
+    assert result.exit_code == 0, result.output
+    assert "Fast-forward" in result.stderr
+    events = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [e.get("id") for e in events] == [A, None]
+    assert "Fast-forward" not in capfd.readouterr().out  # nor written to fd 1 directly
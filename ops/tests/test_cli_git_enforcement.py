@@ -6,6 +6,12 @@ import click
 import pytest
 
 from kb_repo_tools import cli
+from kb_repo_tools.rules import (
+    compile_rules,
+    created_os_values,
+    normalize_os_name,
+    scope_values,
+)
 
 
 def test_require_git_worktree_passes(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -21,87 +27,62 @@ def test_require_git_worktree_raises_when_missing(
         cli._require_git_worktree(Path("/tmp/repo"))
 
 
-def test_move_path_uses_git_mv_for_tracked(
+def test_move_paths_batches_git_calls(
     tmp_path: Path, monkeypatch: pytest.MonkeyPatch
 ) -> None:
     repo_root = tmp_path
-    src = repo_root / "inbox" / "note.md"
-    src.parent.mkdir(parents=True, exist_ok=True)
-    src.write_text("x", encoding="utf-8")
-    dst = repo_root / "tools" / "note.md"
-
     calls: list[list[str]] = []
 
-    def fake_run(
-        cmd: list[str], cwd: Path, check: bool, stdout=None, stderr=None
-    ) -> None:
-        assert cwd == repo_root
-        assert check is True
-        calls.append(cmd)
-
-    monkeypatch.setattr(cli, "_is_tracked", lambda _root, _path: True)
-    monkeypatch.setattr(cli.subprocess, "run", fake_run)
-
-    cli._move_path(repo_root, src, dst)
-
-    assert calls == [["git", "mv", "inbox/note.md", "tools/note.md"]]
-
-
-def test_move_path_stages_untracked_then_git_mv(
-    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
-) -> None:
-    repo_root = tmp_path
-    src = repo_root / "inbox" / "note.md"
-    src.parent.mkdir(parents=True, exist_ok=True)
-    src.write_text("x", encoding="utf-8")
-    dst = repo_root / "tools" / "note.md"
-
-    calls: list[list[str]] = []
+    class _Result:
+        stdout = "notes/inbox/a.md\0"
 
-    def fake_run(
-        cmd: list[str], cwd: Path, check: bool, stdout=None, stderr=None
-    ) -> None:
+    def fake_run(cmd: list[str], cwd: Path, check: bool, **kwargs) -> _Result:
         assert cwd == repo_root
-        assert check is True
         calls.append(cmd)
+        return _Result()
 
-    monkeypatch.setattr(cli, "_is_tracked", lambda _root, _path: False)
     monkeypatch.setattr(cli.subprocess, "run", fake_run)
-
-    cli._move_path(repo_root, src, dst)
+    cli._move_paths(
+        repo_root,
+        [
+            (repo_root / "notes/inbox/a.md", repo_root / "notes/dev/a.md"),
+            (repo_root / "notes/inbox/b.md", repo_root / "notes/dev/b.md"),
+            (repo_root / "notes/inbox/c.md", repo_root / "notes/ai/c.md"),
+        ],
+    )
 
     assert calls == [
-        ["git", "add", "inbox/note.md"],
-        ["git", "mv", "inbox/note.md", "tools/note.md"],
+        [
+            "git",
+            "ls-files",
+            "-z",
+            "--",
+            "notes/inbox/a.md",
+            "notes/inbox/b.md",
+            "notes/inbox/c.md",
+        ],
+        ["git", "add", "--", "notes/inbox/b.md", "notes/inbox/c.md"],
+        ["git", "mv", "--", "notes/inbox/a.md", "notes/inbox/b.md", "notes/dev/"],
+        ["git", "mv", "--", "notes/inbox/c.md", "notes/ai/"],
     ]
 
 
-def test_filename_matches_template_slug_id() -> None:
+def test_filename_re_slug_id() -> None:
     note_id = "01KH5AP6B38MDFJESSS7EW3WHA"
-    assert (
-        cli._filename_matches_template(
-            f"skills-authoring-playbook--{note_id}.md",
-            note_id,
-            "{slug}--{id}.md",
-        )
-        is True
-    )
+    compiled = compile_rules({"naming": {"file_template": "{slug}--{id}.md"}})
+    m = compiled.filename_re.fullmatch(f"skills-authoring-playbook--{note_id}.md")
+    assert m is not None and m.group("id") == note_id
 
 
-def test_filename_matches_template_id_slug() -> None:
+def test_filename_re_id_slug() -> None:
     note_id = "01KH5AP6B38MDFJESSS7EW3WHA"
-    assert (
-        cli._filename_matches_template(
-            f"{note_id}--skills-authoring-playbook.md",
-            note_id,
-            "{id}--{slug}.md",
-        )
-        is True
-    )
+    compiled = compile_rules({"naming": {"file_template": "{id}--{slug}.md"}})
+    m = compiled.filename_re.fullmatch(f"{note_id}--skills-authoring-playbook.md")
+    assert m is not None and m.group("id") == note_id
 
 
 def test_rules_scope_values_default() -> None:
-    assert cli._rules_scope_values({}) == ["cross", "os-specific"]
+    assert scope_values({}) == ["cross", "os-specific"]
 
 
 def test_note_template_has_environment_section_for_troubleshoot_and_howto() -> None:
@@ -112,15 +93,15 @@ def test_note_template_has_environment_section_for_troubleshoot_and_howto() -> N
 
 
 def test_rules_created_os_values_default() -> None:
-    assert cli._rules_created_os_values({}) == ["macos", "linux", "windows", "other"]
+    assert created_os_values({}) == ["macos", "linux", "windows", "other"]
 
 
 def test_normalize_os_name_aliases() -> None:
-    assert cli._normalize_os_name("Darwin") == "macos"
-    assert cli._normalize_os_name("mac") == "macos"
-    assert cli._normalize_os_name("Linux") == "linux"
-    assert cli._normalize_os_name("WIN32") == "windows"
-    assert cli._normalize_os_name("Solaris") == "other"
+    assert normalize_os_name("Darwin") == "macos"
+    assert normalize_os_name("mac") == "macos"
+    assert normalize_os_name("Linux") == "linux"
+    assert normalize_os_name("WIN32") == "windows"
+    assert normalize_os_name("Solaris") == "other"
 
 
 def test_detect_created_os_prefers_env(monkeypatch: pytest.MonkeyPatch) -> None:
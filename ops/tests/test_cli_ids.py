@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import read_doc
+
+from conftest import write_note
+
+A = "01KH5AP6B38MDFJESSS7EW3WHA"
+B = "01KH5AP6B38MDFJESSS7EW3WHB"
+C = "01KJ0000008MDFJESSS7EW3WHA"
+
+
+@pytest.fixture
+def ids_root(git_kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    for note_id in (A, B, C):
+        write_note(git_kb_root, note_id)
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    monkeypatch.setattr(cli, "_git_commit_and_push", lambda _root, _msg: True)
+    return git_kb_root
+
+
+def test_resolve_accepts_unique_prefix(ids_root: Path) -> None:
+    result = CliRunner().invoke(cli.main, ["resolve", "01kj"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == f"notes/dev/note--{C}.md"
+
+    result = CliRunner().invoke(cli.main, ["resolve", "01KH5AP"])
+    assert result.exit_code != 0
+    assert "Ambiguous id prefix: 01KH5AP (2 notes)" in result.output
+    assert f"{A} notes/dev/note--{A}.md" in result.output
+    assert f"{B} notes/dev/note--{B}.md" in result.output
+
+    result = CliRunner().invoke(cli.main, ["resolve", "01KZ"])
+    assert "Note not found: 01KZ" in result.output
+    result = CliRunner().invoke(cli.main, ["resolve", "01-KJ"])
+    assert "Invalid ULID" in result.output
+
+
+def test_new_expands_related_prefixes(ids_root: Path) -> None:
+    result = CliRunner().invoke(cli.main, ["new", "--summary", "s", "--related", "01kj"])
+    assert result.exit_code == 0, result.output
+    created = ids_root / result.output.strip().splitlines()[-1]
+    assert read_doc(created).meta["related"] == [C]
+
+    result = CliRunner().invoke(cli.main, ["new", "--summary", "s", "--related", "01KH5A"])
+    assert result.exit_code != 0
+    assert "Ambiguous id prefix" in result.output
+
+
+def test_ids_abbrev_prints_shortest_unique_prefixes(ids_root: Path) -> None:
+    result = CliRunner().invoke(cli.main, ["ids", "--abbrev"])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        f"{A}\tnotes/dev/note--{A}.md",
+        f"{B}\tnotes/dev/note--{B}.md",
+        f"01KJ\tnotes/dev/note--{C}.md",
+    ]
+    full = CliRunner().invoke(cli.main, ["ids"]).output.splitlines()
+    assert [line.split("\t")[0] for line in full] == [A, B, C]
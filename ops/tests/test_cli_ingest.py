@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import read_doc
+
+from conftest import write_note
+
+
+def test_ingest_fills_metadata_and_skips_duplicates(
+    kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    commits: list[str] = []
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    monkeypatch.setattr(
+        cli, "_git_commit_and_push", lambda _root, msg: commits.append(msg) or True
+    )
+
+    existing_id = "01KH5AP6B38MDFJESSS7EW3WHA"
+    write_note(kb_root, existing_id, "既存の本文\n", summary="既存")
+
+    drafts = kb_root / "notes" / "drafts"
+    drafts.mkdir(parents=True)
+    (drafts / "plain.md").write_text("# 調査メモ\n\n本文だけの下書き\n", encoding="utf-8")
+    (drafts / "partial.md").write_text(
+        "---\nkind: howto\ndomain: infra\nsummary: 手順の要約\n---\n\n手順\n",
+        encoding="utf-8",
+    )
+    (drafts / "dup.md").write_text("既存の本文\n", encoding="utf-8")
+
+    result = CliRunner().invoke(cli.main, ["ingest"])
+    assert result.exit_code == 0, result.output
+    manifest = json.loads(result.output)
+
+    assert commits == ["下書きを取り込み: 2件"]
+    assert manifest["duplicates"] == [
+        {
+            "draft": "notes/drafts/dup.md",
+            "duplicate_of": f"notes/dev/note--{existing_id}.md",
+        }
+    ]
+    by_draft = {item["draft"]: item for item in manifest["ingested"]}
+
+    plain = by_draft["notes/drafts/plain.md"]
+    assert plain["pending"] == ["kind", "domain", "summary"]
+    assert plain["path"].startswith("notes/inbox/inbox--")
+    assert plain["summary"] == "調査メモ"
+
+    partial = by_draft["notes/drafts/partial.md"]
+    assert partial["pending"] == []
+    assert partial["path"].startswith("notes/infra/howto--")
+    meta = read_doc(kb_root / partial["path"]).meta
+    assert meta["id"] == partial["id"]
+    assert meta["created_by"] == "test-host"
+    assert meta["created_os"] == "linux"
+    assert meta["scope"] == "cross"
+
+    assert not (drafts / "plain.md").exists()
+    assert not (drafts / "partial.md").exists()
+    assert (drafts / "dup.md").exists()
+
+
+def test_ingest_rejects_taken_ids_and_normalizes_created_os(
+    kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    monkeypatch.setattr(cli, "_git_commit_and_push", lambda _root, _msg: True)
+
+    result = CliRunner().invoke(cli.main, ["ingest"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output) == {"ingested": [], "duplicates": [], "errors": []}
+    assert result.output.startswith("{\n  ")  # same layout as a non-empty report
+
+    taken = "01KH5AP6B38MDFJESSS7EW3WHA"
+    write_note(kb_root, taken, "別の本文\n")
+    drafts = kb_root / "notes" / "drafts"
+    drafts.mkdir(parents=True)
+    # Valid kind/domain would place it under notes/infra, away from the owner.
+    (drafts / "clash.md").write_text(
+        f"---\nid: {taken}\nkind: howto\ndomain: infra\nsummary: s\n---\n\n本文\n",
+        encoding="utf-8",
+    )
+    (drafts / "mac.md").write_text(
+        "---\nsummary: s\ncreated_os: Darwin\n---\n\nmac の本文\n", encoding="utf-8"
+    )
+
+    result = CliRunner().invoke(cli.main, ["ingest"])
+    assert result.exit_code == 1
+    manifest = json.loads(result.stdout)
+    assert manifest["errors"] == [
+        {
+            "draft": "notes/drafts/clash.md",
+            "error": f"id already in use: notes/dev/note--{taken}.md",
+        }
+    ]
+    assert not (kb_root / "notes" / "infra" / f"howto--{taken}.md").exists()
+    (mac,) = manifest["ingested"]
+    assert read_doc(kb_root / mac["path"]).meta["created_os"] == "macos"
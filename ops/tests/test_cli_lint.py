@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.metrics import RunMetrics
+
+from conftest import git, write_note
+
+A = "01KH5AP6B38MDFJESSS7EW3WHA"
+B = "01KH5AP6B38MDFJESSS7EW3WHB"
+C = "01KH5AP6B38MDFJESSS7EW3WHC"
+MISSING = "01KH5AP6B38MDFJESSS7EW3WHZ"
+
+
+def test_lint_ok(kb_root: Path) -> None:
+    write_note(kb_root, A, related=[B])
+    write_note(kb_root, B, related=[A])
+    result = CliRunner().invoke(cli.main, ["lint", "--reciprocal"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == "OK"
+
+
+def test_lint_reports_repository_wide_problems(kb_root: Path) -> None:
+    write_note(kb_root, A, related=[B, A, MISSING])
+    write_note(kb_root, B)
+    write_note(kb_root, B, rel_dir="notes/infra")
+    write_note(kb_root, C, related=[A])
+
+    result = CliRunner().invoke(cli.main, ["lint"])
+    assert result.exit_code != 0
+    out = result.output
+    assert f"duplicate id: {B} (notes/dev/note--{B}.md, notes/infra/note--{B}.md)" in out
+    assert f"notes/dev/note--{A}.md: related points to itself: {A}" in out
+    assert f"notes/dev/note--{A}.md: related target not found: {MISSING}" in out
+    assert "not reciprocated" not in out
+
+    result = CliRunner().invoke(cli.main, ["lint", "--reciprocal"])
+    out = result.output
+    assert f"notes/dev/note--{A}.md: related link to {B} is not reciprocated" in out
+    assert f"notes/dev/note--{C}.md: related link to {A} is not reciprocated" in out
+
+
+def test_lint_staged_checks_index_contents(git_kb_root: Path) -> None:
+    root = git_kb_root
+    write_note(root, A)
+    write_note(root, B, related=[A])
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "notes")
+
+    # Staged: a copy of A under a new path, a bad link and an invalid kind.
+    write_note(root, A, rel_dir="notes/infra")
+    write_note(root, C, related=[MISSING])
+    bad = root / "notes" / "dev" / f"note--{C}.md"
+    bad.write_text(bad.read_text(encoding="utf-8").replace("kind: note", "kind: bogus"))
+    git(root, "add", "-A")
+    # Fixed in the worktree only: the staged version is still what gets committed.
+    write_note(root, C)
+    # Unstaged problems are not this commit's business.
+    write_note(root, B, rel_dir="notes/ai")
+
+    with RunMetrics("lint").track_git() as metrics:
+        result = CliRunner().invoke(cli.main, ["lint", "--staged"])
+    assert result.exit_code != 0
+    out = result.output
+    assert f"duplicate id: {A} (notes/dev/note--{A}.md, notes/infra/note--{A}.md)" in out
+    assert f"notes/dev/note--{C}.md: related target not found: {MISSING}" in out
+    assert f"notes/dev/note--{C}.md: invalid kind: bogus" in out
+    assert "notes/ai" not in out
+    assert metrics.git_subprocesses <= 8  # independent of the number of notes
+
+
+def test_lint_staged_follows_moves_and_deletes(git_kb_root: Path) -> None:
+    root = git_kb_root
+    write_note(root, A)
+    write_note(root, B)
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "notes")
+
+    (root / "notes" / "infra").mkdir()
+    git(root, "mv", f"notes/dev/note--{A}.md", f"notes/infra/note--{A}.md")
+    result = CliRunner().invoke(cli.main, ["lint", "--staged"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == "OK"
+    git(root, "commit", "-q", "-m", "move")
+
+    git(root, "rm", "-q", f"notes/dev/note--{B}.md")
+    write_note(root, C, related=[A, B])
+    git(root, "add", "-A")
+    result = CliRunner().invoke(cli.main, ["lint", "--staged"])
+    assert result.exit_code != 0
+    assert f"related target not found: {B}" in result.output
+    assert f"related target not found: {A}" not in result.output
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.frontmatter import read_doc
+
+
+def test_new_batch_writes_all_notes_with_single_pull_and_commit(
+    kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pulls: list[Path] = []
+    commits: list[str] = []
+    monkeypatch.setattr(
+        cli, "_git_pull_ff_only", lambda root, **_kw: pulls.append(root)
+    )
+    monkeypatch.setattr(
+        cli, "_git_commit_and_push", lambda _root, msg: commits.append(msg) or True
+    )
+
+    specs = [
+        {"kind": "howto", "domain": "dev", "summary": "手順A", "tags": ["Git"]},
+        {"domain": "infra", "summary": "メモB", "slug": "memo-b"},
+        {"kind": "inbox", "summary": "未整理C"},
+    ]
+    stdin = "\n".join(json.dumps(s, ensure_ascii=False) for s in specs) + "\n"
+    result = CliRunner().invoke(cli.main, ["new", "--batch"], input=stdin)
+    assert result.exit_code == 0, result.output
+
+    paths = result.output.splitlines()
+    assert len(paths) == 3
+    assert paths[0].startswith("notes/dev/howto--")
+    assert paths[1].startswith("notes/infra/memo-b--")
+    assert paths[2].startswith("notes/inbox/inbox--")
+    assert len(pulls) == 1
+    assert commits == ["ナレッジを一括追加: 3件"]
+
+    metas = [read_doc(kb_root / p).meta for p in paths]
+    ids = [m["id"] for m in metas]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 3
+    assert metas[0]["tags"] == ["git"]
+    assert metas[1]["created_by"] == "test-host"
+
+
+def test_new_batch_rejects_whole_batch_on_invalid_line(
+    kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def fail(*_args, **_kwargs):
+        raise AssertionError("git must not run for an invalid batch")
+
+    monkeypatch.setattr(cli, "_git_pull_ff_only", fail)
+    monkeypatch.setattr(cli, "_git_commit_and_push", fail)
+
+    stdin = "\n".join(
+        [
+            json.dumps({"domain": "dev", "summary": "ok"}),
+            json.dumps({"domain": "nowhere", "summary": "bad domain"}),
+            "{not json",
+        ]
+    )
+    result = CliRunner().invoke(cli.main, ["new", "--batch"], input=stdin)
+    assert result.exit_code != 0
+    assert "line 2: Invalid domain: nowhere" in result.output
+    assert "line 3: invalid JSON" in result.output
+    assert not (kb_root / "notes").exists()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+
+from conftest import NOTE_ID, write_file
+
+
+def test_organize_patches_only_missing_fields(organize_root: Path) -> None:
+    path = write_file(
+        organize_root,
+        f"notes/dev/note--{NOTE_ID}.md",
+        f"""---
+id: {NOTE_ID}
+kind: note
+domain: dev
+summary: "引用された: 要約"
+created_by: host-a
+created_os: linux
+created: 2026-02-10T23:15+09:00
+updated: 2026-02-10T23:15+09:00
+---
+
+本文
+""",
+    )
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    text = path.read_text(encoding="utf-8")
+    assert 'summary: "引用された: 要約"' in text
+    assert "\nscope: cross\ncreated_by: host-a\n" in text
+    assert "updated: 2026-02-10T23:15+09:00" not in text
+
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == "No changes"
+    assert path.read_text(encoding="utf-8") == text
+
+
+def _organize_peak(root: Path, note_count: int, body: str) -> int:
+    ids = [f"01KH5AP6B38MDFJESSS7EW{n:04d}" for n in range(note_count)]
+    for i, note_id in enumerate(ids):
+        write_file(
+            root,
+            f"notes/dev/note--{note_id}.md",
+            f"---\nid: {note_id}\nkind: note\ndomain: dev\nsummary: s{i}\n"
+            f"related:\n- {ids[i - 1]}\n---\n\n{body}",
+        )
+
+    tracemalloc.start()
+    try:
+        repo = cli.open_repo(root)
+        plan = cli._plan_organize(
+            root,
+            repo.rules,
+            cli.compile_rules(repo.rules),
+            ts="2026-03-01T10:00+09:00",
+            default_created_by="host",
+            default_created_os="linux",
+        )
+        updated = cli._apply_organize(root, plan, workers=1)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert plan.moves == []
+    assert len(updated) == note_count
+    return peak
+
+
+def test_organize_peak_memory_is_bounded_by_largest_note(
+    organize_root: Path, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    body = ("本文" * 49 + "\n") * 1000  # ~300 KB of UTF-8 per note
+    largest = len(body.encode("utf-8"))
+
+    small_root = tmp_path_factory.mktemp("small")
+    (small_root / "ops").symlink_to(organize_root / "ops")
+    peak_small = _organize_peak(small_root, 5, body)
+    peak_large = _organize_peak(organize_root, 40, body)
+
+    # Peak depends on the largest note, not on how many notes there are.
+    assert peak_large < peak_small * 1.2
+    # Holding all 40 notes at once would take more than 40x the largest one.
+    assert peak_large < 10 * largest
+
+
+def test_organize_dry_run_prints_plan_without_writing(organize_root: Path) -> None:
+    text = (
+        f"---\nid: {NOTE_ID}\nkind: note\ndomain: infra\nsummary: s\n"
+        "created: 2026-02-10T23:15+09:00\nupdated: 2026-02-10T23:15+09:00\n---\n\nbody\n"
+    )
+    path = write_file(organize_root, f"notes/dev/note--{NOTE_ID}.md", text)
+
+    result = CliRunner().invoke(cli.main, ["organize", "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        f"patch: notes/dev/note--{NOTE_ID}.md "
+        "(created_by, created_os, scope, updated)",
+        f"move: notes/dev/note--{NOTE_ID}.md -> notes/infra/note--{NOTE_ID}.md",
+    ]
+    assert path.read_text(encoding="utf-8") == text
+
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    assert not path.exists()
+    moved = organize_root / "notes" / "infra" / f"note--{NOTE_ID}.md"
+    assert "created_os: linux" in moved.read_text(encoding="utf-8")
+    assert list(path.parent.glob(".*.tmp")) == []
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import re
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.context import pack_context
+from kb_repo_tools.parsecache import load_note_records
+
+from conftest import write_note
+
+A = "01KH5AP6B38MDFJESSS7EW3WHA"
+B = "01KH5AP6B38MDFJESSS7EW3WHB"
+C = "01KH5AP6B38MDFJESSS7EW3WHC"
+
+BODY = (
+    "## 症状\n\nvpn が切れる\n\n## 対処\n\nvpn を再接続する\n\n## 参考\n\n"
+    + "長い説明。" * 200
+)
+
+
+def _hits(root: Path, rel: str, pattern: str) -> list[int]:
+    lines = (root / rel).read_text(encoding="utf-8").splitlines()
+    return [i for i, line in enumerate(lines, start=1) if re.search(pattern, line)]
+
+
+def test_pack_context_tiers_and_budget(kb_root: Path) -> None:
+    paths = [
+        write_note(kb_root, A, BODY, kind="troubleshoot", summary="VPN 切断の対処", related=[C]),
+        write_note(kb_root, B, "## 対処\n\nvpn\n", kind="troubleshoot", summary="別件"),
+        write_note(kb_root, C, "本文", kind="troubleshoot", summary="ネットワーク全般"),
+    ]
+    a, b, c = (p.relative_to(kb_root).as_posix() for p in paths)
+    records = load_note_records(kb_root, ["notes"])
+    pattern = re.compile("(?i)vpn")
+    hits = {a: _hits(kb_root, a, "(?i)vpn"), b: _hits(kb_root, b, "(?i)vpn")}
+
+    chunks = pack_context(kb_root, records, pattern, hits, budget=200)
+    kinds = [(ch.kind, ch.rel, ch.title) for ch in chunks]
+    # Summary hit ranks A above B; the oversized 参考 section is never a match.
+    assert kinds == [
+        ("summary", a, ""),
+        ("summary", b, ""),
+        ("section", a, "症状"),
+        ("section", a, "対処"),
+        ("section", b, "対処"),
+        ("related", c, ""),
+    ]
+    assert sum(ch.tokens for ch in chunks) <= 200
+    section = chunks[3]
+    lines = (kb_root / a).read_text(encoding="utf-8").splitlines()
+    assert lines[section.line - 1] == "## 対処"
+    assert lines[section.end_line - 1] == "vpn を再接続する"
+
+    small = pack_context(kb_root, records, pattern, hits, budget=60)
+    assert [ch.kind for ch in small][:2] == ["summary", "summary"]
+    assert len(small) < len(chunks)
+    assert sum(ch.tokens for ch in small) <= 60
+
+
+def test_context_command_renders_bundle(kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = write_note(kb_root, A, BODY, kind="troubleshoot", summary="VPN 切断の対処")
+    a = path.relative_to(kb_root).as_posix()
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root: None)
+    hit_lines = _hits(kb_root, a, "vpn")
+
+    def fake_run(cmd, **kwargs):
+        if cmd[0] == "git":
+            raise FileNotFoundError("git")
+        out = "".join(f"{a}:{n}:vpn\n" for n in hit_lines)
+        return subprocess.CompletedProcess(cmd, 0, stdout=out)
+
+    monkeypatch.setattr(cli.subprocess, "run", fake_run)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: "/usr/bin/rg")
+    result = CliRunner().invoke(cli.main, ["context", "vpn", "--budget", "100"])
+    assert result.exit_code == 0, result.output
+    out = result.output
+    assert out.startswith("# kb context: vpn (~")
+    assert f"- {a}:1 [{A}] VPN 切断の対処" in out
+    assert f"### {a}:{hit_lines[0] - 2}-{hit_lines[0]} 症状" in out
+    assert "長い説明" not in out
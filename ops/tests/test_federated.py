@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+
+from conftest import RULES_SRC, write_note
+
+OLD = "01KH5AP6B38MDFJESSS7EW3WHA"  # 2026-02-11
+NEW = "01KJ0000008MDFJESSS7EW3WHA"  # later
+
+
+def _make_root(root: Path) -> Path:
+    (root / "ops" / "rules").mkdir(parents=True, exist_ok=True)
+    shutil.copy(RULES_SRC, root / "ops" / "rules" / "kb.rules.yml")
+    return root
+
+
+@pytest.fixture
+def team_root(kb_root: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch) -> Path:
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: None)
+    return _make_root(tmp_path_factory.mktemp("shared") / "team-kb")
+
+
+def test_search_merges_repos_concurrently(
+    kb_root: Path, team_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_note(kb_root, OLD, "vpn\n")
+    write_note(team_root, NEW, "vpn\nvpn again\n")
+
+    original = cli._rg_capture
+
+    def slow_capture(repo_root: Path, note_dirs: list[str], query: str) -> str:
+        time.sleep(0.3)
+        return original(repo_root, note_dirs, query)
+
+    monkeypatch.setattr(cli, "_rg_capture", slow_capture)
+    start = time.perf_counter()
+    result = CliRunner().invoke(cli.main, ["search", "vpn", "--root", str(team_root / "notes")])
+    elapsed = time.perf_counter() - start
+    assert result.exit_code == 0, result.output
+    assert elapsed < 0.55  # close to one repo's latency, not the sum
+
+    own = kb_root.name
+    assert result.output.splitlines() == [
+        f"team-kb\tnotes/dev/note--{NEW}.md:13:vpn",
+        f"team-kb\tnotes/dev/note--{NEW}.md:14:vpn again",
+        f"{own}\tnotes/dev/note--{OLD}.md:13:vpn",
+    ]
+
+    result = CliRunner().invoke(cli.main, ["search", "vpn", "--root", str(team_root), "--history"])
+    assert "cannot be combined" in result.output
+
+
+def test_query_merges_newest_first(
+    kb_root: Path, team_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_note(kb_root, NEW, "a")
+    write_note(team_root, OLD, "b")
+    monkeypatch.setenv("KB_EXTRA_ROOTS", str(team_root))
+    result = CliRunner().invoke(cli.main, ["query", "--created-after", "2026-01-01"])
+    assert result.exit_code == 0, result.output
+    lines = [line.split("\t")[:2] for line in result.output.splitlines()]
+    assert lines == [
+        [kb_root.name, f"notes/dev/note--{NEW}.md"],
+        ["team-kb", f"notes/dev/note--{OLD}.md"],
+    ]
+
+    result = CliRunner().invoke(cli.main, ["query", "--root", "/nonexistent/kb"])
+    assert result.exit_code != 0
+    assert "Could not find repo root" in result.output
+
+
+def test_pull_output_goes_to_stderr_tagged_with_the_repo(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    def fake_git(cmd: list[str], **_kw: object) -> subprocess.CompletedProcess[str]:
+        return subprocess.CompletedProcess(cmd, 0, stdout="Updating 1..2\nFast-forward\n")
+
+    monkeypatch.setattr(cli, "_has_upstream", lambda _root: True)
+    monkeypatch.setattr(cli, "_run_git_cmd", fake_git)
+    cli._git_pull_ff_only(Path("/tmp/team-kb"), label="team-kb")
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert err == "team-kb: Updating 1..2\nteam-kb: Fast-forward\n"
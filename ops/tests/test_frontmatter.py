@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from kb_repo_tools.frontmatter import dump_frontmatter, split_frontmatter
+from kb_repo_tools.frontmatter import (
+    dump_frontmatter,
+    patch_frontmatter,
+    split_frontmatter,
+)
 
 
 def test_split_and_dump_roundtrip_minimal():
@@ -24,3 +28,39 @@ hello
     assert doc2.meta["id"] == doc.meta["id"]
     assert "hello" in doc2.body
 
+
+def test_patch_frontmatter_touches_only_changed_fields():
+    text = """---
+id: 01J0Z3N3Y7F4K2M9Q3T5A6B7C8
+kind: note
+domain: dev
+summary: 'quoted: summary'
+tags: [b, a]
+created: 2026-02-10T23:15+09:00
+updated: 2026-02-10T23:15+09:00
+---
+
+hello
+"""
+    out = patch_frontmatter(
+        text, {"scope": "cross", "updated": "2026-03-01T10:00+09:00"}
+    )
+    lines = out.splitlines()
+    assert lines[4] == "scope: cross"
+    assert "summary: 'quoted: summary'" in lines
+    assert "tags: [b, a]" in lines
+    assert "updated: 2026-03-01T10:00+09:00" in lines
+    assert out.endswith("---\n\nhello\n")
+    assert split_frontmatter(out).meta["scope"] == "cross"
+
+
+def test_patch_frontmatter_is_noop_when_values_match():
+    text = "---\nid: X\ntags:\n  - a\n  - b\n---\n\nbody\n\n\n"
+    assert patch_frontmatter(text, {"tags": ["a", "b"], "id": "X"}, "body") == text
+
+
+def test_patch_frontmatter_replaces_block_values_and_body():
+    text = "---\nid: X\ntags:\n- a\nrelated: []\n---\n\nold body\n"
+    out = patch_frontmatter(text, {"tags": ["c"], "related": None}, "new body\n")
+    assert out == "---\nid: X\ntags:\n- c\n---\n\nnew body\n"
+
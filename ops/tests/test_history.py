@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.gitutil import CatFileBatch
+from kb_repo_tools.history import HistoryIndex
+
+from conftest import git
+
+NOTE_ID = "01KH5AP6B38MDFJESSS7EW3WHA"
+
+
+def _commit_note(root: Path, rel: str, body: str, message: str) -> None:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        f"---\nid: {NOTE_ID}\nkind: note\ndomain: dev\nsummary: s\n---\n\n{body}\n",
+        encoding="utf-8",
+    )
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", message)
+
+
+def test_cat_file_batch_reads_many_objects(git_kb_root: Path) -> None:
+    _commit_note(git_kb_root, "notes/dev/a.md", "first", "a")
+    oid = git(git_kb_root, "rev-parse", "HEAD:notes/dev/a.md").strip()
+    with CatFileBatch(git_kb_root) as cat:
+        assert b"first" in (cat.read(oid) or b"")
+        assert cat.read("0" * 40) is None
+        assert b"first" in (cat.read("HEAD:notes/dev/a.md") or b"")
+
+
+def test_history_finds_removed_facts_incrementally(git_kb_root: Path) -> None:
+    dirs = ["notes/dev", "notes/infra"]
+    dev_rel = f"notes/dev/note--{NOTE_ID}.md"
+    infra_rel = f"notes/infra/note--{NOTE_ID}.md"
+    _commit_note(git_kb_root, dev_rel, "old fact: port 8080", "v1")
+    _commit_note(git_kb_root, dev_rel, "old fact: port 8080\nmore", "v2")
+
+    index = HistoryIndex.for_repo(git_kb_root)
+    assert index.update(git_kb_root, dirs) == 2
+
+    (git_kb_root / "notes" / "infra").mkdir()
+    git(git_kb_root, "mv", dev_rel, infra_rel)
+    git(git_kb_root, "commit", "-q", "-m", "move")
+    _commit_note(git_kb_root, infra_rel, "port 9090", "v3")
+
+    reloaded = HistoryIndex.for_repo(git_kb_root)
+    assert reloaded.head == index.head
+    # Only the new commits are walked: the move (re-adds the same blob) and v3.
+    assert reloaded.update(git_kb_root, dirs) == 2
+    assert reloaded.update(git_kb_root, dirs) == 0
+
+    hits = reloaded.search(git_kb_root, re.compile("8080"))
+    assert len(hits) == 1
+    assert hits[0].note_id == NOTE_ID
+    assert hits[0].path == infra_rel
+    assert hits[0].text == "old fact: port 8080"
+
+
+def test_search_history_cli(git_kb_root: Path, monkeypatch) -> None:
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root, **_kw: None)
+    _commit_note(git_kb_root, "notes/dev/note.md", "gone soon", "v1")
+    (git_kb_root / "notes/dev/note.md").unlink()
+    git(git_kb_root, "commit", "-q", "-am", "delete")
+
+    result = CliRunner().invoke(cli.main, ["search", "--history", "gone"])
+    assert result.exit_code == 0, result.output
+    commit, date, note_id, rest = result.output.strip().split(" ", 3)
+    assert note_id == NOTE_ID
+    assert rest == "notes/dev/note.md:8:gone soon"
+    assert git(git_kb_root, "rev-parse", "HEAD~1").startswith(commit)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from kb_repo_tools.index import AmbiguousIdError, IdIndex, compile_file_template
+from kb_repo_tools.timeutil import JST
+from kb_repo_tools.ulidutil import new_ulids, ulid_time_prefix, ulid_timestamp_ms
+
+
+def test_ulid_time_prefix_roundtrip() -> None:
+    note_id = new_ulids(1)[0]
+    ms = ulid_timestamp_ms(note_id)
+    assert ulid_time_prefix(ms) == note_id[:10]
+    assert ulid_timestamp_ms("01KH5AP6B38MDFJESSS7EW3WHA") == 1770779253091
+
+
+def test_compile_file_template_captures_id() -> None:
+    name_re = compile_file_template("{slug}--{id}.md")
+    m = name_re.fullmatch("howto--01KH5AP6B38MDFJESSS7EW3WHA.md")
+    assert m is not None and m.group("id") == "01KH5AP6B38MDFJESSS7EW3WHA"
+    assert name_re.fullmatch("Howto--01KH5AP6B38MDFJESSS7EW3WHA.md") is None
+
+
+def test_id_index_created_between_uses_filename_ids() -> None:
+    base = datetime(2026, 3, 1, tzinfo=JST)
+    paths = []
+    for day in range(5):
+        ms = int((base + timedelta(days=day)).timestamp() * 1000)
+        paths.append(Path(f"notes/dev/note--{ulid_time_prefix(ms)}ABCDEFGHJKMNPQRS.md"))
+    paths.append(Path("notes/dev/README.md"))
+
+    index = IdIndex.from_paths(reversed(paths), "{slug}--{id}.md")
+    assert len(index) == 5
+    hits = index.created_between(base + timedelta(days=1), base + timedelta(days=3))
+    assert [p for _, p in hits] == paths[1:3]
+    assert len(index.created_between(after=base + timedelta(days=4))) == 1
+    assert len(index.created_between(before=base)) == 0
+
+
+def test_id_index_prefix_lookup_and_abbreviations() -> None:
+    ids = [
+        "01KH5AP6B38MDFJESSS7EW3WHA",
+        "01KH5AP6B38MDFJESSS7EW3WHB",
+        "01KH5B00000000000000000000",
+        "01KJ0000008MDFJESSS7EW3WHA",
+    ]
+    index = IdIndex((note_id, Path(f"{note_id}.md")) for note_id in ids)
+
+    assert index.resolve("01kj")[0] == ids[3]
+    assert index.resolve("01KH5B")[0] == ids[2]
+    assert index.resolve(ids[0])[0] == ids[0]
+    assert index.resolve("01KK") is None
+    with pytest.raises(AmbiguousIdError) as excinfo:
+        index.resolve("01KH5A")
+    assert [nid for nid, _ in excinfo.value.candidates] == ids[:2]
+
+    assert [abbrev for abbrev, _ in index.abbreviations()] == [
+        "01KH5AP6B38MDFJESSS7EW3WHA",
+        "01KH5AP6B38MDFJESSS7EW3WHB",
+        "01KH5B",
+        "01KJ",
+    ]
+    for abbrev, path in index.abbreviations():
+        assert index.resolve(abbrev)[1] == path
+
+
+def test_abbreviations_look_past_duplicated_ids() -> None:
+    x = "01KH5AP6B38MDFJESSS7EW3WHA"
+    y = "01KH5B00000000000000000000"
+    index = IdIndex([(x, Path("a.md")), (x, Path("b.md")), (y, Path("c.md"))])
+    assert index.abbreviations() == [
+        ("01KH5A", Path("a.md")),
+        ("01KH5A", Path("b.md")),
+        ("01KH5B", Path("c.md")),
+    ]
+    assert index.resolve("01KH5A") == (x, Path("a.md"))  # one id, so not ambiguous
+    with pytest.raises(AmbiguousIdError):
+        index.resolve("01KH5")
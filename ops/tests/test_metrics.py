@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.gitutil import CatFileBatch, run_git
+from kb_repo_tools.metrics import RunMetrics
+
+from conftest import NOTE_ID, write_file
+
+
+def test_track_git_counts_only_git_processes_while_active(git_kb_root: Path) -> None:
+    metrics = RunMetrics("organize")
+    with metrics.track_git():
+        run_git(git_kb_root, "--version")
+        with CatFileBatch(git_kb_root):
+            pass
+        cli._has_git_worktree(git_kb_root)
+        subprocess.run(["true"], check=True)
+    run_git(git_kb_root, "--version")
+    assert metrics.git_subprocesses == 3
+
+
+def test_organize_writes_jsonl_and_prometheus_metrics(
+    organize_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_file(
+        organize_root,
+        f"notes/inbox/note--{NOTE_ID}.md",
+        f"---\nid: {NOTE_ID}\nkind: note\ndomain: dev\nsummary: s\n---\n\n本文\n",
+    )
+    log = organize_root / "metrics" / "organize.jsonl"
+    prom = organize_root / "metrics" / "kb.prom"
+    monkeypatch.setenv("KB_METRICS_PROM", str(prom))
+
+    result = CliRunner().invoke(cli.main, ["organize", "--metrics-log", str(log)])
+    assert result.exit_code == 0, result.output
+    result = CliRunner().invoke(cli.main, ["organize", "--metrics-log", str(log)])
+    assert result.output.strip() == "No changes"
+
+    first, second = (json.loads(line) for line in log.read_text().splitlines())
+    assert first["command"] == "organize"
+    assert first["status"] == "executed"
+    assert first["notes_scanned"] == first["notes_parsed"] == 1
+    assert first["notes_rewritten"] == first["notes_moved"] == 1
+    new_text = (organize_root / f"notes/dev/note--{NOTE_ID}.md").read_bytes()
+    assert first["bytes_written"] == len(new_text)
+    assert set(first["phases"]) == {"pull", "plan", "apply", "commit"}
+    assert second["status"] == "no-changes"
+    assert second["notes_rewritten"] == 0
+
+    text = prom.read_text()
+    assert "# TYPE kb_organize_notes_scanned gauge\nkb_organize_notes_scanned 1\n" in text
+    assert 'kb_organize_phase_seconds{phase="plan"} ' in text
+    assert 'kb_organize_last_run_timestamp_seconds{status="no-changes"} ' in text
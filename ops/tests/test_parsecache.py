@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli, parsecache
+from kb_repo_tools.gitutil import blob_oid
+from kb_repo_tools.parsecache import ParseCache, load_note_records, parse_note_bytes
+
+from conftest import git, write_file
+
+A = "01KH5AP6B38MDFJESSS7EW3WHA"
+B = "01KH5AP6B38MDFJESSS7EW3WHB"
+
+NOTE = """---
+id: {id}
+kind: troubleshoot
+domain: dev
+summary: 要約
+created: 2026-02-10
+updated: 2026-02-10T23:15+09:00
+---
+
+## 症状
+
+```
+## not a heading
+```
+
+## 対処
+
+手順
+"""
+REL = "notes/dev/troubleshoot--{id}.md"
+
+
+def test_parse_note_bytes_collects_meta_headings_and_stats() -> None:
+    data = NOTE.format(id=A).encode()
+    record = parse_note_bytes(data)
+    assert record["meta"]["id"] == A
+    assert record["meta"]["created"] == "2026-02-10"
+    assert [h[1] for h in record["headings"]] == ["症状", "対処"]
+    level, _title, line, offset = record["headings"][1]
+    assert level == 2
+    assert data.splitlines()[line - 1] == "## 対処".encode()
+    assert data[offset:].startswith("## 対処".encode())
+    assert record["stats"]["bytes"] == len(data)
+
+
+def test_parse_note_bytes_records_errors() -> None:
+    assert "error" in parse_note_bytes(b"no frontmatter\n")
+
+
+def test_blob_oid_matches_git(git_kb_root: Path) -> None:
+    path = write_file(git_kb_root, REL.format(id=A), NOTE.format(id=A))
+    expected = git(git_kb_root, "hash-object", str(path)).strip()
+    assert blob_oid(path.read_bytes()) == expected
+
+
+def test_load_note_records_parses_each_blob_once(
+    git_kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    a = write_file(git_kb_root, REL.format(id=A), NOTE.format(id=A))
+    write_file(git_kb_root, REL.format(id=B), NOTE.format(id=B))
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "notes")
+
+    parsed: list[int] = []
+    real_parse = parsecache.parse_note_bytes
+
+    def counting_parse(data: bytes) -> dict:
+        parsed.append(len(data))
+        return real_parse(data)
+
+    monkeypatch.setattr(parsecache, "parse_note_bytes", counting_parse)
+    dirs = ["notes/dev"]
+
+    first = load_note_records(git_kb_root, dirs)
+    assert len(first) == 2 and len(parsed) == 2
+
+    second = load_note_records(git_kb_root, dirs)
+    assert [r.oid for r in second] == [r.oid for r in first]
+    assert len(parsed) == 2
+
+    a.write_text(a.read_text(encoding="utf-8") + "\n追記\n", encoding="utf-8")
+    third = load_note_records(git_kb_root, dirs)
+    assert len(parsed) == 3
+    assert third[0].oid == blob_oid(a.read_bytes())
+
+
+def test_cache_file_is_portable(git_kb_root: Path, tmp_path: Path) -> None:
+    write_file(git_kb_root, REL.format(id=A), NOTE.format(id=A))
+    src = ParseCache(tmp_path / "machine-a.jsonl")
+    records = load_note_records(git_kb_root, ["notes/dev"], src)
+
+    dst = ParseCache(tmp_path / "machine-b.jsonl")
+    assert dst.merge_file(src.path) == 1
+    dst.save()
+    assert ParseCache(dst.path).get(records[0].oid) == records[0].record
+
+
+def test_cache_export_without_notes_writes_an_empty_cache(
+    git_kb_root: Path, tmp_path: Path
+) -> None:
+    dest = tmp_path / "exported.jsonl"
+    result = CliRunner().invoke(cli.main, ["cache", "export", str(dest)])
+    assert result.exit_code == 0, result.output
+    assert dest.read_text(encoding="utf-8") == '{"format": "kb-parse-cache", "version": 1}\n'
+    assert len(ParseCache(dest)) == 0
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.pushqueue import PushQueue
+
+from conftest import git
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def clone(git_kb_root: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch) -> Path:
+    """A clone of a local bare remote, tracking origin/main."""
+    base = tmp_path_factory.mktemp("remote")
+    git(base, "clone", "-q", "--bare", str(git_kb_root), "kb.git")
+    git(base, "clone", "-q", "kb.git", "work")
+    monkeypatch.chdir(base / "work")
+    return base / "work"
+
+
+def _remote_head(clone: Path) -> str:
+    return git(clone, "ls-remote", "origin", "refs/heads/main").split()[0]
+
+
+def _new(*args: str) -> None:
+    result = CliRunner().invoke(cli.main, ["new", "--summary", "s", "--defer-push", *args])
+    assert result.exit_code == 0, result.output
+
+
+def test_deferred_commits_go_out_in_one_push(clone: Path, monkeypatch) -> None:
+    monkeypatch.setattr(PushQueue, "spawn_worker", lambda _self, _root: None)
+    before = _remote_head(clone)
+    _new()
+    _new()
+    assert _remote_head(clone) == before
+    assert git(clone, "rev-list", "--count", "origin/main..HEAD").strip() == "2"
+
+    pushes: list[list[str]] = []
+    real_run = cli.subprocess.run
+
+    def counting_run(cmd, *args, **kwargs):
+        if cmd[:2] == ["git", "push"]:
+            pushes.append(cmd)
+        return real_run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr("kb_repo_tools.pushqueue.subprocess.run", counting_run)
+    result = CliRunner().invoke(cli.main, ["sync"])
+    assert result.exit_code == 0, result.output
+    assert "pushed 2 queued commit(s)" in result.output
+    assert "pending: 0 commit(s)" in result.output
+    assert len(pushes) == 1
+    assert _remote_head(clone) == git(clone, "rev-parse", "HEAD").strip()
+
+
+def test_rejected_push_is_rebased_and_retried(clone: Path, monkeypatch) -> None:
+    monkeypatch.setattr(PushQueue, "spawn_worker", lambda _self, _root: None)
+    other = clone.parent / "other"
+    git(clone.parent, "clone", "-q", "kb.git", "other")
+    (other / "notes" / "dev").mkdir(parents=True, exist_ok=True)
+    (other / "notes" / "dev" / "elsewhere.md").write_text("x\n", encoding="utf-8")
+    git(other, "add", "-A")
+    git(other, "commit", "-q", "-m", "from another machine")
+    git(other, "push", "-q")
+
+    _new()
+    head = git(clone, "rev-parse", "HEAD")
+    # The background worker never rewrites HEAD under the user's feet.
+    queue = PushQueue.for_repo(clone)
+    result = queue.flush(clone)
+    assert result is not None and result.pushed == 0
+    assert "run kb sync" in (result.error or "")
+    assert git(clone, "rev-parse", "HEAD") == head
+    assert len(queue.pending()) == 1
+
+    result = CliRunner().invoke(cli.main, ["sync"])
+    assert result.exit_code == 0, result.output
+    assert "pushed 1 queued commit(s)" in result.output
+    subjects = git(clone, "log", "--format=%s", "origin/main").splitlines()
+    assert subjects[0].startswith("ナレッジを追加: ")
+    assert subjects[1] == "from another machine"
+
+
+def test_commit_queued_as_the_worker_finds_it_empty_is_pushed(
+    clone: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(PushQueue, "spawn_worker", lambda _self, _root: None)
+    _new()
+    queue = PushQueue.for_repo(clone)
+    real_pending = PushQueue.pending
+    reads: list[int] = []
+
+    def late_pending(self: PushQueue) -> list:
+        reads.append(1)
+        # The worker's first look predates the enqueue, which then skipped
+        # spawning a worker because the lock was still held.
+        return [] if len(reads) == 1 else real_pending(self)
+
+    monkeypatch.setattr(PushQueue, "pending", late_pending)
+    result = queue.flush(clone)
+    assert result is not None and result.error is None and result.pushed == 1
+    assert _remote_head(clone) == git(clone, "rev-parse", "HEAD").strip()
+
+
+def test_background_worker_flushes_queue(clone: Path, monkeypatch) -> None:
+    # The worker runs `python -m kb_repo_tools` and must find this checkout.
+    paths = [str(SRC), os.environ.get("PYTHONPATH", "")]
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(paths))
+    _new()
+    queue = PushQueue.for_repo(clone)
+    deadline = time.monotonic() + 20
+    while (queue.pending() or queue.worker_running()) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert queue.pending() == []
+    assert queue.status()["last_error"] is None
+    assert _remote_head(clone) == git(clone, "rev-parse", "HEAD").strip()
+
+    result = CliRunner().invoke(cli.main, ["sync", "--status"])
+    assert result.exit_code == 0, result.output
+    assert "pending: 0 commit(s)" in result.output
+    assert "worker: idle" in result.output
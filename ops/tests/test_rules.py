@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from kb_repo_tools.repo import RepoError
+from kb_repo_tools.rules import compile_rules, months_before
+from kb_repo_tools.timeutil import JST
+
+NOTE_ID = "01KH5AP6B38MDFJESSS7EW3WHA"
+
+
+def _rules(**extra) -> dict:
+    rules = {
+        "note_dirs": ["notes/dev"],
+        "kinds": ["note"],
+        "domains": ["dev"],
+        "frontmatter": {"required": ["id", "summary"]},
+    }
+    rules.update(extra)
+    return rules
+
+
+def _meta(**extra) -> dict:
+    meta = {"id": NOTE_ID, "kind": "note", "domain": "dev", "summary": "s"}
+    meta.update(extra)
+    return meta
+
+
+def test_compile_rules_is_cached_per_content() -> None:
+    assert compile_rules(_rules()) is compile_rules(_rules())
+    assert compile_rules(_rules()) is not compile_rules(_rules(kinds=["howto"]))
+
+
+def test_validate_reports_problems_in_check_order() -> None:
+    cr = compile_rules(_rules())
+    problems = cr.validate(
+        "wrong-name.md",
+        _meta(summary="", kind="x", tags=["Bad"], updated="nope"),
+    )
+    assert problems == [
+        "missing required field: summary",
+        f"filename does not match template '{{slug}}--{{id}}.md' for id '{NOTE_ID}' "
+        "(got: wrong-name.md)",
+        "invalid kind: x",
+        "invalid updated: nope",
+        "invalid tag: Bad",
+    ]
+    assert cr.validate(f"note--{NOTE_ID}.md", _meta()) == []
+
+
+def test_tag_pattern_comes_from_rules() -> None:
+    fm = {"required": [], "tags": {"allowed": "^[a-z]+$"}}
+    cr = compile_rules(_rules(frontmatter=fm))
+    assert cr.validate(f"note--{NOTE_ID}.md", _meta(tags=["a-b"])) == ["invalid tag: a-b"]
+
+
+def test_lint_checks_are_declarative() -> None:
+    cr = compile_rules(_rules(lint={"checks": ["kind"]}))
+    assert cr.validate("whatever.md", _meta(kind="x", domain="y")) == ["invalid kind: x"]
+    with pytest.raises(RepoError):
+        compile_rules(_rules(lint={"checks": ["no-such-check"]}))
+
+
+def test_archive_policy_matches_kind_and_age() -> None:
+    policy = compile_rules(
+        _rules(archive={"rules": [{"kinds": "note", "older_than_months": 3}]})
+    ).archive
+    assert policy is not None and policy.dir == "archive"
+    now = datetime(2026, 5, 31, 12, 0, tzinfo=JST)
+    assert months_before(now, 3) == datetime(2026, 2, 28, 12, 0, tzinfo=JST)
+    assert policy.matches(_meta(updated="2026-02-27T09:00+09:00"), now)
+    assert not policy.matches(_meta(updated="2026-03-01T09:00+09:00"), now)
+    assert not policy.matches(_meta(kind="howto", updated="2025-01-01T09:00+09:00"), now)
+    assert not policy.matches(_meta(), now)  # no updated: age unknown
+    assert compile_rules(_rules()).archive is None
+
+
+@pytest.mark.parametrize(
+    ("archive", "message"),
+    [
+        ({"dir": "notes/dev/old", "rules": [{"kinds": ["note"]}]}, "outside note_dirs"),
+        ({"rules": []}, "non-empty list"),
+        ({"rules": [{}]}, "must set kinds"),
+        ({"rules": [{"kinds": ["memo"]}]}, "not in kinds"),
+        ({"rules": [{"older_than_months": 0}]}, "positive integer"),
+        ({"rules": [{"age": 3}]}, "unknown key"),
+    ],
+)
+def test_archive_policy_rejects_invalid_config(archive: dict, message: str) -> None:
+    with pytest.raises(RepoError, match=message):
+        compile_rules(_rules(archive=archive))
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.searchcache import SearchCache
+
+from conftest import git
+
+NOTE = "notes/dev/note--01KH5AP6B38MDFJESSS7EW3WHA.md"
+
+
+@pytest.fixture
+def search_root(git_kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """A committed note; returns the list that records each real scan."""
+    (git_kb_root / NOTE).parent.mkdir(parents=True)
+    (git_kb_root / NOTE).write_text("---\nid: x\n---\n\nvpn を再起動\n", encoding="utf-8")
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "note")
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root: None)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: None)
+
+    scans: list[str] = []
+    original = cli._rg_capture
+
+    def counting(repo_root: Path, note_dirs: list[str], query: str) -> str:
+        scans.append(query)
+        return original(repo_root, note_dirs, query)
+
+    monkeypatch.setattr(cli, "_rg_capture", counting)
+    return scans
+
+
+def _search(*args: str) -> str:
+    result = CliRunner().invoke(cli.main, ["search", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_repeated_query_is_served_from_cache(search_root: list[str]) -> None:
+    first = _search("vpn")
+    assert first == f"{NOTE}:5:vpn を再起動\n"
+    assert _search("vpn") == first
+    assert _search("--sections", "vpn").endswith(":5:vpn を再起動\n")
+    assert search_root == ["vpn"]  # --sections reuses the same raw hits
+
+    _search("vpn", "--no-cache")
+    assert search_root == ["vpn", "vpn"]
+
+
+def test_cache_is_invalidated_by_note_changes(git_kb_root: Path, search_root: list[str]) -> None:
+    _search("vpn")
+    path = git_kb_root / NOTE
+
+    path.write_text(path.read_text(encoding="utf-8") + "vpn again\n", encoding="utf-8")
+    assert _search("vpn").count("\n") == 2
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "edit")
+    assert _search("vpn").count("\n") == 2
+    assert len(search_root) == 3
+
+    other = git_kb_root / "notes" / "dev" / "untracked.md"
+    other.write_text("vpn\n", encoding="utf-8")
+    assert "untracked.md:1:vpn" in _search("vpn")
+
+    other.unlink()  # back to the committed state: its entry is still valid
+    assert "untracked.md" not in _search("vpn")
+    assert len(search_root) == 4
+
+    # Unrelated files do not invalidate anything.
+    (git_kb_root / "scratch.txt").write_text("vpn\n", encoding="utf-8")
+    _search("vpn")
+    assert len(search_root) == 4
+
+
+def test_ignored_files_do_not_invalidate_the_cache(
+    git_kb_root: Path, search_root: list[str]
+) -> None:
+    (git_kb_root / ".gitignore").write_text("*.swp\n", encoding="utf-8")
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "ignore swap files")
+    first = _search("vpn")
+
+    # Neither engine reads ignored files, so they are not part of the key.
+    (git_kb_root / "notes" / "dev" / "note.md.swp").write_text("vpn\n", encoding="utf-8")
+    assert _search("vpn") == first
+    assert search_root == ["vpn"]
+
+
+def test_lru_eviction_is_bounded(tmp_path: Path) -> None:
+    cache = SearchCache(tmp_path, max_entries=2, max_bytes=1000)
+    for n, key in enumerate(["a", "b", "c"]):
+        cache.put(key, key * 10)
+        os.utime(tmp_path / f"{key}.txt", ns=(n * 10**9, n * 10**9))
+        if key == "b":
+            assert cache.get("a") is not None  # "a" becomes most recently used
+            os.utime(tmp_path / "a.txt", ns=(5 * 10**9, 5 * 10**9))
+    cache.put("d", "d" * 10)
+    assert sorted(p.stem for p in tmp_path.glob("*.txt")) == ["a", "d"]
+
+    cache.put("big", "x" * 995)
+    assert sorted(p.stem for p in tmp_path.glob("*.txt")) == ["big"]
+    cache.put("huge", "x" * 2000)  # larger than the whole cache: not stored
+    assert cache.get("huge") is None
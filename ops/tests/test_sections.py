@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.parsecache import parse_note_bytes
+from kb_repo_tools.sections import find_section, read_section, section_at_line, sections_of
+
+from conftest import write_file
+
+NOTE_ID = "01KH5AP6B38MDFJESSS7EW3WHA"
+REL = f"notes/dev/troubleshoot--{NOTE_ID}.md"
+NOTE = f"""---
+id: {NOTE_ID}
+kind: troubleshoot
+domain: dev
+summary: 要約
+created: 2026-02-10T23:15+09:00
+updated: 2026-02-10T23:15+09:00
+---
+
+## 症状
+
+起動しない
+
+## 対処
+
+### 手順
+
+再起動する
+
+## 参考
+
+なし
+"""
+
+
+def test_sections_cover_nested_headings(tmp_path: Path) -> None:
+    path = tmp_path / "note.md"
+    path.write_text(NOTE, encoding="utf-8")
+    sections = sections_of(parse_note_bytes(path.read_bytes()))
+    assert [s.title for s in sections] == ["症状", "対処", "手順", "参考"]
+
+    fix = find_section(sections, "## 対処")
+    assert fix is not None
+    assert read_section(path, fix) == "## 対処\n\n### 手順\n\n再起動する\n\n"
+    assert find_section(sections, "てじゅん") is None
+    assert find_section(sections, "手") is not None
+
+    lines = NOTE.splitlines()
+    assert section_at_line(sections, lines.index("再起動する") + 1).title == "手順"
+    assert section_at_line(sections, 1) is None
+
+
+def test_show_prints_one_section(kb_root: Path) -> None:
+    write_file(kb_root, REL, NOTE)
+    result = CliRunner().invoke(cli.main, ["show", NOTE_ID.lower(), "--section", "対処"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "## 対処\n\n### 手順\n\n再起動する\n"
+
+    result = CliRunner().invoke(cli.main, ["show", NOTE_ID, "--section", "原因"])
+    assert result.exit_code != 0
+    assert "available: 症状, 対処, 手順, 参考" in result.output
+
+
+def test_search_sections_labels_hits(kb_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    write_file(kb_root, REL, NOTE)
+    line = NOTE.splitlines().index("再起動する") + 1
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root: None)
+
+    def fake_run(cmd, **kwargs):
+        if cmd[0] == "git":
+            raise FileNotFoundError("git")
+        assert "--no-heading" in cmd
+        return subprocess.CompletedProcess(cmd, 0, stdout=f"{REL}:{line}:再起動する\n")
+
+    monkeypatch.setattr(cli.subprocess, "run", fake_run)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: "/usr/bin/rg")
+    result = CliRunner().invoke(cli.main, ["search", "--sections", "再起動"])
+    assert result.exit_code == 0, result.output
+    assert result.output == f"{REL}:{line}:[手順] 再起動する\n"
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.repo import RepoError
+from kb_repo_tools.rules import ShardRule, shard_rule
+
+from conftest import write_note
+
+IDS = [f"01KH5AP6B38MDFJESSS7EW3WH{c}" for c in "ABCD"]
+
+
+def _enable_sharding(root: Path, **options: object) -> None:
+    rules = root / "ops" / "rules" / "kb.rules.yml"
+    lines = "".join(f"    {k}: {v}\n" for k, v in options.items())
+    text = rules.read_text(encoding="utf-8").replace(
+        "placement:\n", f"placement:\n  shard:\n{lines}", 1
+    )
+    rules.write_text(text, encoding="utf-8")
+
+
+def test_shard_rule_subdirs() -> None:
+    assert shard_rule({}) is None
+    month = shard_rule({"placement": {"shard": {"by": "month"}}})
+    assert month == ShardRule(by="month", threshold=2000)
+    assert month.subdir(IDS[0]) == "2026/02"
+    prefix = ShardRule(by="prefix", threshold=1, prefix_len=4)
+    assert prefix.subdir(IDS[0].lower()) == "01KH"
+    with pytest.raises(RepoError):
+        shard_rule({"placement": {"shard": {"by": "week"}}})
+    with pytest.raises(RepoError):
+        shard_rule({"placement": {"shard": {"threshold": 0}}})
+
+
+def test_organize_migrates_in_batches(organize_root: Path) -> None:
+    _enable_sharding(organize_root, by="month", threshold=2, batch_size=3)
+    for i, note_id in enumerate(IDS):
+        write_note(organize_root, note_id, related=[IDS[i - 1]])
+
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    assert "shard migration: 1 note(s) left for the next organize run" in result.output
+    sharded = organize_root / "notes" / "dev" / "2026" / "02"
+    assert len(list(sharded.glob("*.md"))) == 3
+
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    assert len(list(sharded.glob("*.md"))) == 4
+    assert not list((organize_root / "notes" / "dev").glob("*.md"))
+
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.output.strip() == "No changes"
+
+    # Related links and lookups do not depend on the directory layout.
+    result = CliRunner().invoke(cli.main, ["resolve", IDS[2]])
+    assert result.output.strip() == f"notes/dev/2026/02/note--{IDS[2]}.md"
+    result = CliRunner().invoke(cli.main, ["lint", "--reciprocal"])
+    assert "not found" not in result.output
+    assert "duplicate" not in result.output
+
+
+def test_new_note_lands_in_shard_past_threshold(organize_root: Path) -> None:
+    _enable_sharding(organize_root, by="prefix", threshold=1, prefix_len=2)
+    result = CliRunner().invoke(cli.main, ["new", "--domain", "dev", "--summary", "a"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip().startswith("notes/dev/note--")
+
+    result = CliRunner().invoke(cli.main, ["new", "--domain", "dev", "--summary", "b"])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip().startswith("notes/dev/01/note--")
+
+
+def test_batch_compiles_rules_once(organize_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _enable_sharding(organize_root, by="prefix", threshold=1, prefix_len=2)
+    calls: list[object] = []
+    real_compile = cli.compile_rules
+
+    def counting_compile(rules):
+        calls.append(rules)
+        return real_compile(rules)
+
+    monkeypatch.setattr(cli, "compile_rules", counting_compile)
+    specs = "".join(f'{{"domain": "dev", "summary": "s{i}"}}\n' for i in range(3))
+    result = CliRunner().invoke(cli.main, ["new", "--batch"], input=specs)
+    assert result.exit_code == 0, result.output
+    assert [line.startswith("notes/dev/01/") for line in result.stdout.splitlines()] == [
+        False,
+        True,
+        True,
+    ]
+    assert len(calls) == 1  # once when the repo is opened, not per note
+def test_sharded_directory_stays_sharded_below_threshold(organize_root: Path) -> None:
+    _enable_sharding(organize_root, by="month", threshold=2)
+    paths = [write_note(organize_root, note_id) for note_id in IDS[:3]]
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.exit_code == 0, result.output
+    sharded = organize_root / "notes" / "dev" / "2026" / "02"
+    assert len(list(sharded.glob("*.md"))) == 3
+
+    (sharded / paths[0].name).unlink()  # back to the threshold
+    result = CliRunner().invoke(cli.main, ["organize"])
+    assert result.output.strip() == "No changes"
+    assert len(list(sharded.glob("*.md"))) == 2
+
+
+def test_note_dir_state_reads_only_what_the_decision_needs(tmp_path: Path) -> None:
+    flat = tmp_path / "flat"
+    for note_id in IDS:
+        write_note(flat, note_id, rel_dir="")
+    assert cli._note_dir_state(flat, 2) == (2, False)  # stops counting at the limit
+    assert cli._note_dir_state(tmp_path / "missing", 2) == (0, False)
+
+    (flat / "attachments").mkdir()
+    assert cli._note_dir_state(flat, 10) == (4, False)
+    write_note(flat, "01KH5AP6B38MDFJESSS7EW3WHE", rel_dir="2026/02")
+    assert cli._note_dir_state(flat, 10) == (0, True)
+def test_move_paths_prunes_only_emptied_shard_dirs(git_kb_root: Path) -> None:
+    inbox = write_note(git_kb_root, IDS[0], rel_dir="notes/inbox")
+    shard = write_note(git_kb_root, IDS[1], rel_dir="notes/dev/2026/02")
+    dev = git_kb_root / "notes" / "dev"
+    cli._move_paths(
+        git_kb_root,
+        [(inbox, dev / inbox.name), (shard, dev / shard.name)],
+        [git_kb_root / "notes" / "inbox", dev],
+    )
+    assert (dev / inbox.name).exists() and (dev / shard.name).exists()
+    assert (git_kb_root / "notes" / "inbox").is_dir()  # a placement dir, kept
+    assert not (dev / "2026").exists()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.parsecache import load_note_records, load_sparse_records
+
+from conftest import git, write_note
+
+DEV = "01KH5AP6B38MDFJESSS7EW3WHA"
+LIFE = "01KH5AP6B38MDFJESSS7EW3WHB"
+BODY = "## 対処\n\n手順\n"
+
+
+@pytest.fixture
+def sparse_clone(
+    git_kb_root: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    """A ``git clone --sparse`` of a bare remote holding one dev and one life note."""
+    write_note(git_kb_root, DEV, BODY, domain="dev", summary="dev のメモ", related=[LIFE])
+    write_note(git_kb_root, LIFE, BODY, domain="life", summary="life のメモ", related=[DEV])
+    git(git_kb_root, "add", "-A")
+    git(git_kb_root, "commit", "-q", "-m", "notes")
+    base = tmp_path_factory.mktemp("remote")
+    git(base, "clone", "-q", "--bare", str(git_kb_root), "kb.git")
+    git(base, "clone", "-q", "--sparse", "kb.git", "work")
+    work = base / "work"
+    # The first step on a fresh sparse clone: bring in ops/ so kb can run.
+    git(work, "sparse-checkout", "set", "--cone", "ops")
+    monkeypatch.chdir(work)
+    return work
+
+
+def test_sparse_profile_keeps_catalog_lookups(sparse_clone: Path) -> None:
+    root = sparse_clone
+    life_rel = f"notes/life/note--{LIFE}.md"
+
+    assert not (root / "notes").exists()
+    result = CliRunner().invoke(cli.main, ["sparse", "dev"])
+    assert result.exit_code == 0, result.output
+    assert result.output.split() == [
+        "ops",
+        "notes/inbox",
+        "notes/patterns",
+        "notes/drafts",
+        "notes/dev",
+    ]
+    assert not (root / life_rel).exists()
+    assert (root / f"notes/dev/note--{DEV}.md").exists()
+
+    note_dirs = ["notes/dev", "notes/life"]
+    assert [r.path.name for r in load_note_records(root, note_dirs)] == [
+        f"note--{DEV}.md"
+    ]
+    catalog = load_sparse_records(root, note_dirs)
+    assert [(r.path.name, r.in_worktree) for r in catalog] == [(f"note--{LIFE}.md", False)]
+
+    result = CliRunner().invoke(cli.main, ["resolve", LIFE])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.strip() == life_rel
+    assert "outside the sparse checkout" in result.stderr
+
+    result = CliRunner().invoke(cli.main, ["show", LIFE, "--section", "対処"])
+    assert result.stdout == "## 対処\n\n手順\n"
+
+    result = CliRunner().invoke(cli.main, ["lint", "--reciprocal"])
+    assert "related target not found" not in result.output
+    assert "not reciprocated" not in result.output
+
+    repo = cli.open_repo(root)
+    plan = cli._plan_organize(
+        root,
+        repo.rules,
+        cli.compile_rules(repo.rules),
+        ts="2026-03-01T10:00+09:00",
+        default_created_by="host",
+        default_created_os="linux",
+    )
+    (patch,) = plan.patches
+    assert f"[[note--{LIFE}|life のメモ]]" in (patch.related_block or "")
+    assert "[missing]" not in (patch.related_block or "")
+    assert plan.moves == []
+
+    result = CliRunner().invoke(cli.main, ["sparse", "--disable"])
+    assert result.exit_code == 0, result.output
+    assert (root / life_rel).exists()
+    assert load_sparse_records(root, note_dirs) == []
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kb_repo_tools import cli
+from kb_repo_tools.textsearch import is_literal, search
+
+
+def _write(root: Path, rel: str, data: str | bytes) -> None:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, bytes):
+        path.write_bytes(data)
+    else:
+        path.write_text(data, encoding="utf-8")
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    _write(tmp_path, "notes/dev/a.md", "前置き\n再起動する 再起動\r\nbar 再起動\n\n末尾の再")
+    _write(tmp_path, "notes/dev/.hidden.md", "再起動\n")
+    _write(tmp_path, "notes/dev/.git/HEAD", "再起動\n")
+    _write(tmp_path, "notes/dev/empty.md", "")
+    _write(tmp_path, "notes/dev/blob.bin", b"\x00" + "再起動".encode())
+    _write(tmp_path, "notes/infra/b.md", "起動\n")
+    return tmp_path
+
+
+def _lines(root: Path, query: str) -> list[str]:
+    return [str(hit) for hit in search(root, ["notes/dev", "notes/infra"], query, workers=2)]
+
+
+def test_literal_search_matches_rg_format(corpus: Path) -> None:
+    assert is_literal("再起動")
+    assert _lines(corpus, "再起動") == [
+        "notes/dev/.hidden.md:1:再起動",
+        "notes/dev/a.md:2:再起動する 再起動",
+        "notes/dev/a.md:3:bar 再起動",
+    ]
+    assert _lines(corpus, "末尾の再") == ["notes/dev/a.md:5:末尾の再"]
+
+
+def test_regex_search_sees_whole_characters(corpus: Path) -> None:
+    assert not is_literal("[あ-ん]+る")
+    assert _lines(corpus, "[あ-ん]+る 再") == ["notes/dev/a.md:2:再起動する 再起動"]
+    assert _lines(corpus, "^起動") == ["notes/infra/b.md:1:起動"]
+    assert _lines(corpus, "再$") == ["notes/dev/a.md:5:末尾の再"]
+
+
+def test_regex_matches_one_line_at_a_time(corpus: Path) -> None:
+    # rg never lets \s or [^x] run past the end of a line.
+    assert _lines(corpus, r"再起動\s+bar") == []
+    assert _lines(corpus, "する[^末]+末尾") == []
+    assert _lines(corpus, r"再起動\s*$") == [
+        "notes/dev/.hidden.md:1:再起動",
+        "notes/dev/a.md:2:再起動する 再起動",
+        "notes/dev/a.md:3:bar 再起動",
+    ]
+
+
+def test_search_skips_gitignored_files_in_a_worktree(git_kb_root: Path) -> None:
+    _write(git_kb_root, ".gitignore", "scratch/\n")
+    _write(git_kb_root, "notes/dev/a.md", "再起動\n")
+    _write(git_kb_root, "notes/dev/scratch/b.md", "再起動\n")
+    hits = search(git_kb_root, ["notes/dev"], "再起動", workers=2)
+    assert [str(hit) for hit in hits] == ["notes/dev/a.md:1:再起動"]
+
+
+def test_cmd_search_falls_back_without_rg(
+    kb_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _write(kb_root, "notes/dev/a.md", "前置き\n再起動する\n")
+    monkeypatch.setattr(cli, "_git_pull_ff_only", lambda _root: None)
+    monkeypatch.setattr(cli.shutil, "which", lambda _name: None)
+
+    result = CliRunner().invoke(cli.main, ["search", "再起動"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "notes/dev/a.md:2:再起動する\n"
+
+    result = CliRunner().invoke(cli.main, ["search", "見つからない"])
+    assert result.output == "No matches\n"
+
+    result = CliRunner().invoke(cli.main, ["search", "(unclosed"])
+    assert result.exit_code != 0
+    assert "Invalid search pattern" in result.output